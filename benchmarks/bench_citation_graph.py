@@ -0,0 +1,79 @@
+"""
+Benchmark for building a CitationGraph.
+
+Builds a graph from random citations between papers with dense ids, as
+AUTO_INCREMENT ids are, and reports build time, peak memory allocated while
+building (not counting the input arrays), size of the finished graph, and time
+for degree and k-hop queries. No database is needed.
+
+usage: bench_citation_graph.py [-h] [-p PAPERS] [-e EDGES] [--hops HOPS]
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from bibliom.citation_graph import CitationGraph
+
+MB = 1 << 20
+
+def main():
+    """
+    Main program
+    """
+    arg_parser = argparse.ArgumentParser(description="Benchmark building a CitationGraph.")
+    arg_parser.add_argument(
+        '-p', '--papers',
+        type=int,
+        default=5000000,
+        help="Number of papers.")
+    arg_parser.add_argument(
+        '-e', '--edges',
+        type=int,
+        default=50000000,
+        help="Number of citations.")
+    arg_parser.add_argument(
+        '--hops',
+        type=int,
+        default=3,
+        help="Hops of expansion query.")
+    args = arg_parser.parse_args()
+    if args.papers < 1 or args.edges < 0:
+        print("Number of papers must be positive and citations not negative.")
+        sys.exit(1)
+
+    rng = np.random.default_rng(0)
+    paper_ids = np.arange(1, args.papers + 1)
+    sources = rng.integers(1, args.papers + 1, args.edges)
+    targets = rng.integers(1, args.papers + 1, args.edges)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = CitationGraph.from_edges(sources, targets, paper_ids=paper_ids)
+    build_seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del sources, targets
+
+    start = time.perf_counter()
+    in_degree = graph.in_degree()
+    degree_seconds = time.perf_counter() - start
+    seeds = paper_ids[np.argsort(in_degree)[-10:]]
+    start = time.perf_counter()
+    reached = graph.expand(seeds, hops=args.hops, direction='both')
+    expand_seconds = time.perf_counter() - start
+
+    print("Papers:         %d" % len(graph))
+    print("Citations:      %d" % graph.num_citations)
+    print("Build:          %.2f s" % build_seconds)
+    print("Peak memory:    %.1f MB" % (peak / MB))
+    print("Graph size:     %.1f MB (%.1f bytes/citation)" % (
+        graph.nbytes / MB, graph.nbytes / max(graph.num_citations, 1)))
+    print("In degree:      %.4f s" % degree_seconds)
+    print("Expand %d hops: %.4f s, %d papers" % (args.hops, expand_seconds, len(reached)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark for materializing Paper entities.
+
+Compares memory used per entity, and time to create entities and read and
+write their fields, for the original DBEntity, which stored its state in an
+instance __dict__ and resolved fields in __getattr__, against Paper entities
+with __slots__ and field descriptors. Rows are created in the paper table's
+row cache and aren't written to the database, but a database is needed for
+the table's schema.
+
+usage: bench_entities.py [-h] [-n ENTITIES] [-c CONFIG]
+"""
+
+import sys
+import time
+import weakref
+import argparse
+import tracemalloc
+
+from bibliom.dbmanager import DBManager
+from bibliom.dbtable import DBTable
+from bibliom.publication_objects import Paper
+
+READ_FIELDS = ('title', 'doi', 'idjournal')
+
+class LegacyEntity:
+    """
+    Original DBEntity, reduced to creating entities for cached rows and
+    reading and writing fields.
+    """
+    def __init__(self, table, row_key):
+        self.__dict__['table'] = table
+        self.protect_fields = False
+        table.pin_row(row_key)
+        self.__dict__['_unpin'] = weakref.finalize(self, table.unpin_row, row_key)
+        self.__dict__['row_key'] = row_key
+        table.get_row_by_key(row_key, fields=())
+        if row_key not in table.entities:
+            table.entities[row_key] = self
+
+    def __getattr__(self, attr_name):
+        if attr_name in self.table.fields:
+            return self.table.get_row_by_key(
+                self.row_key, fields=(attr_name,)).get(attr_name)
+        raise AttributeError(attr_name)
+
+    def __setattr__(self, attr_name, value):
+        if attr_name in self.table.fields:
+            self.table.set_field(self.row_key, attr_name, value)
+        else:
+            object.__setattr__(self, attr_name, value)
+
+def make_rows(table, num_rows):
+    """
+    Creates num_rows paper-like rows in table's row cache and returns their
+    keys.
+    """
+    return [table.create_new_row({
+        'doi':          '10.1000/bench.%d' % i,
+        'title':        'Paper number %d' % i,
+        'idjournal':    i % 100
+    }) for i in range(num_rows)]
+
+def materialize(make_entity, table, row_keys):
+    """
+    Returns (entities, bytes allocated, seconds) for creating an entity for
+    each of row_keys with make_entity(table, row_key).
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    entities = [make_entity(table, row_key) for row_key in row_keys]
+    seconds = time.perf_counter() - start
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return entities, after - before, seconds
+
+def read_fields(entities):
+    """
+    Returns seconds taken to read READ_FIELDS of all entities.
+    """
+    start = time.perf_counter()
+    for entity in entities:
+        for field in READ_FIELDS:
+            getattr(entity, field)
+    return time.perf_counter() - start
+
+def write_fields(entities):
+    """
+    Returns seconds taken to set total_citations of all entities.
+    """
+    start = time.perf_counter()
+    for i, entity in enumerate(entities):
+        entity.total_citations = i
+    return time.perf_counter() - start
+
+def run(make_entity, table, row_keys):
+    """
+    Returns (bytes/entity, creates/s, reads/s, writes/s) for make_entity.
+    """
+    entities, nbytes, create_seconds = materialize(make_entity, table, row_keys)
+    read_seconds = read_fields(entities)
+    write_seconds = write_fields(entities)
+    num_entities = len(entities)
+    del entities
+    return (nbytes / num_entities,
+            num_entities / create_seconds,
+            num_entities * len(READ_FIELDS) / read_seconds,
+            num_entities / write_seconds)
+
+def main():
+    """
+    Main program
+    """
+    arg_parser = argparse.ArgumentParser(description="Benchmark Paper entities.")
+    arg_parser.add_argument(
+        '-n', '--entities',
+        type=int,
+        default=100000,
+        help="Number of entities to create.")
+    arg_parser.add_argument(
+        '-c', '--config',
+        default='TEST',
+        help="Configuration section of database to read the paper schema from.")
+    args = arg_parser.parse_args()
+    if args.entities < 1:
+        print("Number of entities must be positive.")
+        sys.exit(1)
+
+    manager = DBManager.get_manager_for_config(args.config)
+    table = DBTable.get_table_object('paper', manager)
+    table.set_cache_limits(None, None)
+    row_keys = make_rows(table, args.entities)
+
+    before = run(LegacyEntity, table, row_keys)
+    after = run(lambda table, row_key: Paper(table, row_key=row_key), table, row_keys)
+    print("Entities:       %d" % args.entities)
+    print("%-15s %15s %15s" % ("", "Before", "After"))
+    for label, before_value, after_value in zip(
+            ("bytes/entity", "creates/s", "reads/s", "writes/s"), before, after):
+        print("%-15s %15.1f %15.1f" % (label + ':', before_value, after_value))
+    print("Reduction:      %.1f%% bytes/entity" % (100 * (1 - after[0] / before[0])))
+    manager.close()
+
+if __name__ == "__main__":
+    main()
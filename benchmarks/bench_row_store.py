@@ -0,0 +1,102 @@
+"""
+Benchmark for DBTable row storage.
+
+Compares memory used per cached row by the original dict of row dicts and
+status dict against RowStore, for rows shaped like the paper table.
+
+usage: bench_row_store.py [-h] [-n ROWS]
+"""
+
+import sys
+import argparse
+import datetime
+import tracemalloc
+
+from bibliom.rowstore import RowStore
+
+# Columns of the paper table, in order, from config/create_db_tables.sql.
+PAPER_FIELDS = ('doi', 'title', 'publication_date', 'abstract', 'open_access',
+                'url', 'idjournal', 'idpaper', 'first_page', 'last_page',
+                'time_added', 'content', 'cited_records', 'wos_identifier',
+                'total_citations', 'citation_record', 'retracted_year',
+                'citation_history')
+
+def make_rows(num_rows):
+    """
+    Returns list of (row_key, row) pairs of paper-like rows.
+    """
+    rows = []
+    time_added = datetime.datetime(2020, 1, 1)
+    for i in range(num_rows):
+        row = {field:None for field in PAPER_FIELDS}
+        row['idpaper'] = i + 1
+        row['doi'] = '10.1000/bench.%d' % i
+        row['title'] = 'Paper number %d' % i
+        row['publication_date'] = datetime.date(2000 + i % 20, 1 + i % 12, 1)
+        row['idjournal'] = i % 100
+        row['first_page'] = str(i % 500)
+        row['last_page'] = str(i % 500 + 10)
+        row['time_added'] = time_added
+        row['wos_identifier'] = 'WOS:%012d' % i
+        row['total_citations'] = i % 40
+        rows.append(((i + 1,), row))
+    return rows
+
+def dict_rows(rows):
+    """
+    Stores rows as the original DBTable did.
+    """
+    row_dicts = {}
+    row_status = {}
+    for row_key, row in rows:
+        row_dicts[row_key] = {field:row.get(field) for field in PAPER_FIELDS}
+        row_status[row_key] = 1
+    return row_dicts, row_status
+
+def store_rows(rows):
+    """
+    Stores rows in a RowStore.
+    """
+    store = RowStore(PAPER_FIELDS)
+    for row_key, row in rows:
+        store[row_key] = row
+        store.statuses[row_key] = 1
+    return store
+
+def measure(function, rows):
+    """
+    Returns bytes allocated and still held after calling function(rows).
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(rows)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main():
+    """
+    Main program
+    """
+    arg_parser = argparse.ArgumentParser(description="Benchmark DBTable row storage.")
+    arg_parser.add_argument(
+        '-n', '--rows',
+        type=int,
+        default=100000,
+        help="Number of rows to store.")
+    args = arg_parser.parse_args()
+    if args.rows < 1:
+        print("Number of rows must be positive.")
+        sys.exit(1)
+
+    rows = make_rows(args.rows)
+    before = measure(dict_rows, rows)
+    after = measure(store_rows, rows)
+    print("Rows:           %d" % args.rows)
+    print("Before:         %.1f bytes/row" % (before / args.rows))
+    print("After:          %.1f bytes/row" % (after / args.rows))
+    print("Reduction:      %.1f%%" % (100 * (1 - after / before)))
+
+if __name__ == "__main__":
+    main()
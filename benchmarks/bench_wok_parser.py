@@ -0,0 +1,164 @@
+"""
+Benchmark for WOKParser record parsing.
+
+Compares records per second of WOKParser._parse_record against the original
+regex-based implementation of WOKParser.parse_content_item, and checks that
+both produce identical records.
+
+usage: bench_wok_parser.py [-h] [-n REPEAT] [file|directory ...]
+
+By default, parses all Web of Science files in test_data.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+from bibliom.parsers import Parser, WOKParser
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_data')
+
+def legacy_parse_record(content):
+    """
+    Original WOKParser.parse_content_item, which matched each line against a
+    regular expression, tested tags for membership in lists and built field
+    values by repeated string concatenation.
+    """
+    list_tags = ['AU', 'AF', 'CA', 'ED', 'CR']
+    semicolon_list_tags = ['ID', 'RI', 'OI']
+    paragraphs_tags = ['AB']
+    to_semicolon_list_tags = ['CR']
+
+    lines = content.splitlines()
+
+    record_dict = {
+        'content'   : content
+    }
+
+    current_key = None
+    current_value = None
+    semicolon_list = []
+
+    for line in lines:
+        if not line:
+            continue
+        if re.match(r'^[A-Z,0-9][A-Z,0-9](?:\s.*$|$)', line):
+            if current_key is not None:
+                if isinstance(current_value, str):
+                    current_value = current_value.strip()
+                if current_key in semicolon_list_tags:
+                    current_value = current_value.split(';')
+                    current_value = list(map(lambda x: x.strip(), current_value))
+                try:
+                    record_dict[WOKParser._field_tags[current_key]] = current_value
+                except KeyError: #field code not in list
+                    record_dict[current_key] = current_value
+                if semicolon_list:
+                    if record_dict.get(current_key) is not None:
+                        current_key = current_key + '2'
+                    sl_text = ''
+                    for item in semicolon_list:
+                        if sl_text != '':
+                            sl_text += ';'
+                        sl_text += item
+                    record_dict[current_key] = sl_text
+                    semicolon_list = []
+            current_key = line[:2]
+            if current_key in list_tags:
+                current_value = []
+            else: current_value = ''
+            line_text = line[3:]
+        else:
+            line_text = line
+
+        line_text = line_text.strip()
+
+        if current_key in list_tags:
+            current_value.append(line_text)
+            if current_key in to_semicolon_list_tags:
+                semicolon_list.append(line_text)
+        elif current_key in paragraphs_tags:
+            if current_value != '':
+                current_value += '\n'
+            current_value += line_text
+        else:
+            if current_value != '':
+                current_value += ' '
+            current_value += line_text
+
+    return record_dict
+
+def load_record_texts(paths):
+    """
+    Returns list of record texts in Web of Science files at paths.
+    """
+    file_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths.extend(Parser.list_files(path, recursive=True))
+        else:
+            file_paths.append(path)
+    texts = []
+    parser = WOKParser()
+    for file_path in sorted(file_paths):
+        if not WOKParser.is_parsable_file(file_path):
+            continue
+        texts.extend(record['content'] for record in parser.iter_file(file_path))
+        parser.encoding = None
+    return texts
+
+def time_parse(parse_function, texts, repeat):
+    """
+    Returns best records per second of parse_function over texts.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            parse_function(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(texts) / best
+
+def main():
+    """
+    Main program
+    """
+    arg_parser = argparse.ArgumentParser(description="Benchmark WOKParser record parsing.")
+    arg_parser.add_argument(
+        'paths',
+        metavar='file|directory',
+        nargs='*',
+        help="Web of Science files or directories to parse.")
+    arg_parser.add_argument(
+        '-n', '--repeat',
+        type=int,
+        default=5,
+        help="Number of timed runs (best is reported).")
+    args = arg_parser.parse_args()
+
+    texts = load_record_texts(args.paths or [TEST_DATA_DIR])
+    if not texts:
+        print("No Web of Science records found.")
+        sys.exit(1)
+
+    parser = WOKParser()
+    mismatches = sum(
+        1 for text in texts
+        if parser._parse_record(text) != legacy_parse_record(text)) #pylint: disable=protected-access
+    print("Records:        %d" % len(texts))
+    print("Mismatches:     %d" % mismatches)
+
+    before = time_parse(legacy_parse_record, texts, args.repeat)
+    after = time_parse(parser._parse_record, texts, args.repeat) #pylint: disable=protected-access
+    print("Before:         %.0f records/s" % before)
+    print("After:          %.0f records/s" % after)
+    print("Speedup:        %.2fx" % (after / before))
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
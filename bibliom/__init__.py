@@ -50,8 +50,9 @@ if DEBUG_MODE:
 from .dbmanager import DBManager
 from .dbtable import DBTable
 from .dbentity import DBEntity
-from .publication_objects import Paper, Author, Journal, Citation
+from .publication_objects import Paper, Author, Journal, Citation, prefetch_related
 from .parsers import Parser, WOKParser, WCHParser
 from .parser_db_adapter import parsed_records_to_db
+from .citation_graph import CitationGraph
 
 logging.getLogger(__name__).debug("Init complete.")
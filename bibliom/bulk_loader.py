@@ -0,0 +1,166 @@
+"""
+BulkLoader class.
+
+Bulk loads rows into database tables by spooling them to tab-separated files
+and loading each file with a single LOAD DATA LOCAL INFILE statement (see
+DBManager.load_data_infile). Meant for initial loads into empty tables, where
+it is much faster than INSERT statements. Ids of rows are assigned by the
+loader from an IdAllocator, so rows can reference one another by foreign key
+before anything has been written to the database.
+"""
+import os
+import shutil
+import logging
+import tempfile
+import datetime
+
+from bibliom.id_allocator import IdAllocator
+
+class BulkLoader:
+    """
+    Spools rows for one or more tables and loads them into the database.
+
+    Example:
+        with BulkLoader(manager) as loader:
+            idjournal = loader.next_id('journal')
+            loader.add_row('journal', {'idjournal': idjournal, 'title': 'Nature'})
+            loader.add_row('paper', {'idpaper': loader.next_id('paper'),
+                                     'idjournal': idjournal})
+            loader.load()
+    """
+    # Characters escaped in spooled values, as expected by LOAD DATA.
+    ESCAPES = str.maketrans({
+        '\\':   '\\\\',
+        '\t':   '\\t',
+        '\n':   '\\n',
+        '\r':   '\\r',
+        '\0':   '\\0'
+    })
+
+    def __init__(self, manager, spool_dir=None, disable_checks=False, id_allocator=None):
+        """
+        Args:
+            manager (DBManager): Manager for the destination database.
+            spool_dir (str): Directory for spool files. Defaults to a new
+                             temporary directory, removed by close().
+            disable_checks (bool): Turn off unique and foreign key checks while
+                                   loading. See DBManager.load_data_infile.
+            id_allocator (IdAllocator): Source of ids. Defaults to a new
+                                        IdAllocator for manager.
+        """
+        self.manager = manager
+        if id_allocator is None:
+            id_allocator = IdAllocator(manager)
+        self.id_allocator = id_allocator
+        self.disable_checks = disable_checks
+        self._remove_spool_dir = spool_dir is None
+        if spool_dir is None:
+            spool_dir = tempfile.mkdtemp(prefix='bibliom-')
+        self.spool_dir = spool_dir
+        self.row_counts = {}
+        self._files = {}
+        self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _format_value(value):
+        """
+        Returns value as a string for a spool file.
+        """
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return str(int(value))
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return str(value).translate(BulkLoader.ESCAPES)
+
+    def next_id(self, table_name):
+        """
+        Returns a new id for a row of table_name.
+        """
+        return self.id_allocator.next_id(table_name)
+
+    def add_row(self, table_name, row):
+        """
+        Spools row, a dict of column:value pairs, for table_name. Columns not
+        in the table are ignored and missing columns are NULL.
+        """
+        spool_file = self._files.get(table_name)
+        if spool_file is None:
+            columns = list(self.manager.table_fields(table_name))
+            self._columns[table_name] = columns
+            spool_file = open(os.path.join(self.spool_dir, table_name + '.tsv'),
+                              'w', encoding='utf-8', newline='\n')
+            self._files[table_name] = spool_file
+            self.row_counts[table_name] = 0
+        spool_file.write('\t'.join(
+            BulkLoader._format_value(row.get(column))
+            for column in self._columns[table_name]))
+        spool_file.write('\n')
+        self.row_counts[table_name] += 1
+
+    def _load_order(self):
+        """
+        Returns spooled table names ordered so that tables are loaded before
+        tables referencing them by foreign key.
+        """
+        remaining = list(self._files)
+        ordered = []
+        while remaining:
+            for table_name in remaining:
+                parents = {fk['referenced_table_name']
+                           for fk in self.manager.foreign_key_list(table_name)}
+                if not parents & (set(remaining) - {table_name}):
+                    break
+            else:
+                table_name = remaining[0]
+            remaining.remove(table_name)
+            ordered.append(table_name)
+        return ordered
+
+    def load(self):
+        """
+        Loads all spooled rows into the database and clears the spool.
+
+        Returns:
+            Dict of {table_name: rows loaded}.
+        """
+        loaded = {}
+        for spool_file in self._files.values():
+            spool_file.close()
+        for table_name in self._load_order():
+            spool_path = self._files[table_name].name
+            logging.getLogger(__name__).verbose_info(
+                "Bulk loading %s rows into %s.", self.row_counts[table_name], table_name)
+            loaded[table_name] = self.manager.load_data_infile(
+                table_name,
+                spool_path,
+                self._columns[table_name],
+                self.disable_checks)
+            if loaded[table_name] < self.row_counts[table_name]:
+                logging.getLogger(__name__).warning(
+                    "Skipped %s duplicate rows loading %s.",
+                    self.row_counts[table_name] - loaded[table_name], table_name)
+            del self._files[table_name]
+            del self.row_counts[table_name]
+            os.remove(spool_path)
+        return loaded
+
+    def close(self):
+        """
+        Discards rows that haven't been loaded and removes the spool directory
+        if it was created by the loader.
+        """
+        for spool_file in self._files.values():
+            spool_file.close()
+            os.remove(spool_file.name)
+        self._files = {}
+        self.row_counts = {}
+        if self._remove_spool_dir and os.path.isdir(self.spool_dir):
+            shutil.rmtree(self.spool_dir)
@@ -0,0 +1,425 @@
+"""
+CitationGraph class.
+
+In-memory citation graph for network analyses over the citation table. Papers
+are numbered 0 to n - 1 in order of idpaper, and citations are held as forward
+(papers cited) and reverse (papers citing) adjacency in compressed sparse row
+(CSR) form: the neighbors of paper i are indices[indptr[i]:indptr[i + 1]].
+Adjacency is stored in NumPy int32 arrays, so a graph takes 8 bytes per
+citation and 16 bytes per paper, and no Python object is created per citation.
+"""
+import logging
+
+import numpy as np
+
+from bibliom.constants import GRAPH_CHUNK_SIZE
+
+# dtype of node indices in adjacency arrays.
+INDEX_DTYPE = np.int32
+
+# Mask for the low (target) half of packed (source, target) edge keys.
+_LOW_MASK = 0xFFFFFFFF
+
+class PaperIndex:
+    """
+    Maps idpapers to their positions in a sorted array of idpapers.
+
+    When the idpapers are dense, as AUTO_INCREMENT ids usually are, positions
+    are kept in a lookup table indexed by idpaper, which is much faster than
+    binary searching the idpapers for large, unordered batches of ids.
+    """
+    # Max lookup table entries per idpaper before falling back to searching.
+    MAX_SPAN_RATIO = 4
+
+    def __init__(self, paper_ids):
+        """
+        Args:
+            paper_ids (np.ndarray): Sorted, unique idpapers.
+        """
+        self.paper_ids = paper_ids
+        self.table = None
+        self.first_id = 0
+        if len(paper_ids):
+            self.first_id = int(paper_ids[0])
+            span = int(paper_ids[-1]) - self.first_id + 1
+            if span <= PaperIndex.MAX_SPAN_RATIO * len(paper_ids):
+                self.table = np.full(span, -1, dtype=INDEX_DTYPE)
+                self.table[paper_ids - self.first_id] = np.arange(
+                    len(paper_ids), dtype=INDEX_DTYPE)
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the lookup table.
+        """
+        return 0 if self.table is None else self.table.nbytes
+
+    def find(self, idpapers):
+        """
+        Returns (positions, found) arrays for idpapers, an int64 array. found
+        is false, and the position meaningless, for idpapers not indexed.
+        """
+        if not len(self.paper_ids):
+            return (np.zeros(len(idpapers), dtype=np.int64),
+                    np.zeros(len(idpapers), dtype=bool))
+        if self.table is not None:
+            offsets = idpapers - self.first_id
+            found = (offsets >= 0) & (offsets < len(self.table))
+            positions = self.table[np.where(found, offsets, 0)].astype(np.int64)
+            found &= positions >= 0
+            return (positions, found)
+        positions = np.searchsorted(self.paper_ids, idpapers)
+        found = (self.paper_ids[np.minimum(positions, len(self.paper_ids) - 1)]
+                 == idpapers)
+        return (positions, found)
+
+class CitationGraph:
+    """
+    Forward and reverse CSR adjacency of the citation graph, with a mapping
+    between idpaper and node index.
+
+    Methods taking idpapers accept a single idpaper or a sequence of them,
+    and raise KeyError if any idpaper isn't in the graph.
+
+    Example:
+        graph = CitationGraph.from_db(manager)
+        graph.in_degree([12, 15])
+        graph.cited(12)
+        graph.expand([12], hops=2, direction='in')
+    """
+    DIRECTIONS = ('out', 'in', 'both')
+
+    def __init__(self, paper_ids, out_indptr, out_indices, in_indptr, in_indices):
+        """
+        Args:
+            paper_ids (np.ndarray): Sorted idpaper of each node.
+            out_indptr, out_indices (np.ndarray): CSR adjacency of cited papers.
+            in_indptr, in_indices (np.ndarray): CSR adjacency of citing papers.
+        """
+        self.paper_ids = paper_ids
+        self.paper_index = PaperIndex(paper_ids)
+        self.out_indptr = out_indptr
+        self.out_indices = out_indices
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def __repr__(self):
+        return '<CitationGraph: %s papers, %s citations>' % (
+            len(self), self.num_citations)
+
+    @property
+    def num_papers(self):
+        """
+        Number of papers (nodes) in the graph.
+        """
+        return len(self.paper_ids)
+
+    @property
+    def num_citations(self):
+        """
+        Number of citations (edges) in the graph.
+        """
+        return len(self.out_indices)
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the graph's arrays.
+        """
+        return (self.paper_ids.nbytes + self.paper_index.nbytes
+                + self.out_indptr.nbytes + self.out_indices.nbytes
+                + self.in_indptr.nbytes + self.in_indices.nbytes)
+
+    @classmethod
+    def from_edges(cls, sources, targets, paper_ids=None):
+        """
+        Builds a graph from arrays of citing and cited idpapers.
+
+        Args:
+            sources, targets (array-like): idpaper of citing and cited paper
+                                           of each citation.
+            paper_ids (array-like): idpapers of graph's nodes. Defaults to all
+                                    idpapers in sources and targets. Citations
+                                    of papers not in paper_ids are dropped.
+
+        Returns:
+            CitationGraph
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if len(sources) != len(targets):
+            raise ValueError("sources and targets must be the same length.")
+        if paper_ids is None:
+            paper_ids = np.unique(np.concatenate((sources, targets)))
+        else:
+            paper_ids = np.unique(np.asarray(paper_ids, dtype=np.int64))
+        keys = np.empty(len(sources), dtype=np.int64)
+        paper_index = PaperIndex(paper_ids)
+        num_keys = 0
+        for start in range(0, len(sources), GRAPH_CHUNK_SIZE):
+            end = start + GRAPH_CHUNK_SIZE
+            num_keys = cls._pack_edges(
+                paper_index, sources[start:end], targets[start:end], keys, num_keys)
+        if num_keys < len(sources):
+            logging.getLogger(__name__).warning(
+                "Dropped %s citations of papers not in graph.", len(sources) - num_keys)
+            keys.resize(num_keys, refcheck=False)
+        return cls._from_keys(paper_ids, keys)
+
+    @classmethod
+    def from_db(cls, manager, batch_size=None):
+        """
+        Loads the citation graph of all papers in manager's database.
+
+        The paper and citation tables are streamed with DBManager.iter_rows,
+        and citations are packed into one int64 array as they arrive, so peak
+        memory is about 12 bytes per citation.
+
+        Args:
+            manager (DBManager): Manager of database to load.
+            batch_size (int): Rows read from the server at a time. Defaults to
+                              STREAM_BATCH_SIZE.
+
+        Returns:
+            CitationGraph
+        """
+        paper_ids = np.empty(manager.table_row_count('paper'), dtype=np.int64)
+        num_papers = 0
+        for batch in manager.iter_rows(
+                'paper', columns=['idpaper'], batch_size=batch_size, batches=True):
+            if num_papers + len(batch) > len(paper_ids):
+                paper_ids.resize(2 * (num_papers + len(batch)), refcheck=False)
+            paper_ids[num_papers:num_papers + len(batch)] = np.fromiter(
+                (row['idpaper'] for row in batch), dtype=np.int64, count=len(batch))
+            num_papers += len(batch)
+        paper_ids.resize(num_papers, refcheck=False)
+        paper_ids.sort()
+        paper_index = PaperIndex(paper_ids)
+
+        keys = np.empty(manager.table_row_count('citation'), dtype=np.int64)
+        num_keys = 0
+        num_citations = 0
+        for batch in manager.iter_rows(
+                'citation', columns=['source_id', 'target_id'],
+                batch_size=batch_size, batches=True):
+            if num_keys + len(batch) > len(keys):
+                keys.resize(2 * (num_keys + len(batch)), refcheck=False)
+            sources = np.fromiter(
+                (row['source_id'] for row in batch), dtype=np.int64, count=len(batch))
+            targets = np.fromiter(
+                (row['target_id'] for row in batch), dtype=np.int64, count=len(batch))
+            num_keys = cls._pack_edges(paper_index, sources, targets, keys, num_keys)
+            num_citations += len(batch)
+        keys.resize(num_keys, refcheck=False)
+        if num_keys < num_citations:
+            logging.getLogger(__name__).warning(
+                "Dropped %s citations of papers not in paper table.", num_citations - num_keys)
+        logging.getLogger(__name__).verbose_info(
+            "Loaded %s papers and %s citations.", num_papers, num_keys)
+        return cls._from_keys(paper_ids, keys)
+
+    @staticmethod
+    def _pack_edges(paper_index, sources, targets, keys, start):
+        """
+        Writes (source index << 32 | target index) of each citation to keys,
+        beginning at keys[start]. Citations with an idpaper not in
+        paper_index are skipped.
+
+        Returns:
+            Index in keys following last key written.
+        """
+        (source_indices, source_found) = paper_index.find(sources)
+        (target_indices, target_found) = paper_index.find(targets)
+        found = source_found & target_found
+        if not found.all():
+            source_indices = source_indices[found]
+            target_indices = target_indices[found]
+        end = start + len(source_indices)
+        keys[start:end] = (source_indices << 32) | target_indices
+        return end
+
+    @classmethod
+    def _from_keys(cls, paper_ids, keys):
+        """
+        Builds a graph from packed edge keys (see _pack_edges). keys is sorted
+        and reused, in place, for the reverse adjacency.
+        """
+        num_papers = len(paper_ids)
+        if num_papers > np.iinfo(INDEX_DTYPE).max:
+            raise ValueError("Too many papers for %s node indices." % np.dtype(INDEX_DTYPE).name)
+        keys.sort()
+        out_indptr = cls._indptr(keys, num_papers)
+        out_indices = np.empty(len(keys), dtype=INDEX_DTYPE)
+        for start in range(0, len(keys), GRAPH_CHUNK_SIZE):
+            end = start + GRAPH_CHUNK_SIZE
+            out_indices[start:end] = keys[start:end] & _LOW_MASK
+
+        # Swap halves of keys to (target, source) and sort for reverse adjacency.
+        for start in range(0, len(keys), GRAPH_CHUNK_SIZE):
+            end = start + GRAPH_CHUNK_SIZE
+            keys[start:end] = ((keys[start:end] & _LOW_MASK) << 32) | (keys[start:end] >> 32)
+        keys.sort()
+        in_indptr = cls._indptr(keys, num_papers)
+
+        # Compact sources into the front of keys' buffer, so reverse indices
+        # don't need another allocation. Each chunk is written behind the
+        # keys still to be read.
+        num_keys = len(keys)
+        packed = keys.view(INDEX_DTYPE)
+        for start in range(0, num_keys, GRAPH_CHUNK_SIZE):
+            end = min(start + GRAPH_CHUNK_SIZE, num_keys)
+            packed[start:end] = keys[start:end] & _LOW_MASK
+        del packed
+        keys.resize((num_keys + 1) // 2, refcheck=False)
+        in_indices = keys.view(INDEX_DTYPE)[:num_keys]
+        return cls(paper_ids, out_indptr, out_indices, in_indptr, in_indices)
+
+    @staticmethod
+    def _indptr(keys, num_papers):
+        """
+        Returns CSR index pointers of sorted packed edge keys: row i of keys
+        is keys[indptr[i]:indptr[i + 1]].
+        """
+        indptr = np.searchsorted(keys, np.arange(num_papers + 1, dtype=np.int64) << 32)
+        if len(keys) <= np.iinfo(INDEX_DTYPE).max:
+            indptr = indptr.astype(INDEX_DTYPE)
+        return indptr
+
+    def index_of(self, idpapers):
+        """
+        Returns node index of idpapers: an int for a single idpaper, or an
+        array of indices for a sequence.
+        """
+        indices = self._indices(idpapers)
+        if np.ndim(idpapers) == 0:
+            return int(indices[0])
+        return indices
+
+    def ids_of(self, indices):
+        """
+        Returns idpapers of node indices.
+        """
+        return self.paper_ids[indices]
+
+    def _indices(self, idpapers):
+        """
+        Returns array of node indices of idpapers.
+        """
+        idpapers = np.atleast_1d(np.asarray(idpapers, dtype=np.int64))
+        (indices, found) = self.paper_index.find(idpapers)
+        if not found.all():
+            raise KeyError("Papers not in graph: %s" % idpapers[~found][:10].tolist())
+        return indices
+
+    def _adjacency(self, direction):
+        """
+        Returns list of (indptr, indices) for direction.
+        """
+        if direction == 'out':
+            return [(self.out_indptr, self.out_indices)]
+        if direction == 'in':
+            return [(self.in_indptr, self.in_indices)]
+        if direction == 'both':
+            return [(self.out_indptr, self.out_indices), (self.in_indptr, self.in_indices)]
+        raise ValueError("direction must be one of %s." % (CitationGraph.DIRECTIONS,))
+
+    @staticmethod
+    def _degree(indptr, indices):
+        return (indptr[indices + 1] - indptr[indices]).astype(np.int64)
+
+    def out_degree(self, idpapers=None):
+        """
+        Returns number of papers cited by each of idpapers, or by every
+        paper, in node order, if idpapers is None.
+        """
+        if idpapers is None:
+            return np.diff(self.out_indptr).astype(np.int64)
+        degree = CitationGraph._degree(self.out_indptr, self._indices(idpapers))
+        return int(degree[0]) if np.ndim(idpapers) == 0 else degree
+
+    def in_degree(self, idpapers=None):
+        """
+        Returns number of papers citing each of idpapers, or every paper, in
+        node order, if idpapers is None.
+        """
+        if idpapers is None:
+            return np.diff(self.in_indptr).astype(np.int64)
+        degree = CitationGraph._degree(self.in_indptr, self._indices(idpapers))
+        return int(degree[0]) if np.ndim(idpapers) == 0 else degree
+
+    @staticmethod
+    def _gather(indptr, indices, nodes):
+        """
+        Returns concatenated neighbor indices of nodes.
+        """
+        starts = indptr[nodes].astype(np.int64)
+        lengths = indptr[nodes + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        # Position of each neighbor is its node's start plus its offset
+        # within the node's neighbors.
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return indices[offsets + np.arange(total)]
+
+    def neighbors(self, idpapers, direction='out'):
+        """
+        Returns sorted idpapers of papers adjacent to idpapers.
+
+        Args:
+            idpapers (int or [int]): Papers to find neighbors of.
+            direction (str): 'out' for papers cited, 'in' for papers citing,
+                             or 'both'.
+
+        Returns:
+            np.ndarray of idpaper.
+        """
+        nodes = self._indices(idpapers)
+        neighbors = [CitationGraph._gather(indptr, indices, nodes)
+                     for (indptr, indices) in self._adjacency(direction)]
+        return self.paper_ids[np.unique(np.concatenate(neighbors))]
+
+    def cited(self, idpapers):
+        """
+        Returns sorted idpapers of papers cited by idpapers.
+        """
+        return self.neighbors(idpapers, 'out')
+
+    def citing(self, idpapers):
+        """
+        Returns sorted idpapers of papers citing idpapers.
+        """
+        return self.neighbors(idpapers, 'in')
+
+    def expand(self, idpapers, hops=1, direction='out'):
+        """
+        Returns sorted idpapers of papers within hops citations of idpapers,
+        including idpapers themselves.
+
+        Args:
+            idpapers (int or [int]): Papers to expand from.
+            hops (int): Number of citations to follow.
+            direction (str): 'out' to follow citations to cited papers, 'in'
+                             to citing papers, or 'both'.
+
+        Returns:
+            np.ndarray of idpaper.
+        """
+        if hops < 0:
+            raise ValueError("hops must not be negative.")
+        adjacency = self._adjacency(direction)
+        visited = np.zeros(len(self.paper_ids), dtype=bool)
+        frontier = np.unique(self._indices(idpapers))
+        visited[frontier] = True
+        for _ in range(hops):
+            reached = np.concatenate([CitationGraph._gather(indptr, indices, frontier)
+                                      for (indptr, indices) in adjacency])
+            reached = reached[~visited[reached]]
+            if not len(reached):
+                break
+            frontier = np.unique(reached)
+            visited[frontier] = True
+        return self.paper_ids[np.flatnonzero(visited)]
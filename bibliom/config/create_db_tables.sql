@@ -186,3 +186,10 @@ CREATE TABLE IF NOT EXISTS `paper_modularity_class` (
 ENGINE = InnoDB
 DEFAULT CHARACTER SET = utf8mb4;
 
+
+CREATE TABLE IF NOT EXISTS `id_sequence` (
+  `table_name` VARCHAR(64) NOT NULL,
+  `next_id` BIGINT NOT NULL,
+  PRIMARY KEY (`table_name`))
+ENGINE = InnoDB
+DEFAULT CHARACTER SET = utf8mb4;
@@ -0,0 +1,229 @@
+"""
+ConnectionPool class.
+
+Pool of database connections shared by the threads using a DBManager. Each
+thread checks out its own connection, so that queries and transactions in
+different threads don't interfere with one another.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+
+from bibliom import exceptions
+from bibliom.constants import POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT
+
+class ConnectionPool:
+    """
+    Thread-safe pool of between min_size and max_size open connections.
+
+    Connections are health-checked with ping() when checked out, and replaced
+    if they have gone away. Any open transaction is rolled back when a
+    connection is returned to the pool. Checked-out connections are tracked,
+    so that closing the pool closes them too.
+    """
+    def __init__(self, connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT):
+        """
+        Args:
+            connect (callable): Function returning a new connection.
+            min_size (int): Number of connections opened when pool is created.
+            max_size (int): Maximum number of connections open at once.
+            timeout (float): Seconds to wait for a connection when max_size
+                             connections are checked out. None waits forever.
+        """
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.closed = False
+        self.stats = {
+            'checkouts':    0,
+            'created':      0,
+            'discarded':    0,
+            'waits':        0
+        }
+        self._idle = deque()
+        self._in_use = set()
+        self._size = 0
+        self._condition = threading.Condition()
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append(self._new_connection())
+
+    def __len__(self):
+        """
+        Number of open connections, whether idle or checked out.
+        """
+        return self._size
+
+    @property
+    def idle(self):
+        """
+        Number of open connections available for checkout.
+        """
+        return len(self._idle)
+
+    def _new_connection(self):
+        """
+        Opens a new connection for a slot already counted in self._size.
+        """
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.stats['created'] += 1
+        return connection
+
+    def _check_out(self, connection):
+        """
+        Records connection as checked out and returns it. If the pool was
+        closed while connection was being checked out, closes it and raises.
+        """
+        with self._condition:
+            if not self.closed:
+                self._in_use.add(connection)
+                return connection
+            self._size -= 1
+            self._condition.notify_all()
+        self._close_connection(connection)
+        raise exceptions.BiblioException("Connection pool is closed.")
+
+    @staticmethod
+    def _close_connection(connection):
+        """
+        Closes connection, logging rather than raising errors.
+        """
+        try:
+            connection.close()
+        except (MySQLdb.Error, MySQLdb.Warning):
+            logging.getLogger(__name__).exception("Failed to close database connection.")
+
+    def acquire(self, block=True):
+        """
+        Checks out a connection, opening a new one if none are idle and fewer
+        than max_size are open. Otherwise waits up to timeout seconds for one to
+        be released.
+
+        Args:
+            block (bool): If false, returns None at once instead of waiting.
+
+        Raises:
+            PoolTimeoutError if no connection became available within timeout.
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self.closed:
+                    raise exceptions.BiblioException("Connection pool is closed.")
+                if self._idle:
+                    connection = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection = None
+                    break
+                if not block:
+                    return None
+                self.stats['waits'] += 1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise exceptions.PoolTimeoutError(
+                        "No database connection available after %s seconds." % self.timeout)
+                self._condition.wait(remaining)
+            self.stats['checkouts'] += 1
+
+        if connection is not None:
+            try:
+                connection.ping()
+            except MySQLdb.Error:
+                logging.getLogger(__name__).debug("Replacing dead database connection.")
+                with self._condition:
+                    self.stats['discarded'] += 1
+                self._close_connection(connection)
+                connection = None
+        if connection is None:
+            connection = self._new_connection()
+        return self._check_out(connection)
+
+    def release(self, connection):
+        """
+        Returns a checked-out connection to the pool. If the pool has been
+        closed, the connection is closed instead. Connections already closed
+        with the pool are ignored.
+        """
+        try:
+            connection.rollback()
+        except MySQLdb.Error:
+            self.discard(connection)
+            return
+        with self._condition:
+            if connection not in self._in_use:
+                return
+            self._in_use.remove(connection)
+            if not self.closed:
+                self._idle.append(connection)
+                self._condition.notify()
+                return
+            self._size -= 1
+            self._condition.notify_all()
+        self._close_connection(connection)
+
+    def discard(self, connection):
+        """
+        Closes a checked-out connection instead of returning it to the pool.
+        Connections already closed with the pool are ignored.
+        """
+        with self._condition:
+            if connection not in self._in_use:
+                return
+            self._in_use.remove(connection)
+            self._size -= 1
+            self.stats['discarded'] += 1
+            self._condition.notify_all()
+        self._close_connection(connection)
+
+    def close(self, timeout=None):
+        """
+        Closes all connections. Idle connections are closed at once. Checked-out
+        connections are closed as they are released, and any still checked out
+        after timeout seconds are closed anyway.
+
+        Args:
+            timeout (float): Seconds to wait for checked-out connections to be
+                             released. Defaults to the pool's timeout.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        with self._condition:
+            self.closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close_connection(connection)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._in_use:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            in_use = list(self._in_use)
+            self._in_use.clear()
+            self._size -= len(in_use)
+        if in_use:
+            logging.getLogger(__name__).warning(
+                "Closing %d database connections still checked out.", len(in_use))
+        for connection in in_use:
+            self._close_connection(connection)
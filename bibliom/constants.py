@@ -10,3 +10,56 @@ REPORT_FREQUENCY = 5000
 
 # Max retries on database queries
 MAX_DB_RETRIES = 5
+
+# Default database server.
+DB_HOST = 'localhost'
+DB_PORT = 3306
+
+# Default number of pooled connections opened on connect, max number open at
+# once, and seconds to wait for a free connection.
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+POOL_TIMEOUT = 30
+
+# Table recording the next unreserved id of tables, used by
+# DBManager.reserve_ids, and number of ids IdAllocator reserves at a time.
+ID_SEQUENCE_TABLE = 'id_sequence'
+ID_BLOCK_SIZE = 1000
+
+# Max rows per statement for batched inserts and upserts.
+BULK_CHUNK_SIZE = 500
+
+# Rows read at a time when streaming rows with DBManager.iter_rows.
+STREAM_BATCH_SIZE = 10000
+
+# Number of parsed records imported into the database at a time.
+IMPORT_CHUNK_SIZE = 5000
+
+# Max ids per IN query when prefetching related entities.
+PREFETCH_CHUNK_SIZE = 5000
+
+# Edges processed at a time when building a CitationGraph, bounding the size
+# of temporary arrays.
+GRAPH_CHUNK_SIZE = 1 << 20
+
+# Max pair products computed at a time when building co-citation and
+# bibliographic coupling networks.
+NETWORK_CHUNK_SIZE = 1 << 22
+
+# Default limits on rows cached by each DBTable. None for no limit.
+ROW_CACHE_MAX_ROWS = None
+ROW_CACHE_MAX_BYTES = None
+
+class Duplicates:
+    """
+    How to handle duplicate entries when inserting rows.
+
+    SKIP: Skip inserting the row, leaving original entry unchanged.
+    INSERT: Insert new value if old value is unset 
+    OVERWRITE: New values overwrite old values but unset fields in new row left unchanged.
+    REPLACE: Old row is dropped and new row inserted in its place.
+    """
+    SKIP = 1
+    INSERT = 2
+    OVERWRITE = 3
+    REPLACE = 4
@@ -2,17 +2,104 @@
 DBEntity class.
 """
 import logging
+import functools
+from collections.abc import Mapping
 
 from bibliom import exceptions
 from bibliom.dbtable import DBTable
 from bibliom.dbmanager import DBManager
 
+def related(fetch):
+    """
+    Decorator making fetch, a method fetching entities related to an entity, a
+    property. If the relationship has been loaded by
+    publication_objects.prefetch_related, the cached value is returned instead.
+    """
+    name = fetch.__name__
+
+    @functools.wraps(fetch)
+    def getter(self):
+        cache = self._related
+        if cache is not None and name in cache:
+            return cache[name]
+        return fetch(self)
+    return property(getter)
+
+class FieldDescriptor:
+    """
+    Attribute of a generated entity class for one field of its table. Reads and
+    writes are index operations on the entity's row in the table's RowStore.
+    If the row isn't cached or the field is deferred, they fall back to
+    DBEntity.get_field and DBTable.set_field, which load it first.
+    """
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        table = entity.table
+        try:
+            value = table.rows.get_value(entity.row_key, self.index)
+        except KeyError:
+            return entity.get_field(self.name)
+        if table.cache_bounded:
+            table.rows.touch(entity.row_key)
+        return value
+
+    def __set__(self, entity, value):
+        if entity.protect_fields and self.__get__(entity) is not None:
+            return
+        if not entity.table.set_cached_field(entity.row_key, self.index, value):
+            entity.table.set_field(entity.row_key, self.name, value)
+
 class DBEntity:
     """
     Class representing a single row in a table. Each DBEntity is associated
     with a DBTable object and conducts all database transactions through that
-    object.
+    object. While an entity exists, its row is pinned in the table's row cache.
+
+    Entities are instances of a subclass generated for each entity class and
+    table (see entity_class), which has __slots__ and a FieldDescriptor for
+    each field of the table, so entities are small and field access doesn't go
+    through __getattr__. Subclasses storing attributes of their own should
+    declare them in __slots__.
+
+    Live entities are recorded by row key in the table's identity map,
+    table.entities. fetch, fetch_entities and entity_from_row return the
+    recorded entity for a row rather than a new one, and don't query the
+    database when the row is cached and selected by primary key or by a unique
+    column (see DBTable.lookup).
+
+    Fields listed in deferred_fields aren't fetched by fetch_entities and fetch
+    unless columns are given. They are loaded on first access, in one query for
+    all entities of the table that have deferred them.
     """
+    __slots__ = ('table', 'row_key', 'protect_fields', '_related', '__weakref__')
+
+    # Fields, typically large text columns, not fetched until accessed.
+    deferred_fields = ()
+
+    # Table of entities of the class when no table is given.
+    default_table = None
+
+    # Generated entity classes by (class, table fields).
+    _entity_classes = {}
+
+    def __new__(cls, table=None, manager=None, *args, **kwargs):
+        if table is None:
+            table = cls.default_table
+        table = DBEntity._table_object(table, manager)
+        entity = object.__new__(cls.entity_class(table))
+        object.__setattr__(entity, 'table', table)
+        object.__setattr__(entity, 'row_key', None)
+        object.__setattr__(entity, 'protect_fields', False)
+        object.__setattr__(entity, '_related', None)
+        return entity
+
     def __init__(self,
                  table,
                  manager=None,
@@ -20,19 +107,8 @@ class DBEntity:
                  fields_dict=None,
                  protect_fields=False,
                  **kwargs):
-        if isinstance(table, str):
-            if manager is None:
-                manager = DBManager.get_manager()
-                if manager is None:
-                    raise exceptions.BiblioException(
-                        'Attempting to create DBEntity, but not given DBTable ' +
-                        'instance or manager, and no default manager found.'
-                    )
-            table = DBTable.get_table_object(table, manager)
-        if not isinstance(table, DBTable):
-            raise TypeError('table must be DBTable or table name as string')    
-
-        self.__dict__['table'] = table
+        # table is resolved to a DBTable by __new__.
+        table = self.table
 
         self.protect_fields = protect_fields
 
@@ -42,24 +118,71 @@ class DBEntity:
             fields_dict = {**fields_dict, **kwargs}
 
         if row_key:
-            self.row_key = row_key
-            self.table.get_row_by_key(row_key)
+            self._set_row_key(row_key)
+            self.table.get_row_by_key(self.row_key, fields=())
             if fields_dict:
                 for key, value in fields_dict:
                     self.set_field(key, value)
         else:
-            self.row_key = self.table.create_new_row(fields_dict)
+            self._set_row_key(self.table.create_new_row(fields_dict))
+
+    def __del__(self):
+        if self.row_key is not None:
+            self.table.unpin_row(self.row_key)
+
+    @staticmethod
+    def _table_object(table, manager=None):
+        """
+        Returns DBTable for table, a DBTable or a table name.
+        """
+        if isinstance(table, str):
+            if manager is None:
+                manager = DBManager.get_manager()
+                if manager is None:
+                    raise exceptions.BiblioException(
+                        'Attempting to create DBEntity, but not given DBTable ' +
+                        'instance or manager, and no default manager found.'
+                    )
+            table = DBTable.get_table_object(table, manager)
+        if not isinstance(table, DBTable):
+            raise TypeError('table must be DBTable or table name as string')
+        return table
 
-        if self.row_key not in table.entites.keys():
-            table.entites[row_key] = self
+    @classmethod
+    def entity_class(cls, table):
+        """
+        Returns the class of entities of cls for table: a subclass of cls with
+        empty __slots__ and a FieldDescriptor for each field of table that
+        isn't already an attribute of cls. Classes are generated once per
+        class and list of fields.
+        """
+        if cls.__dict__.get('_generated'):
+            cls = cls.__base__
+        fields = table.rows.fields
+        entity_class = DBEntity._entity_classes.get((cls, fields))
+        if entity_class is None:
+            namespace = {
+                '__slots__':    (),
+                '__module__':   cls.__module__,
+                '__qualname__': cls.__qualname__,
+                '__doc__':      cls.__doc__,
+                '__setattr__':  object.__setattr__,
+                '_generated':   True
+            }
+            for index, field in enumerate(fields):
+                if not hasattr(cls, field):
+                    namespace[field] = FieldDescriptor(field, index)
+            entity_class = type(cls.__name__, (cls,), namespace)
+            DBEntity._entity_classes[(cls, fields)] = entity_class
+        return entity_class
 
     def __getattr__(self, attr_name):
-        if attr_name in self.table.fields:
+        if attr_name in self.table.rows.field_index:
             return self.get_field(attr_name)
         raise exceptions.BiblioException(attr_name + ' not in DBTable.fields.')
 
     def __setattr__(self, attr_name, value):
-        if attr_name in self.table.fields:
+        if attr_name in self.table.rows.field_index:
             if self.protect_fields and self.get_field(attr_name) is not None:
                 return
             self.set_field(attr_name, value)
@@ -91,6 +214,34 @@ class DBEntity:
                     key, value, max_key_length=max_key_length)
         return rep_string
 
+    def _set_row_key(self, row_key):
+        """
+        Sets row_key of entity, moving its pin in the table's row cache and
+        its entry in the table's identity map from the old row to the new one.
+        The pin is released when the entity is garbage collected.
+        """
+        row_key = self.table.make_key(row_key)
+        old_key = self.row_key
+        if old_key is not None:
+            self.table.unpin_row(old_key)
+            if self.table.entities.get(old_key) is self:
+                del self.table.entities[old_key]
+        self.table.pin_row(row_key)
+        object.__setattr__(self, 'row_key', row_key)
+        self.table.entities.setdefault(row_key, self)
+
+    @classmethod
+    def entity_for_key(cls, table, row_key):
+        """
+        Returns the entity for row_key in table's identity map if it is an
+        instance of cls, or else a new entity of cls for row_key.
+        """
+        row_key = table.make_key(row_key)
+        entity = table.entities.get(row_key)
+        if isinstance(entity, cls):
+            return entity
+        return cls(table, row_key=row_key)
+
     @classmethod
     def entities_from_table_rows(cls, table, rows):
         """
@@ -98,15 +249,15 @@ class DBEntity:
         """
         if not rows:
             return []
-        if not isinstance(rows, dict):
+        if not isinstance(rows, Mapping):
             raise TypeError('rows must be dictionary of table rows indexed by row_key')
         if not isinstance(table, DBTable):
             raise TypeError('table must be DBTable object')
-        entities = [cls(table=table, row_key=key) for key in rows.keys()]
+        entities = [cls.entity_for_key(table, key) for key in rows.keys()]
         return entities
 
     @classmethod
-    def fetch_entities(cls, table, where_dict=None, **kwargs):
+    def fetch_entities(cls, table, where_dict=None, columns=None, **kwargs):
         """
         Returns a list of entities from table matching where_dict.
 
@@ -116,8 +267,14 @@ class DBEntity:
                         "IS NULL", "IS NOT NULL", or a list of values.
                         For comparison operators (>, <, >=, <=, !=) there must
                         be a space between operator and value.
+            columns ([str]): Columns to fetch. Other columns are loaded when
+                             accessed. Defaults to all columns except
+                             deferred_fields.
             **kwargs: Each additional keyword argument adds filter to column
                       following rules for where_dict.
+
+        Entities of cached rows selected by primary key values, or by a unique
+        key (see DBTable.cached_row_key), are returned without a query.
         """
         if not isinstance(table, DBTable):
             raise TypeError("table must be DBTable object")
@@ -127,11 +284,33 @@ class DBEntity:
             where_dict = {**where_dict, **kwargs}
         if not where_dict:
             return None
-        rows = table.fetch_rows(where_dict)
-        return cls.entities_from_table_rows(table, rows)
+        if columns is None and cls.deferred_fields:
+            columns = [field for field in table.fields if field not in cls.deferred_fields]
+
+        row_key = table.cached_row_key(where_dict)
+        if row_key is not None:
+            return [cls.entity_for_key(table, row_key)]
+        entities = []
+        key_column = table.key_columns[0] if len(table.key_columns) == 1 else None
+        key_values = where_dict.get(key_column)
+        if len(where_dict) == 1 and isinstance(key_values, list):
+            missing = []
+            for value in dict.fromkeys(key_values):
+                row_key = table.cached_row_key({key_column: value})
+                if row_key is None:
+                    missing.append(value)
+                else:
+                    entities.append(cls.entity_for_key(table, row_key))
+            if not missing:
+                return entities
+            where_dict = {key_column: missing}
+
+        rows = table.fetch_rows(where_dict, columns=columns)
+        entities.extend(cls.entities_from_table_rows(table, rows))
+        return entities
 
     @classmethod
-    def fetch(cls, table, where_dict=None, **kwargs):
+    def fetch(cls, table, where_dict=None, columns=None, **kwargs):
         """
         Returns a single entity from table matching where_dict.
 
@@ -141,10 +320,11 @@ class DBEntity:
                         "IS NULL", "IS NOT NULL", or a list of values.
                         For comparison operators (>, <, >=, <=, !=) there must
                         be a space between operator and value.
+            columns ([str]): Columns to fetch. See fetch_entities.
             **kwargs: Each additional keyword argument adds filter to column
                       following rules for where_dict.
         """
-        entity_list = cls.fetch_entities(table, where_dict, **kwargs)
+        entity_list = cls.fetch_entities(table, where_dict, columns, **kwargs)
         if entity_list:
             if entity_list[0] is not None:
                 logging.getLogger(__name__).debug('Entity.fetch: entity is not None.')
@@ -158,7 +338,7 @@ class DBEntity:
         """
         row = table.get_row_by_key(row_key)
         if row:
-            return cls(table, row_key=row_key)
+            return cls.entity_for_key(table, row_key)
         raise ValueError("row_key %s not in table %s" % (row_key, table.table_name))
 
     @classmethod
@@ -177,6 +357,28 @@ class DBEntity:
         """
         return self.table.get_row_by_key(self.row_key)
 
+    def cache_related(self, name, value):
+        """
+        Caches value of relationship name, returned by the related property
+        name until clear_related is called.
+        """
+        if self._related is None:
+            self._related = {}
+        self._related[name] = value
+
+    def clear_related(self):
+        """
+        Clears cached relationships, so that they are fetched again.
+        """
+        self._related = None
+
+    @property
+    def dirty_fields(self):
+        """
+        Returns tuple of fields changed since entity was last synced to db.
+        """
+        return self.table.dirty_fields(self.row_key)
+
     def append(self, other, overwrite=False):
         """
         Append other's fields to entity. By default, only append fields
@@ -193,7 +395,7 @@ class DBEntity:
         """
         Returns the value of a field.
         """
-        return self.table.get_row_by_key(self.row_key).get(field_name)
+        return self.table.get_row_by_key(self.row_key, fields=(field_name,)).get(field_name)
 
     def set_field(self, field_name, field_value):
         """
@@ -210,7 +412,7 @@ class DBEntity:
         Inserts entity into db and updates row_key.
         """
         new_row_key = self.table.insert_row(self.fields_dict, duplicates)
-        self.row_key = new_row_key
+        self._set_row_key(new_row_key)
 
     def delete_from_db(self):
         """
@@ -6,31 +6,59 @@ customizations should be done in another modue.
 import logging
 import re
 import os
+import threading
+from contextlib import contextmanager
 
 import MySQLdb
 
 from bibliom import exceptions
 from bibliom import settings
-from bibliom.constants import MAX_DB_RETRIES
+from bibliom.connection_pool import ConnectionPool
+from bibliom.constants import (MAX_DB_RETRIES, BULK_CHUNK_SIZE, STREAM_BATCH_SIZE, Duplicates,
+                               DB_HOST, DB_PORT, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT,
+                               ID_SEQUENCE_TABLE)
 
 class DBManager:
     """
     Class for managing connection to MySQL database. All SQL should be
     contained within this class, with other classes making requests to this
     class. This should maximize portability.
+
+    Connections are drawn from a ConnectionPool. Each thread gets its own
+    connection, returned by self.db, so manager methods can be called from
+    several threads at once. DBTable and DBEntity objects cache rows and are
+    not thread-safe; each thread should use its own.
     """
 
     manager_instances = []
 
     def __init__(self, name=None, user=None, password=None, charset="utf8mb4", use_unicode=True,
-                 config=None):
+                 config=None, host=None, port=None, pool_min_size=None, pool_max_size=None,
+                 pool_timeout=POOL_TIMEOUT):
+        self.pool = None
+        self._local = threading.local()
         self.name = name
         self.user = user
         self.password = password
+        self.host = DB_HOST if host is None else host
+        self.port = DB_PORT if port is None else int(port)
 
         self.charset = charset
         self.use_unicode = use_unicode
-        self.db = None
+        self.pool_min_size = POOL_MIN_SIZE if pool_min_size is None else int(pool_min_size)
+        self.pool_max_size = POOL_MAX_SIZE if pool_max_size is None else int(pool_max_size)
+        self.pool_timeout = pool_timeout
+
+        # Cached table metadata, loaded on first use by load_schema.
+        self.schema = None
+        self.stats = {
+            'metadata_queries': 0,
+            'schema_loads':     0,
+            'transactions':     0,
+            'savepoints':       0,
+            'commits':          0,
+            'rollbacks':        0
+        }
 
         try:
             self.connect()
@@ -74,6 +102,109 @@ class DBManager:
             rep_string += "{:15}: {}".format("Tables", table_names)
         return rep_string
 
+    @property
+    def db(self):
+        """
+        Database connection of the current thread, checked out from the pool
+        on first use. None if the manager isn't connected.
+        """
+        local = self._local
+        if getattr(local, 'pool', None) is not self.pool:
+            local.connection = None
+            local.pool = self.pool
+        if local.connection is None and self.pool is not None:
+            local.connection = self.pool.acquire()
+        return local.connection
+
+    @db.setter
+    def db(self, connection):
+        self._local.connection = connection
+        self._local.pool = self.pool
+
+    def release_connection(self):
+        """
+        Returns the current thread's connection to the pool, rolling back any
+        uncommitted transaction. The thread gets a connection again on its
+        next query. Worker threads should call this when they finish.
+        """
+        if self.in_transaction:
+            raise exceptions.BiblioException(
+                "Can't release connection inside a transaction.")
+        connection = getattr(self._local, 'connection', None)
+        pool = getattr(self._local, 'pool', None)
+        self._local.connection = None
+        if connection is not None and pool is not None:
+            pool.release(connection)
+
+    @property
+    def in_transaction(self):
+        """
+        True if the current thread is inside a transaction() block.
+        """
+        return getattr(self._local, 'transaction_depth', 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager grouping the statements run by the current thread into
+        one transaction. Methods that would otherwise commit after each
+        statement leave committing to the transaction, which is committed when
+        the block exits, or rolled back if it raises an exception.
+
+        Transactions can be nested. A nested block is a savepoint: if it raises,
+        only its own statements are rolled back.
+
+        Example:
+            with manager.transaction():
+                manager.insert_many_rows('author', authors)
+                manager.upsert_rows('paper', papers)
+        """
+        connection = self.db
+        if connection is None:
+            raise exceptions.BiblioException("Can't begin transaction: not connected to database.")
+        depth = getattr(self._local, 'transaction_depth', 0)
+        savepoint = None
+        if depth:
+            savepoint = 'bibliom_savepoint_%d' % depth
+            connection.cursor().execute("SAVEPOINT %s" % savepoint)
+            self.stats['savepoints'] += 1
+        else:
+            self.stats['transactions'] += 1
+        self._local.transaction_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.transaction_depth = depth
+            if savepoint is not None:
+                connection.cursor().execute("ROLLBACK TO SAVEPOINT %s" % savepoint)
+            else:
+                connection.rollback()
+                self.stats['rollbacks'] += 1
+            raise
+        self._local.transaction_depth = depth
+        if savepoint is not None:
+            connection.cursor().execute("RELEASE SAVEPOINT %s" % savepoint)
+        else:
+            connection.commit()
+            self.stats['commits'] += 1
+
+    def _commit(self):
+        """
+        Commits the current statement, unless inside a transaction() block.
+        """
+        if not self.in_transaction:
+            self.db.commit()
+            self.stats['commits'] += 1
+
+    def _rollback(self):
+        """
+        Rolls back after a failed statement, unless inside a transaction()
+        block, which is rolled back if the error propagates out of it.
+        """
+        if not self.in_transaction:
+            self.db.rollback()
+            self.stats['rollbacks'] += 1
+
     def __setattr__(self, attr_name, value):
         # Ensure that each db only has one manager.
         if attr_name == 'name':
@@ -104,10 +235,10 @@ class DBManager:
                         try:
                             result = cursor.execute(statement)
                             if result:
-                                self.db.commit()
+                                self._commit()
                             break
                         except MySQLdb.Error:
-                            self.db.rollback()
+                            self._rollback()
                             if retries < MAX_DB_RETRIES:
                                 retries += 1
                                 continue
@@ -121,6 +252,8 @@ class DBManager:
         Run SQL statements contained in file.
         """
         logging.getLogger(__name__).debug("Running SQL file %s", sql_source_file)
+        # SQL files may contain DDL, so cached table metadata can't be trusted.
+        self.invalidate_schema()
         try:
             with open(sql_source_file, 'r') as f:
                 sql_source = f.read()
@@ -278,7 +411,11 @@ class DBManager:
         manager = cls(name=options.get('database'),
                       user=options.get('user'),
                       password=options.get('password'),
-                      config=config)
+                      config=config,
+                      host=options.get('host'),
+                      port=options.get('port'),
+                      pool_min_size=options.get('pool_min_size'),
+                      pool_max_size=options.get('pool_max_size'))
         return manager
 
     @classmethod
@@ -306,60 +443,79 @@ class DBManager:
         )
         
 
+    def _new_connection(self, **connect_options):
+        """
+        Opens and returns a new connection to the database. Used by the pool.
+
+        Args:
+            **connect_options: Additional arguments for MySQLdb.connect.
+        """
+        retries = 0
+        while True:
+            try:
+                connection = MySQLdb.connect(
+                    host=self.host,
+                    port=self.port,
+                    user=self.user,
+                    passwd=self.password,
+                    db=self.name,
+                    charset=self.charset,
+                    use_unicode=self.use_unicode,
+                    connect_timeout=5,
+                    **connect_options
+                )
+            except MySQLdb.Error as e:
+                if retries < MAX_DB_RETRIES:
+                    retries += 1
+                    continue
+                #Unknown database
+                if e.args[0] == 1049:
+                    raise exceptions.UnknownDatabaseError("Database %s not found" % self.name)
+                else:
+                    logging.getLogger(__name__).debug("Failed to connect to database.")
+                    raise
+            else:
+                logging.getLogger(__name__).debug("Successfully connected to database.")
+                return connection
+
     def connect(self):
         """
-        Connect to the database.
+        Connect to the database, creating a connection pool and checking out a
+        connection for the current thread.
         """
         if (self.user is not None
                 and self.password is not None
                 and self.name is not None):
             logging.getLogger(__name__).debug(
-                "Connecting to database %s as %s", self.name, self.user)
-            retries = 0
-            while True:
-                try:
-                    self.db = MySQLdb.connect(
-                        "localhost",
-                        self.user,
-                        self.password,
-                        self.name,
-                        charset=self.charset,
-                        use_unicode=self.use_unicode,
-                        connect_timeout=5
-                    )
-                except MySQLdb.Error as e:
-                    if retries < MAX_DB_RETRIES:
-                        retries += 1
-                        continue
-                    #Unknown database
-                    if e.args[0] == 1049:
-                        raise exceptions.UnknownDatabaseError("Database %s not found" % self.name)
-                    else:
-                        logging.getLogger(__name__).debug("Failed to connect to database.")
-                        raise
-                else:
-                    logging.getLogger(__name__).debug("Successfully connected to database.")
-                    return
+                "Connecting to database %s as %s on %s:%s",
+                self.name, self.user, self.host, self.port)
+            if self.pool is not None:
+                self.close()
+            pool = ConnectionPool(
+                self._new_connection,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                timeout=self.pool_timeout
+            )
+            self.pool = pool
+            try:
+                self.db = pool.acquire()
+            except MySQLdb.Error:
+                self.pool = None
+                pool.close()
+                raise
 
     def close(self):
         """
-        Close database connection.
+        Close database connections. Waits up to pool_timeout seconds for other
+        threads to release their connections, then closes any still in use.
         """
         logging.getLogger(__name__).debug("Closing database connection to %s", self.name)
-        if self.db is not None:
-            retries = 0
-            while True:
-                try:
-                    self.db.close()
-                    self.db = None
-                    break
-                except (MySQLdb.Error, MySQLdb.Warning):
-                    if retries < MAX_DB_RETRIES:
-                        retries += 1
-                        continue
-                    logging.getLogger(__name__).exception("Failed to close database connection.")
-                else:
-                    logging.getLogger(__name__).debug("Closed database connection.")
+        self.release_connection()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+            logging.getLogger(__name__).debug("Closed database connection.")
 
     def create_database(self, name=None, sql_source_file=None):
         """
@@ -391,11 +547,13 @@ class DBManager:
 
         if self.db is not None:
             self.close()
+        self.invalidate_schema()
 
         try:
-            temp_db = MySQLdb.connect("localhost",
-                                      self.user,
-                                      self.password,
+            temp_db = MySQLdb.connect(host=self.host,
+                                      port=self.port,
+                                      user=self.user,
+                                      passwd=self.password,
                                       charset=self.charset,
                                       use_unicode=self.use_unicode,
                                       autocommit="True")
@@ -458,6 +616,7 @@ class DBManager:
         Drops current database.
         """
         logging.getLogger(__name__).debug("Dropping database %s", self.name)
+        self.invalidate_schema()
         if self.name is None:
             return
         try:
@@ -493,28 +652,161 @@ class DBManager:
                 raise
         self.create_database(self.name, sql_source_file)
         self.dbtables = {}
+        self.invalidate_schema()
         logging.getLogger(__name__).debug("Successfully resetted database.")
 
+    def load_schema(self):
+        """
+        Loads the structure of every table in the database into self.schema.
+
+        The catalog is built from SHOW TABLES, one DESCRIBE per table, and one
+        INFORMATION_SCHEMA query each for unique and foreign keys. It is reused
+        by table_structure, primary_key_list, etc. until invalidate_schema is
+        called.
+
+        Returns:
+            dict keyed on table name. Each value is a dict with keys
+            'structure', 'fields', 'primary_keys', 'unique_keys',
+            'auto_increment' and 'foreign_keys'.
+        """
+        if self.db is None:
+            self.schema = None
+            return {}
+        logging.getLogger(__name__).debug("Loading schema for database %s", self.name)
+        schema = {}
+        try:
+            cursor = self.db.cursor()
+            cursor.execute("SHOW TABLES;")
+            self.stats['metadata_queries'] += 1
+            table_names = [row[0] for row in cursor.fetchall()]
+            for table_name in table_names:
+                schema[table_name] = DBManager._table_schema_from_structure(
+                    self._describe_table(table_name))
+
+            query = ("SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME "
+                     + "FROM INFORMATION_SCHEMA.STATISTICS "
+                     + "WHERE TABLE_SCHEMA = %s "
+                     + "AND NON_UNIQUE = 0 "
+                     + "AND INDEX_NAME != 'PRIMARY' "
+                     + "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX")
+            cursor.execute(query, (self.name,))
+            self.stats['metadata_queries'] += 1
+            unique_indexes = {}
+            for table_name, index_name, column_name in cursor.fetchall():
+                unique_indexes.setdefault((table_name, index_name), []).append(column_name)
+            for (table_name, _), columns in unique_indexes.items():
+                if table_name in schema:
+                    schema[table_name]['unique_keys'].append(columns)
+
+            query = ("SELECT TABLE_NAME, COLUMN_NAME, "
+                     + "REFERENCED_COLUMN_NAME, REFERENCED_TABLE_NAME "
+                     + "FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
+                     + "WHERE REFERENCED_TABLE_NAME IS NOT NULL "
+                     + "AND TABLE_SCHEMA = %s")
+            cursor.execute(query, (self.name,))
+            self.stats['metadata_queries'] += 1
+            for table_name, column, ref_column, ref_table in cursor.fetchall():
+                if table_name in schema:
+                    schema[table_name]['foreign_keys'].append({
+                        'column_name':              column,
+                        'referenced_table_name':    ref_table,
+                        'referenced_column_name':   ref_column
+                    })
+        except MySQLdb.Error as e:
+            logging.getLogger(__name__).exception(
+                "Failed to load schema for database %s. Error: %s", self.name, e)
+            raise
+
+        self.schema = schema
+        self.stats['schema_loads'] += 1
+        return schema
+
+    def invalidate_schema(self):
+        """
+        Discards cached table metadata. It will be reloaded on next use.
+        """
+        self.schema = None
+
+    def _describe_table(self, table_name):
+        """
+        Runs DESCRIBE for table_name and returns dictionary of field attributes.
+        """
+        query = "DESCRIBE %s;" % (str(table_name, ))
+        cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
+        cursor.execute(query)
+        self.stats['metadata_queries'] += 1
+        results = cursor.fetchall()
+        table_dict = {}
+        for table_field in results:
+            field_name = table_field['Field']
+            del table_field['Field']
+            table_field = {k.lower(): v for k, v in table_field.items()}
+            table_dict[field_name] = table_field
+        return table_dict
+
+    @staticmethod
+    def _table_schema_from_structure(table_dict):
+        """
+        Precomputes key information from a table structure dictionary.
+        """
+        auto_increment = None
+        for field, att_dict in table_dict.items():
+            if att_dict['extra'] == 'auto_increment':
+                auto_increment = field
+                break
+        return {
+            'structure':        table_dict,
+            'fields':           list(table_dict.keys()),
+            'primary_keys':     [field for field, att_dict in table_dict.items()
+                                 if att_dict['key'] == 'PRI'],
+            'unique_keys':      [],
+            'auto_increment':   auto_increment,
+            'foreign_keys':     []
+        }
+
+    def _table_schema(self, table_name):
+        """
+        Returns cached schema for table_name, loading the catalog if necessary.
+        Tables created since the catalog was loaded are described individually.
+        Returns None if the table does not exist.
+        """
+        if self.db is None:
+            return None
+        if self.schema is None:
+            try:
+                self.load_schema()
+            except MySQLdb.Error as e:
+                print("DBManager.load_schema: %s" % (e,))
+                return None
+        table_schema = self.schema.get(table_name)
+        if table_schema is None:
+            try:
+                table_dict = self._describe_table(table_name)
+            except MySQLdb.Error as e:
+                print("DBManager.table_structure: %s" % (e,))
+                return None
+            table_schema = DBManager._table_schema_from_structure(table_dict)
+            self.schema[table_name] = table_schema
+        return table_schema
+
     def list_tables(self):
         """
         Returns list of tables in database.
         """
         if self.db is not None:
-            query = "SHOW TABLES;"
-            try:
-                cursor = self.db.cursor()
-                cursor.execute(query)
-                results = cursor.fetchall()
-            except MySQLdb.Error as e:
-                print("DBManager.list_tables: %s " % (e,))
-                return False
-            table_list = [i[0] for i in results]
-            return table_list
+            if self.schema is None:
+                try:
+                    self.load_schema()
+                except MySQLdb.Error as e:
+                    print("DBManager.list_tables: %s " % (e,))
+                    return False
+            return list(self.schema.keys())
         return []
 
     def table_structure(self, table_name):
         """
-        Returns structure of table.
+        Returns structure of table. The returned dictionary is shared with the
+        schema catalog and should not be modified.
 
         Args:
             table_name (str): Name of a table existing in the database.
@@ -543,34 +835,38 @@ class DBManager:
         #     'citation_record': {'type': 'longtext', 'null': 'YES', 'key': '', 'default': None, 'extra': ''},
         #     'retracted_year': {'type': 'year(4)', 'null': 'YES', 'key': '', 'default': None, 'extra': ''}
         # }
-        if self.db is not None:
-            query = "DESCRIBE %s;" % (str(table_name, ))
-            try:
-                cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
-                cursor.execute(query)
-                results = cursor.fetchall()
-            except MySQLdb.Error as e:
-                print("DBManager.table_structure: %s" % (e,))
-                return {}
-            table_dict = {}
-            for table_field in results:
-                field_name = table_field['Field']
-                del table_field['Field']
-                table_field = {k.lower(): v for k, v in table_field.items()}
-                table_dict[field_name] = table_field
-            return table_dict
-        return {}
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
+            return {}
+        return table_schema['structure']
 
     def primary_key_list(self, table_name):
         """
         Returns primary keys of table_name as list.
         """
-        table_structure = self.table_structure(table_name)
-        key_list = []
-        for field, att_dict in table_structure.items():
-            if att_dict['key'] == 'PRI':
-                key_list.append(field)
-        return key_list
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
+            return []
+        return list(table_schema['primary_keys'])
+
+    def unique_key_list(self, table_name):
+        """
+        Returns unique keys (other than the primary key) of table_name as a
+        list of lists of column names, one list per UNIQUE index.
+        """
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
+            return []
+        return [list(columns) for columns in table_schema['unique_keys']]
+
+    def auto_increment_column(self, table_name):
+        """
+        Returns name of AUTO_INCREMENT column of table_name, or None.
+        """
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
+            return None
+        return table_schema['auto_increment']
 
     def foreign_key_list(self, table_name):
         """
@@ -585,32 +881,19 @@ class DBManager:
                 referenced_table_name: name of referenced table.
                 referenced_column_name: name of referenced column.
         """
-        query = ("SELECT COLUMN_NAME, REFERENCED_COLUMN_NAME, REFERENCED_TABLE_NAME "
-                 + "FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE "
-                 + "WHERE TABLE_NAME = %s "
-                 + "AND REFERENCED_TABLE_NAME IS NOT NULL "
-                 + "AND TABLE_SCHEMA = %s")
-        try:
-            cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
-            cursor.execute(query, (table_name, self.name))
-            results = cursor.fetchall()
-        except MySQLdb.Error as e:
-            print("DBManager.foreign_key_list: %s" % (e,))
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
             return []
-        key_list = [{'column_name':item['COLUMN_NAME'],
-                     'referenced_table_name':item['REFERENCED_TABLE_NAME'],
-                     'referenced_column_name':item['REFERENCED_COLUMN_NAME']}
-                    for item in results]
-        return key_list
+        return [dict(key_dict) for key_dict in table_schema['foreign_keys']]
 
     def table_fields(self, table_name):
         """
         Returns list of fields in table_name.
         """
-        table_dict = self.table_structure(table_name)
-        if table_dict:
-            return list(table_dict.keys())
-        return []
+        table_schema = self._table_schema(table_name)
+        if table_schema is None:
+            return []
+        return list(table_schema['fields'])
     
     def table_row_count(self, table_name):
         """
@@ -627,13 +910,91 @@ class DBManager:
         result = cursor.fetchone()
         return int(result[0])
 
+    def reserve_ids(self, table_name, count):
+        """
+        Atomically reserves a block of count consecutive ids for the auto
+        increment column of table_name, so rows can be given ids before they
+        are inserted, as insert_many_rows and bulk loads need.
+
+        Reservations are recorded in the ID_SEQUENCE_TABLE table, which is
+        created on first use in databases that don't have it, so they are never
+        handed out twice, even to other processes. The reservation is made on
+        the current thread's connection: it is committed at once, or inside a
+        transaction() block, with the transaction, and the sequence row stays
+        locked until then. Blocks start above the largest id in the table, so
+        ids inserted by AUTO_INCREMENT are skipped. Rows inserted by
+        AUTO_INCREMENT after a block is reserved and before it is inserted
+        can take ids from the block, so tables written both ways should be
+        written one way at a time.
+
+        Args:
+            table_name (str): Name of table with an auto increment column.
+            count (int): Number of ids to reserve.
+
+        Returns:
+            First id of the block.
+        """
+        id_column = self.auto_increment_column(table_name)
+        if id_column is None:
+            raise exceptions.BiblioException(
+                "Can't reserve ids for %s: table has no auto increment column." % table_name)
+        if count < 1:
+            raise ValueError("count must be positive.")
+        if ID_SEQUENCE_TABLE not in self.list_tables():
+            self._create_id_sequence()
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(
+                "INSERT IGNORE INTO `%s` (`table_name`, `next_id`) VALUES (%%s, 1)"
+                % ID_SEQUENCE_TABLE, (table_name,))
+            cursor.execute(
+                "SELECT `next_id` FROM `%s` WHERE `table_name` = %%s FOR UPDATE"
+                % ID_SEQUENCE_TABLE, (table_name,))
+            next_id = cursor.fetchone()[0]
+            cursor.execute("SELECT MAX(`%s`) FROM %s" % (id_column, table_name))
+            max_id = cursor.fetchone()[0]
+            first_id = max(next_id, (max_id or 0) + 1)
+            cursor.execute(
+                "UPDATE `%s` SET `next_id` = %%s WHERE `table_name` = %%s" % ID_SEQUENCE_TABLE,
+                (first_id + count, table_name))
+            self._commit()
+        except MySQLdb.Error as e:
+            logging.getLogger(__name__).exception(
+                "Failed to reserve ids for %s. Error: %s", table_name, str(e))
+            self._rollback()
+            raise
+        logging.getLogger(__name__).debug(
+            "Reserved ids %s to %s of %s.", first_id, first_id + count - 1, table_name)
+        return first_id
+
+    def _create_id_sequence(self):
+        """
+        Creates ID_SEQUENCE_TABLE, for databases created before it was added
+        to create_db_tables.sql. CREATE TABLE commits any open transaction, so
+        inside a transaction() block the table is created over a new connection
+        of its own.
+        """
+        logging.getLogger(__name__).debug("Creating table %s.", ID_SEQUENCE_TABLE)
+        connection = self._new_connection() if self.in_transaction else self.db
+        try:
+            connection.cursor().execute(
+                "CREATE TABLE IF NOT EXISTS `%s` ("
+                "`table_name` VARCHAR(64) NOT NULL, "
+                "`next_id` BIGINT NOT NULL, "
+                "PRIMARY KEY (`table_name`)) "
+                "ENGINE = InnoDB DEFAULT CHARACTER SET = utf8mb4" % ID_SEQUENCE_TABLE)
+        finally:
+            if connection is not self.db:
+                connection.close()
+        self.invalidate_schema()
+
     def existing_table_object_keys(self):
         """
         Returns list of existing DBTable objects associated with self.
         """
         return list(self.dbtables.keys())
 
-    def fetch_row(self, table_name, where_dict, **kwargs):
+    def fetch_row(self, table_name, where_dict, columns=None, **kwargs):
         """
         Fetches a row from table_name matching where_dict
 
@@ -643,16 +1004,29 @@ class DBManager:
                         "IS NULL", "IS NOT NULL", or a list of values.
                         For comparison operators (>, <, >=, <=, !=) there must
                         be a space between operator and value.
+            columns ([str]): Columns to fetch. Defaults to all columns.
             **kwargs: Each additional keyword argument adds filter to column
                       following rules for where_dict.
         """
-        result = self.fetch_rows(table_name, where_dict, limit=1, **kwargs)
+        result = self.fetch_rows(table_name, where_dict, limit=1, columns=columns, **kwargs)
         if result:
             return result[0]
         else:
             return None
 
-    def fetch_rows(self, table_name, where_dict=None, limit=0, order_by=None, **kwargs):
+    @staticmethod
+    def _select_list(columns=None):
+        """
+        Returns select list for columns, or * if columns is None.
+        """
+        if columns is None:
+            return "*"
+        if not columns:
+            raise ValueError("columns must not be empty.")
+        return ", ".join("`%s`" % column for column in columns)
+
+    def fetch_rows(self, table_name, where_dict=None, limit=0, order_by=None, columns=None,
+                   **kwargs):
         """
         Fetches rows from table_name.
 
@@ -667,20 +1041,43 @@ class DBManager:
             order_by (list):   Fields to order by (ascending, in list order)
             order_by (dict):   Fields to order by, where keys are fields and
                                values are 'ASC' or 'DESC'
+            columns ([str]):   Columns to fetch. Defaults to all columns.
             **kwargs:          Each additional keyword argument adds filter to
                                column following rules for where_dict.
 
         Returns:
             List of dictionaries of column-value, or None.
         """
+        (query, value_list) = DBManager._select_query(
+            table_name, where_dict, limit, order_by, columns, **kwargs)
+        if query is None:
+            return None
+        cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            cursor.execute(query, value_list)
+        except MySQLdb.Error as e:
+            logging.getLogger(__name__).exception(
+                "Failed to fetch rows. Query: %s Error: %s", query, e)
+            raise
+        rows = cursor.fetchall()
+        return list(rows)
+
+    @staticmethod
+    def _select_query(table_name, where_dict=None, limit=0, order_by=None, columns=None,
+                      **kwargs):
+        """
+        Returns (query, value_list) for a SELECT from table_name, or
+        (None, None) if there is no where clause. See fetch_rows for arguments.
+        """
         if where_dict is None:
             where_dict = {}
         if kwargs:
             where_dict = {**where_dict, **kwargs}
         (where_clause, value_list) = DBManager._build_where(where_dict)
         if not where_clause:
-            return None
-        query = "SELECT * FROM %s WHERE %s" % (table_name, where_clause)
+            return (None, None)
+        query = "SELECT %s FROM %s WHERE %s" % (
+            DBManager._select_list(columns), table_name, where_clause)
         if order_by:
             if isinstance(order_by, str):
                 query += " ORDER BY %s" % order_by
@@ -695,7 +1092,7 @@ class DBManager:
             elif isinstance(order_by, dict):
                 query += " ORDER BY "
                 field_str = ''
-                for field, order in order_by:
+                for field, order in order_by.items():
                     if field_str:
                         field_str += ', '
                     field_str += "%s %s" % (field, order)
@@ -704,15 +1101,110 @@ class DBManager:
                 raise TypeError("order_by must be str, list, dict, or None")
         if limit:
             query += " LIMIT %s" % limit
-        cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
+        return (query, value_list)
+
+    def iter_rows(self, table_name, where_dict=None, columns=None, batch_size=None,
+                  batches=False, order_by=None, limit=0, **kwargs):
+        """
+        Streams rows from table_name with a server-side cursor, so that only
+        batch_size rows are held in memory at a time.
+
+        The rows are read over a separate pooled connection, so other queries
+        can be run while iterating. Close the generator (or use it in a for
+        loop to the end) to release the connection. If iteration stops early,
+        the connection is closed rather than reading the remaining rows. If
+        every pooled connection is checked out, the rows are read over the
+        current thread's connection rather than waiting for one, and other
+        queries can't be run on this thread until iteration ends.
+
+        Args:
+            table_name (str):  Name of table to fetch from.
+            where_dict (dict): Filter following rules for fetch_rows. Defaults
+                               to all rows.
+            columns ([str]):   Columns to fetch. Defaults to all columns.
+            batch_size (int):  Rows read from the server at a time. Defaults
+                               to STREAM_BATCH_SIZE.
+            batches (bool):    If true, yield lists of up to batch_size rows
+                               instead of single rows.
+            order_by, limit, **kwargs: As for fetch_rows.
+
+        Yields:
+            Dictionaries of column-value, or lists of them if batches is true.
+        """
+        if batch_size is None:
+            batch_size = STREAM_BATCH_SIZE
+        (query, value_list) = DBManager._select_query(
+            table_name, where_dict, limit, order_by, columns, **kwargs)
+        if query is None:
+            return
+        pool = self.pool
+        connection = pool.acquire(block=False) if pool is not None else None
+        if connection is None:
+            pool = None
+            connection = self.db
+        cursor = connection.cursor(MySQLdb.cursors.SSDictCursor)
+        finished = False
         try:
-            cursor.execute(query, value_list)
-        except MySQLdb.Error as e:
-            logging.getLogger(__name__).exception(
-                "Failed to fetch rows. Query: %s Error: %s", query, e)
-            raise
-        rows = cursor.fetchall()
-        return list(rows)
+            try:
+                cursor.execute(query, value_list)
+            except MySQLdb.Error as e:
+                logging.getLogger(__name__).exception(
+                    "Failed to fetch rows. Query: %s Error: %s", query, e)
+                raise
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if batches:
+                    yield list(rows)
+                else:
+                    yield from rows
+            finished = True
+        finally:
+            if pool is None:
+                cursor.close()
+            elif finished:
+                cursor.close()
+                pool.release(connection)
+            else:
+                pool.discard(connection)
+
+    def fetch_rows_by_key(self, table_name, key_tuples, columns=None, chunk_size=None):
+        """
+        Fetches rows of table_name by primary key, with one SELECT ... WHERE
+        key IN (...) per chunk.
+
+        Args:
+            table_name (str): Table to fetch from.
+            key_tuples ([tuple]): Primary key values, in primary_key_list order.
+            columns ([str]): Columns to fetch. Primary key columns are always
+                             fetched. Defaults to all columns.
+            chunk_size (int): Max keys per query.
+
+        Returns:
+            List of dictionaries of column-value, in no particular order.
+        """
+        if chunk_size is None:
+            chunk_size = BULK_CHUNK_SIZE
+        primary_keys = self.primary_key_list(table_name)
+        if columns is not None:
+            columns = primary_keys + [column for column in columns if column not in primary_keys]
+        select_list = DBManager._select_list(columns)
+        cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
+        rows = []
+        for start in range(0, len(key_tuples), chunk_size):
+            (in_clause, value_list) = DBManager._build_key_in(
+                primary_keys,
+                key_tuples[start:start + chunk_size])
+            query = "SELECT %s FROM %s WHERE %s" % (select_list, table_name, in_clause)
+            try:
+                cursor.execute(query, value_list)
+            except MySQLdb.Error as e:
+                logging.getLogger(__name__).exception(
+                    "Failed to fetch rows. Query: %s Error: %s", query, e)
+                raise
+            rows.extend(cursor.fetchall())
+        return rows
 
     def insert_row(self, table_name, row_dict):
         """
@@ -731,9 +1223,9 @@ class DBManager:
         try:
             cursor = self.db.cursor()
             cursor.execute(query, params['value_list'])
-            self.db.commit()
+            self._commit()
         except MySQLdb.Error as e:
-            self.db.rollback()
+            self._rollback()
             if e.args[0] == 1062: #Duplicate entry
                 raise
             else:
@@ -761,33 +1253,20 @@ class DBManager:
         if (not isinstance(row_dict_list, list) or
                 not isinstance(row_dict_list[0], dict)):
             raise TypeError("row_dict_list must be list of dicts of column:value pairs.")
-        # Get auto increment primary key if one exists
-        table_dict = self.table_structure(table_name)
-        auto_increment = None
-        for key, field in table_dict.items():
-            if field['key'] == 'PRI' and field['extra'] == 'auto_increment':
-                query = ("SELECT AUTO_INCREMENT " +
-                         "FROM information_schema.tables " +
-                         "WHERE table_name = '%s' " % table_name +
-                         "AND table_schema = DATABASE();")
-                cursor = self.db.cursor()
-                cursor.execute(query)
-                result = cursor.fetchone()
-                if result:
-                    auto_increment = int(result[0])
-                pri_key_field = key
-                break
-
-        if auto_increment is not None:
-            for row_dict in row_dict_list:
-                if row_dict.get(pri_key_field) is not None:
-                    continue
-                row_dict[pri_key_field] = auto_increment
-                auto_increment += 1
-
+        # Give rows ids of auto increment primary key if one exists
+        pri_key_field = self.auto_increment_column(table_name)
+        if pri_key_field is not None and pri_key_field in self.primary_key_list(table_name):
+            missing_ids = [row_dict for row_dict in row_dict_list
+                           if row_dict.get(pri_key_field) is None]
+            if missing_ids:
+                first_id = self.reserve_ids(table_name, len(missing_ids))
+                for row_id, row_dict in enumerate(missing_ids, first_id):
+                    row_dict[pri_key_field] = row_id
+
+        fields = self.table_fields(table_name)
         try:
             params = DBManager._query_params(
-                {field : row_dict_list[0].get(field) for field in self.table_fields(table_name)},
+                {field : row_dict_list[0].get(field) for field in fields},
                 allow_none=True
             )
         except (IndexError, KeyError, TypeError):
@@ -798,23 +1277,261 @@ class DBManager:
         logging.getLogger(__name__).debug(
             "Inserting %d rows into table %s. Query: %s",
             len(row_dict_list), table_name, query)
-        rows_lists = [list(rd.values()) for rd in row_dict_list]
         rows_lists = [
-            [rd.get(field) for field in self.table_fields(table_name)]
+            [rd.get(field) for field in fields]
             for rd in row_dict_list
         ]
 
         try:
             cursor = self.db.cursor()
             cursor.executemany(query, rows_lists)
-            self.db.commit()
+            self._commit()
         except MySQLdb.Error as e:
             logging.getLogger(__name__).exception(
                 "Failed to insert rows. Query: %s Error: %s", query, str(e))
-            self.db.rollback()
+            self._rollback()
             raise
         return row_dict_list
 
+    @staticmethod
+    def _build_key_in(key_columns, key_tuples):
+        """
+        Builds an IN clause matching any of key_tuples on key_columns.
+
+        Args:
+            key_columns ([str]): Column names.
+            key_tuples ([tuple]): Tuples of values, in key_columns order.
+
+        Returns:
+            (in_clause (str), value_list)
+        """
+        value_list = []
+        if len(key_columns) == 1:
+            in_clause = "`%s` IN (%s)" % (
+                key_columns[0],
+                ", ".join(["%s"] * len(key_tuples)))
+        else:
+            tuple_alias = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+            in_clause = "(%s) IN (%s)" % (
+                ", ".join("`%s`" % column for column in key_columns),
+                ", ".join([tuple_alias] * len(key_tuples)))
+        for key_tuple in key_tuples:
+            value_list.extend(key_tuple)
+        return (in_clause, value_list)
+
+    @staticmethod
+    def _normalize_key_value(value):
+        """
+        Normalizes a key value so that values MySQL considers equal under the
+        default case-insensitive collation compare equal in Python.
+        """
+        if isinstance(value, str):
+            return value.rstrip().lower()
+        return str(value)
+
+    def _unset_to_null(self, table_name, expression, column):
+        """
+        Wraps expression so that values Python treats as unset (empty strings
+        and zeros) become NULL, according to the type of column.
+        """
+        column_type = self.table_structure(table_name).get(column, {}).get('type', '').lower()
+        if 'char' in column_type or 'text' in column_type:
+            return "NULLIF(%s, '')" % expression
+        if re.match(r'(tiny|small|medium|big)?int|decimal|float|double', column_type):
+            return "NULLIF(%s, 0)" % expression
+        return expression
+
+    def _upsert_statement(self, table_name, columns, row_count, duplicates):
+        """
+        Returns a multi-row INSERT statement for columns implementing
+        duplicates policy.
+        """
+        key_str = ", ".join("`%s`" % column for column in columns)
+        row_alias = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        values_str = ", ".join([row_alias] * row_count)
+        if duplicates == Duplicates.REPLACE:
+            return "REPLACE INTO %s (%s) VALUES %s" % (table_name, key_str, values_str)
+
+        primary_keys = self.primary_key_list(table_name)
+        update_columns = [column for column in columns if column not in primary_keys]
+        if duplicates == Duplicates.SKIP or not update_columns:
+            update_list = ["`{0}`=`{0}`".format(primary_keys[0])]
+        elif duplicates == Duplicates.INSERT:
+            update_list = [
+                "`%s`=COALESCE(%s, %s, `%s`)" % (
+                    column,
+                    self._unset_to_null(table_name, "`%s`" % column, column),
+                    self._unset_to_null(table_name, "VALUES(`%s`)" % column, column),
+                    column)
+                for column in update_columns]
+        elif duplicates == Duplicates.OVERWRITE:
+            update_list = [
+                "`%s`=COALESCE(%s, `%s`)" % (
+                    column,
+                    self._unset_to_null(table_name, "VALUES(`%s`)" % column, column),
+                    column)
+                for column in update_columns]
+        else:
+            raise AttributeError("Parameter 'duplicates' has unknown value.")
+        return "INSERT INTO %s (%s) VALUES %s ON DUPLICATE KEY UPDATE %s" % (
+            table_name, key_str, values_str, ", ".join(update_list))
+
+    def _resolve_keys(self, table_name, rows):
+        """
+        Finds primary keys of rows that have been written to table_name, by
+        matching their primary or unique key values in a single query.
+
+        Returns:
+            List of primary key dicts, in the same order as rows.
+        """
+        primary_keys = self.primary_key_list(table_name)
+        unique_keys = self.unique_key_list(table_name)
+        if not unique_keys:
+            # Rows can only have been matched on their own primary key.
+            return [{column: row[column] for column in primary_keys} for row in rows]
+        key_sets = [primary_keys] + unique_keys
+        select_columns = []
+        for key_columns in key_sets:
+            for column in key_columns:
+                if column not in select_columns:
+                    select_columns.append(column)
+
+        where_list = []
+        value_list = []
+        for key_columns in key_sets:
+            key_tuples = set()
+            for row in rows:
+                key_tuple = tuple(row.get(column) for column in key_columns)
+                if None not in key_tuple:
+                    key_tuples.add(key_tuple)
+            if key_tuples:
+                (in_clause, in_values) = DBManager._build_key_in(key_columns, list(key_tuples))
+                where_list.append(in_clause)
+                value_list.extend(in_values)
+
+        query = "SELECT %s FROM %s WHERE %s" % (
+            ", ".join("`%s`" % column for column in select_columns),
+            table_name,
+            " OR ".join(where_list))
+        cursor = self.db.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            cursor.execute(query, value_list)
+        except MySQLdb.Error as e:
+            logging.getLogger(__name__).exception(
+                "Failed to resolve keys. Query: %s Error: %s", query, e)
+            raise
+
+        key_maps = [{} for _ in key_sets]
+        for db_row in cursor.fetchall():
+            pkey_dict = {column: db_row[column] for column in primary_keys}
+            for key_map, key_columns in zip(key_maps, key_sets):
+                key_tuple = tuple(db_row[column] for column in key_columns)
+                if None not in key_tuple:
+                    key_map[tuple(map(DBManager._normalize_key_value, key_tuple))] = pkey_dict
+
+        resolved = []
+        for row in rows:
+            pkey_dict = None
+            for key_map, key_columns in zip(key_maps, key_sets):
+                key_tuple = tuple(row.get(column) for column in key_columns)
+                if None in key_tuple:
+                    continue
+                pkey_dict = key_map.get(tuple(map(DBManager._normalize_key_value, key_tuple)))
+                if pkey_dict is not None:
+                    break
+            if pkey_dict is None:
+                raise exceptions.DBIntegrityError(
+                    'Row written to %s, but could not be found by key. Row: %s' %
+                    (table_name, str(row))
+                )
+            resolved.append(dict(pkey_dict))
+        return resolved
+
+    def upsert_rows(self, table_name, row_dict_list, duplicates=None, chunk_size=None):
+        """
+        Inserts many rows into a table, handling duplicate entries according
+        to duplicates with batched multi-row statements.
+
+        Rows with primary or unique key values are written with
+        INSERT ... ON DUPLICATE KEY UPDATE (or REPLACE), one statement for each
+        set of non-null columns in a chunk, and their primary keys are then
+        resolved with one SELECT per chunk. Rows without any key values cannot
+        be duplicates and are written with insert_many_rows.
+
+        Args:
+            table_name (str): Name of table for insertion.
+            row_dict_list [{column:value}]: List of row dicts. None values are
+                                            not written.
+            duplicates (int): A Duplicates value. Defaults to SKIP.
+            chunk_size (int): Max rows per statement.
+
+        Returns:
+            List of primary key dicts, one for each row in row_dict_list.
+        """
+        if duplicates is None:
+            duplicates = Duplicates.SKIP
+        if chunk_size is None:
+            chunk_size = BULK_CHUNK_SIZE
+        if (not isinstance(row_dict_list, list) or
+                (row_dict_list and not isinstance(row_dict_list[0], dict))):
+            raise TypeError("row_dict_list must be list of dicts of column:value pairs.")
+
+        primary_keys = self.primary_key_list(table_name)
+        key_sets = [primary_keys] + self.unique_key_list(table_name)
+        resolved = [None] * len(row_dict_list)
+        for start in range(0, len(row_dict_list), chunk_size):
+            chunk = row_dict_list[start:start + chunk_size]
+            keyed_rows = []
+            unkeyed_rows = []
+            for index, row in enumerate(chunk, start):
+                has_key = False
+                for key_columns in key_sets:
+                    if all(row.get(column) is not None for column in key_columns):
+                        has_key = True
+                        break
+                if has_key:
+                    keyed_rows.append((index, row))
+                else:
+                    unkeyed_rows.append((index, row))
+
+            if unkeyed_rows:
+                inserted_rows = self.insert_many_rows(
+                    table_name,
+                    [dict(row) for _, row in unkeyed_rows])
+                for (index, _), row in zip(unkeyed_rows, inserted_rows):
+                    resolved[index] = {column: row.get(column) for column in primary_keys}
+
+            if not keyed_rows:
+                continue
+
+            # Group rows by set of non-null columns so that unset fields keep
+            # their database defaults.
+            column_groups = {}
+            for _, row in keyed_rows:
+                columns = tuple(
+                    field for field in row.keys()
+                    if row[field] is not None)
+                column_groups.setdefault(columns, []).append(row)
+            cursor = self.db.cursor()
+            for columns, rows in column_groups.items():
+                query = self._upsert_statement(table_name, columns, len(rows), duplicates)
+                value_list = []
+                for row in rows:
+                    value_list.extend(row[column] for column in columns)
+                try:
+                    cursor.execute(query, value_list)
+                    self._commit()
+                except MySQLdb.Error as e:
+                    logging.getLogger(__name__).exception(
+                        "Failed to upsert rows into %s. Error: %s", table_name, str(e))
+                    self._rollback()
+                    raise
+
+            key_dicts = self._resolve_keys(table_name, [row for _, row in keyed_rows])
+            for (index, _), key_dict in zip(keyed_rows, key_dicts):
+                resolved[index] = key_dict
+        return resolved
+
     def update_rows(self, table_name, row_dict, where_dict):
         """
         Update rows matching where_dict according to row_dict.
@@ -838,20 +1555,107 @@ class DBManager:
         try:
             cursor = self.db.cursor()
             cursor.execute(query, params['value_list'] + where_values)
-            self.db.commit()
+            self._commit()
             return cursor.rowcount > 0
         except MySQLdb.Error as e:
             logging.getLogger(__name__).exception(
                 "Failed to update row. Query: %s Error %s", query, str(e))
-            self.db.rollback()
+            self._rollback()
             raise
 
+    def _update_statement(self, table_name, primary_keys, rows, allow_none=False):
+        """
+        Returns (query, value_list) for a single UPDATE setting the non-key
+        columns of each of rows, matched on primary_keys, with CASE expressions.
+        None values are not written unless allow_none is True. Returns
+        (None, None) if there is nothing to update.
+        """
+        update_columns = []
+        for row in rows:
+            for column, value in row.items():
+                if ((value is not None or allow_none)
+                        and column not in primary_keys
+                        and column not in update_columns):
+                    update_columns.append(column)
+        if not update_columns:
+            return (None, None)
+        if len(primary_keys) == 1:
+            case_str = "CASE `%s`" % primary_keys[0]
+            when_str = "WHEN %s THEN %s"
+        else:
+            case_str = "CASE"
+            when_str = ("WHEN " + " AND ".join("`%s` = %%s" % column for column in primary_keys)
+                        + " THEN %s")
+
+        set_list = []
+        value_list = []
+        for column in update_columns:
+            whens = []
+            for row in rows:
+                if column in row and (row[column] is not None or allow_none):
+                    whens.append(when_str)
+                    value_list.extend(row[key] for key in primary_keys)
+                    value_list.append(row[column])
+            set_list.append("`%s` = %s %s ELSE `%s` END" % (
+                column, case_str, " ".join(whens), column))
+        key_tuples = [tuple(row[key] for key in primary_keys) for row in rows]
+        (in_clause, in_values) = DBManager._build_key_in(primary_keys, key_tuples)
+        query = "UPDATE %s SET %s WHERE %s" % (table_name, ", ".join(set_list), in_clause)
+        return (query, value_list + in_values)
+
+    def update_many_rows(self, table_name, row_dict_list, chunk_size=None, allow_none=False):
+        """
+        Updates many rows, matched on primary key, with one UPDATE ... CASE
+        statement and one transaction per chunk.
+
+        Args:
+            table_name (str): Name of the table to update.
+            row_dict_list [{column:value}]: List of row dicts. Each must
+                                            contain the table's primary key.
+                                            None values are not written
+                                            unless allow_none is True.
+            chunk_size (int): Max rows per statement.
+            allow_none (bool): If True, set columns with None values to NULL.
+
+        Returns:
+            Number of rows changed.
+        """
+        if chunk_size is None:
+            chunk_size = BULK_CHUNK_SIZE
+        if (not isinstance(row_dict_list, list) or
+                (row_dict_list and not isinstance(row_dict_list[0], dict))):
+            raise TypeError("row_dict_list must be list of dicts of column:value pairs.")
+        primary_keys = self.primary_key_list(table_name)
+        if not primary_keys:
+            raise exceptions.BiblioException(
+                "Can't update rows of %s by key: table has no primary key." % table_name)
+        changed = 0
+        cursor = self.db.cursor()
+        for start in range(0, len(row_dict_list), chunk_size):
+            chunk = row_dict_list[start:start + chunk_size]
+            (query, value_list) = self._update_statement(
+                table_name, primary_keys, chunk, allow_none)
+            if query is None:
+                continue
+            try:
+                cursor.execute(query, value_list)
+                self._commit()
+            except MySQLdb.Error as e:
+                logging.getLogger(__name__).exception(
+                    "Failed to update rows of %s. Error: %s", table_name, str(e))
+                self._rollback()
+                raise
+            changed += cursor.rowcount
+        return changed
+
     def delete_rows(self, table_name, where_dict, or_clause=False):
         """
         Deletes rows from table_name matching where_dict.
 
         Returns:
-            True if at least one row affected. False otherwise.
+            True if at least one row affected. False otherwise. Inside a
+            transaction() block, errors are raised, so that the transaction
+            is rolled back.
         """
         (where_clause, value_list) = DBManager._build_where(where_dict, or_clause)
         query = "DELETE FROM %s WHERE %s" % (table_name, where_clause)
@@ -860,14 +1664,99 @@ class DBManager:
         try:
             cursor = self.db.cursor()
             cursor.execute(query, value_list)
-            self.db.commit()
+            self._commit()
             return cursor.rowcount > 0
         except MySQLdb.Error as e:
             logging.getLogger(__name__).exception(
                 "Failed to delete rows from database. Query: %s Error: %s", query, str(e))
-            self.db.rollback()
+            if self.in_transaction:
+                raise
+            self._rollback()
             return False
 
+    def delete_many_rows(self, table_name, key_dict_list, chunk_size=None):
+        """
+        Deletes many rows, matched on primary key, with one DELETE ... WHERE
+        key IN (...) statement and one transaction per chunk.
+
+        Args:
+            table_name (str): Name of the table to delete from.
+            key_dict_list [{column:value}]: List of primary key dicts.
+            chunk_size (int): Max rows per statement.
+
+        Returns:
+            Number of rows deleted.
+        """
+        if chunk_size is None:
+            chunk_size = BULK_CHUNK_SIZE
+        primary_keys = self.primary_key_list(table_name)
+        key_tuples = [tuple(key_dict[key] for key in primary_keys)
+                      for key_dict in key_dict_list]
+        deleted = 0
+        cursor = self.db.cursor()
+        for start in range(0, len(key_tuples), chunk_size):
+            (in_clause, value_list) = DBManager._build_key_in(
+                primary_keys,
+                key_tuples[start:start + chunk_size])
+            query = "DELETE FROM %s WHERE %s" % (table_name, in_clause)
+            try:
+                cursor.execute(query, value_list)
+                self._commit()
+            except MySQLdb.Error as e:
+                logging.getLogger(__name__).exception(
+                    "Failed to delete rows from %s. Error: %s", table_name, str(e))
+                self._rollback()
+                raise
+            deleted += cursor.rowcount
+        return deleted
+
+    def load_data_infile(self, table_name, file_path, columns, disable_checks=False):
+        """
+        Bulk loads rows from a tab-separated file into table_name with
+        LOAD DATA LOCAL INFILE.
+
+        The file must have one row per line, with values in the order of
+        columns, separated by tabs. Tabs, newlines and backslashes in values
+        are escaped with backslashes and NULL is written as \\N (see
+        bulk_loader.BulkLoader). Rows duplicating a unique key are skipped.
+
+        The load is run on a separate connection opened with local_infile
+        enabled, which is otherwise off for security.
+
+        Args:
+            table_name (str): Name of table to load into.
+            file_path (str): Path of file to load.
+            columns ([str]): Columns of table, in file order.
+            disable_checks (bool): If true, unique and foreign key checks are
+                                   turned off during the load. Only safe if the
+                                   rows are known to be consistent.
+
+        Returns:
+            Number of rows loaded.
+        """
+        query = ("LOAD DATA LOCAL INFILE %%s INTO TABLE `%s` CHARACTER SET utf8mb4 "
+                 "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                 "LINES TERMINATED BY '\\n' (%s)" % (
+                     table_name, ', '.join('`%s`' % column for column in columns)))
+        logging.getLogger(__name__).debug(
+            "Loading %s into table %s. Query: %s", file_path, table_name, query)
+        connection = self._new_connection(local_infile=1)
+        try:
+            cursor = connection.cursor()
+            if disable_checks:
+                cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+            cursor.execute(query, (file_path,))
+            connection.commit()
+            self.stats['commits'] += 1
+            return cursor.rowcount
+        except MySQLdb.Error as e:
+            logging.getLogger(__name__).exception(
+                "Failed to load %s into %s. Error: %s", file_path, table_name, str(e))
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
     def import_dict(self, db_dict):
         """
         Imports a dict of dicts into database.
@@ -2,22 +2,36 @@
 DBTable class.
 """
 import logging
+import weakref
+from collections.abc import Mapping
 
 import MySQLdb
 from tabulate import tabulate
 
 from bibliom.dbmanager import DBManager
+from bibliom.rowstore import RowStore
 from bibliom import exceptions
-from bibliom.constants import INFO_THRESHOLD, REPORT_FREQUENCY
+from bibliom.constants import INFO_THRESHOLD, BULK_CHUNK_SIZE, Duplicates
+from bibliom.constants import ROW_CACHE_MAX_ROWS, ROW_CACHE_MAX_BYTES
 
 class DBTable:
     """
     Class representing a table in database. Each DBTable is associated with
     a DMBanager which mediates all transactions with the database.
+
+    Rows fetched from the database are cached in self.rows. If max_rows or
+    max_bytes is set, least recently used SYNCED rows are evicted when the
+    cache grows past the limit. NEW, UNSYNCED and DELETED rows, and rows
+    pinned by DBEntity objects, are never evicted.
+
+    Rows are keyed by row keys: tuples of primary key values in the order of
+    self.key_columns. New rows not yet in the database have keys of the form
+    (NEW_ID_PREFIX, n). Methods taking a row key also accept a key dict or the
+    legacy key string produced by dict_to_key.
     """
     NEW_ID_PREFIX = "db_table_new"
 
-    def __init__(self, table_name, manager=None):
+    def __init__(self, table_name, manager=None, max_rows=None, max_bytes=None):
         if manager is None:
             manager = DBManager.get_manager()
             if manager is None:
@@ -32,11 +46,127 @@ class DBTable:
         self.manager = manager
         self.table_name = table_name
         self.manager.dbtables[table_name] = self
-        self.rows = {}
-        self.row_status = {}
-        self.entites = {}
+        self.entities = weakref.WeakValueDictionary()
         self.next_key = 0
         self.fields = self.manager.table_fields(self.table_name)
+        self.key_columns = tuple(self.manager.primary_key_list(self.table_name))
+        self._int_key_columns = frozenset(
+            column for column in self.key_columns
+            if 'int' in self.table_structure[column]['type'].lower())
+        self._row_store = RowStore(self.fields)
+        self.unique_columns = tuple(
+            column for column, attributes in self.table_structure.items()
+            if attributes['key'] == 'UNI')
+        for column in self.unique_columns:
+            self._row_store.add_index(column)
+        self._row_store.evictable_status = DBTable.RowStatus.SYNCED
+        self._cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.max_rows = None
+        self.max_bytes = None
+        self.set_cache_limits(
+            max_rows if max_rows is not None else ROW_CACHE_MAX_ROWS,
+            max_bytes if max_bytes is not None else ROW_CACHE_MAX_BYTES)
+
+    @property
+    def rows(self):
+        """
+        Cached rows of table, as a mapping of row_key to row. Rows are stored
+        compactly in a RowStore and returned as RowView mappings of field:value.
+        """
+        return self._row_store
+
+    @rows.setter
+    def rows(self, rows):
+        self._row_store.clear()
+        for row_key, row in rows.items():
+            self._row_store[row_key] = row
+
+    @property
+    def row_status(self):
+        """
+        Mapping of row_key to DBTable.RowStatus for cached rows.
+        """
+        return self._row_store.statuses
+
+    @row_status.setter
+    def row_status(self, row_status):
+        self._row_store.statuses.clear()
+        for row_key, status in row_status.items():
+            self._row_store.statuses[row_key] = status
+
+    def set_cache_limits(self, max_rows=None, max_bytes=None):
+        """
+        Sets limits on cached rows and evicts rows if over the new limits.
+
+        Args:
+            max_rows (int): Max number of rows to cache. None for no limit.
+            max_bytes (int): Max approximate size of cached rows in bytes.
+                             None for no limit.
+        """
+        if max_rows is not None and max_rows < 0:
+            raise ValueError("max_rows must be a non-negative integer or None")
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must be a non-negative integer or None")
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        # Rows are only kept in least recently used order if they can be evicted.
+        self.cache_bounded = max_rows is not None or max_bytes is not None
+        self._row_store.track_nbytes(max_bytes is not None)
+        self._evict_rows()
+
+    @property
+    def cache_stats(self):
+        """
+        Dict of row cache statistics: hits and misses of get_row_by_key,
+        evictions, and current number of rows, approximate bytes (if
+        max_bytes is set) and pinned rows.
+        """
+        return {
+            **self._cache_stats,
+            'rows': len(self._row_store),
+            'bytes': self._row_store.nbytes,
+            'pinned': len(self._row_store.pinned_keys())
+        }
+
+    def reset_cache_stats(self):
+        """
+        Resets hit, miss and eviction counters to zero.
+        """
+        self._cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def pin_row(self, row_key):
+        """
+        Prevents row_key from being evicted from the row cache until unpinned.
+        Pins are counted, so a row pinned twice must be unpinned twice.
+        """
+        self._row_store.pin(self.make_key(row_key))
+
+    def unpin_row(self, row_key):
+        """
+        Releases a pin on row_key set with pin_row.
+        """
+        if self._row_store.unpin(self.make_key(row_key)):
+            self._evict_rows()
+
+    def _evict_rows(self):
+        """
+        Evicts least recently used SYNCED rows that aren't pinned until the
+        row cache is within max_rows and max_bytes.
+        """
+        store = self._row_store
+        excess_rows = len(store) - self.max_rows if self.max_rows is not None else 0
+        excess_bytes = store.nbytes - self.max_bytes if self.max_bytes is not None else 0
+        if excess_rows <= 0 and excess_bytes <= 0:
+            return
+        while excess_rows > 0 or excess_bytes > 0:
+            row_key = store.least_recent_evictable()
+            if row_key is None:
+                break
+            excess_rows -= 1
+            excess_bytes -= store.row_nbytes(row_key)
+            del self.rows[row_key]
+            del self.row_status[row_key]
+            self._cache_stats['evictions'] += 1
 
     def __str__(self):
         return "%s|%s" % (self.manager, self.table_name)
@@ -62,10 +192,67 @@ class DBTable:
 
     KEY_STR_DELIMITER = "%%"
 
+    def make_key(self, key):
+        """
+        Returns the row key for key.
+
+        Args:
+            key (tuple, dict, str or int): A row key, a dict of primary key
+                column:value, a key string from dict_to_key, or a primary key
+                value for a table with a single primary key column.
+
+        Returns:
+            Tuple of primary key values in the order of self.key_columns.
+        """
+        if isinstance(key, tuple):
+            return key
+        if isinstance(key, dict):
+            try:
+                return tuple(key[column] for column in self.key_columns)
+            except KeyError:
+                raise ValueError("key %s does not contain primary key of table %s" %
+                                 (key, self.table_name))
+        if isinstance(key, str):
+            new_prefix = DBTable.NEW_ID_PREFIX + DBTable.KEY_STR_DELIMITER
+            if key.startswith(new_prefix):
+                return (DBTable.NEW_ID_PREFIX, int(key[len(new_prefix):]))
+            key_list = key.split(DBTable.KEY_STR_DELIMITER)
+            key_length = len(key_list) // 2
+            key_dict = dict(zip(key_list[:key_length], key_list[key_length:]))
+            if not key_length or len(key_list) != 2 * key_length:
+                raise ValueError("key %s improperly formatted" % key)
+            for column in self._int_key_columns.intersection(key_dict):
+                key_dict[column] = int(key_dict[column])
+            return self.make_key(key_dict)
+        if len(self.key_columns) == 1:
+            return (key,)
+        raise TypeError("key must be a row key tuple, key dict or key string")
+
+    def key_dict(self, row_key):
+        """
+        Returns dict of primary key column:value for row_key.
+        """
+        return dict(zip(self.key_columns, self.make_key(row_key)))
+
+    def row_key_of(self, row):
+        """
+        Returns the row key of a row dict containing the table's primary key.
+        """
+        return tuple(row[column] for column in self.key_columns)
+
+    @staticmethod
+    def is_new_key(row_key):
+        """
+        Returns True if row_key is the key of a new row not yet in the database.
+        """
+        return (len(row_key) == 2 and row_key[0] == DBTable.NEW_ID_PREFIX)
+
     @staticmethod
     def dict_to_key(key_dict):
         """
-        Generates a key string from a dict of column:value.
+        Generates a legacy key string from a dict of column:value. Row keys are
+        now tuples (see make_key); key strings are still accepted wherever a
+        row key is.
         """
         if not isinstance(key_dict, dict):
             raise TypeError('key_dict must be a dict of column:value.')
@@ -78,7 +265,9 @@ class DBTable:
     @staticmethod
     def key_to_dict(key):
         """
-        Generates a dictionary of column:value from key.
+        Generates a dictionary of column:value from a legacy key string. Values
+        that look like integers are converted to int; DBTable.key_dict uses the
+        table's column types instead.
         """
         if not isinstance(key, str):
             raise TypeError('key must be a codeded string.')
@@ -151,7 +340,8 @@ class DBTable:
         """
         return self.manager.table_row_count(self.table_name)
 
-    def fetch_rows(self, where_dict=None, limit=0, order_by=None, overwrite=True, **kwargs):
+    def fetch_rows(self, where_dict=None, limit=0, order_by=None, overwrite=True, columns=None,
+                   **kwargs):
         """
         Fetch rows from database, add to self.rows, and return.
 
@@ -164,20 +354,100 @@ class DBTable:
             order_by (str/list/dict): Table field(s) to order by
             overwrite (bool):  If true, replace existing rows when primary key
                                matches. Otherwise, skip matching rows.
+            columns ([str]):   Columns to fetch. Primary key columns are always
+                               fetched. Other columns of newly cached rows are
+                               deferred, and loaded when they are needed (see
+                               get_row_by_key). Defaults to all columns.
             **kwargs:          Each additional keyword argument adds filter to
                                column following rules for where_dict.
         """
-        rows = self.manager.fetch_rows(self.table_name, where_dict, limit, order_by, **kwargs)
+        columns = self._fetch_columns(columns)
+        rows = self.manager.fetch_rows(
+            self.table_name, where_dict, limit, order_by, columns=columns, **kwargs)
         if rows is None:
             return None
-        primary_keys = self.manager.primary_key_list(self.table_name)
+        return self._cache_fetched_rows(rows, columns, overwrite)
+
+    def iter_rows(self, where_dict=None, columns=None, batch_size=None, cache=False, **kwargs):
+        """
+        Streams rows matching where_dict from database in constant memory (see
+        DBManager.iter_rows).
+
+        Args:
+            where_dict (dict): Filter following rules for fetch_rows. Defaults
+                               to all rows.
+            columns ([str]):   Columns to fetch. Primary key columns are always
+                               fetched.
+            batch_size (int):  Rows read from the server at a time.
+            cache (bool):      If true, rows are also added to self.rows as by
+                               fetch_rows, subject to the cache limits.
+                               Otherwise the cache is bypassed entirely.
+            **kwargs:          Additional filters, as for where_dict.
+
+        Yields:
+            (row_key, row) pairs.
+        """
+        columns = self._fetch_columns(columns)
+        for rows in self.manager.iter_rows(
+                self.table_name, where_dict, columns=columns, batch_size=batch_size,
+                batches=True, **kwargs):
+            if cache:
+                yield from self._cache_fetched_rows(rows, columns).items()
+            else:
+                for row in rows:
+                    yield (self.row_key_of(row), row)
+
+    def _fetch_columns(self, columns):
+        """
+        Returns columns with primary key columns added, or None for all columns.
+        """
+        if columns is None:
+            return None
+        return list(self.key_columns) + [
+            column for column in columns if column not in self.key_columns]
+
+    def _cache_fetched_rows(self, rows, columns=None, overwrite=True):
+        """
+        Adds rows fetched from database to cache, with status SYNCED, and
+        returns them as a dict indexed by row_key. If columns is given, the
+        other fields of newly cached rows are deferred, and fetched columns of
+        already cached rows are updated.
+
+        Changed fields of cached rows keep their values and stay dirty, unless
+        the fetched value is the same, and rows with changes left stay
+        UNSYNCED.
+        """
+        deferred = ()
+        if columns is not None:
+            deferred = [field for field in self.fields if field not in columns]
         rows_dict = {}
         for row in rows:
-            key_str = DBTable.dict_to_key({key:row[key] for key in primary_keys})
-            if overwrite or key_str not in self.rows.keys():
-                rows_dict[key_str] = row
-                self.rows[key_str] = row
-                self.row_status[key_str] = DBTable.RowStatus.SYNCED
+            row_key = self.row_key_of(row)
+            if not overwrite and row_key in self.rows:
+                continue
+            cached_row = self.rows.get(row_key)
+            dirty = self.rows.dirty_fields(row_key) if cached_row is not None else ()
+            if cached_row is None or not (deferred or dirty):
+                self.rows[row_key] = row
+                if deferred:
+                    self.rows.mark_unloaded(row_key, deferred)
+                self.row_status[row_key] = DBTable.RowStatus.SYNCED
+                rows_dict[row_key] = row
+                continue
+            fetched = self.fields if columns is None else columns
+            for column in fetched:
+                if column not in dirty:
+                    cached_row[column] = row[column]
+            self.rows.mark_loaded(row_key, fetched)
+            self.rows.clear_dirty(
+                row_key, [column for column in dirty
+                          if column in fetched and cached_row[column] == row[column]])
+            if self.rows.is_dirty(row_key):
+                self.row_status[row_key] = DBTable.RowStatus.UNSYNCED
+            else:
+                self.row_status[row_key] = DBTable.RowStatus.SYNCED
+            rows_dict[row_key] = {column: cached_row[column] for column in row}
+        self._evict_rows()
         return rows_dict
 
     def print_rows(self, rows, max_width=20):
@@ -200,51 +470,203 @@ class DBTable:
         """
         Print first num_rows rows from database.
         """
-        auto_increment_field = None
-        for field, data in self.table_structure.items():
-            if data['extra'] == 'auto_increment':
-                auto_increment_field = field
-                break
+        auto_increment_field = self.manager.auto_increment_column(self.table_name)
         rows = self.fetch_rows(where_dict=None, limit=num_rows, order_by=auto_increment_field)
         self.print_rows(rows, max_width)
         return rows
 
-    def get_row_by_key(self, row_key):
+    def get_row_by_key(self, row_key, fields=None):
         """
         Returns a row dictionary. If row_key is in self.rows, return that. If not,
         query manager for row, add it to self.rows, and return.
+
+        Args:
+            row_key: Row key, or any key accepted by make_key.
+            fields ([str]): Deferred fields of a cached row to load before
+                            returning. Defaults to all fields. Other deferred
+                            fields are None in the returned row.
         """
-        if row_key in self.rows.keys():
-            return self.rows[row_key]
-        row = self.manager.fetch_row(self.table_name, DBTable.key_to_dict(row_key))
+        row_key = self.make_key(row_key)
+        row = self.rows.get(row_key)
+        if row is not None:
+            self._cache_stats['hits'] += 1
+            if self.cache_bounded:
+                self.rows.touch(row_key)
+            self._load_deferred(row_key, fields)
+            return row
+        self._cache_stats['misses'] += 1
+        row = self.manager.fetch_row(self.table_name, self.key_dict(row_key))
+        if row is None:
+            return None
         self.rows[row_key] = row
-        return self.rows[row_key]
+        if self.row_status.get(row_key) is None:
+            self.row_status[row_key] = DBTable.RowStatus.SYNCED
+        self._evict_rows()
+        # A row evicted at once is returned as fetched.
+        return self.rows.get(row_key, row)
+
+    def get_field(self, row_key, field_name):
+        """
+        Returns value of field_name in row_key, loading it if it is deferred.
+        """
+        row = self.get_row_by_key(row_key, fields=(field_name,))
+        if row is None:
+            raise ValueError("row_key %s not found in table %s" %(row_key, self.table_name))
+        return row[field_name]
+
+    def _load_deferred(self, row_key, fields=None):
+        """
+        Loads deferred fields (default all) of cached row row_key. The same
+        fields are loaded in the same query for other pinned rows, which are in
+        use by DBEntity objects, that have deferred them.
+        """
+        unloaded = self.rows.unloaded_fields(row_key)
+        if fields is not None:
+            unloaded = [field for field in unloaded if field in fields]
+        if not unloaded:
+            return
+        row_keys = [row_key]
+        for pinned_key in self._row_store.pinned_keys():
+            if (pinned_key != row_key
+                    and pinned_key in self.rows
+                    and not DBTable.is_new_key(pinned_key)
+                    and set(unloaded).intersection(self.rows.unloaded_fields(pinned_key))):
+                row_keys.append(pinned_key)
+        self.load_fields(row_keys, unloaded)
+
+    def load_fields(self, row_keys, fields=None):
+        """
+        Loads fields of cached rows from db, with one query per chunk of rows.
+        Only fields that are deferred are overwritten, so values set with
+        set_field are kept.
+
+        Args:
+            row_keys ([tuple]): Keys of cached rows.
+            fields ([str]): Fields to load. Defaults to all deferred fields of
+                            the rows.
+        """
+        row_keys = [row_key for row_key in row_keys if row_key in self.rows]
+        if fields is None:
+            fields = set()
+            for row_key in row_keys:
+                fields.update(self.rows.unloaded_fields(row_key))
+            fields = [field for field in self.fields if field in fields]
+        if not row_keys or not fields:
+            return
+        db_rows = self.manager.fetch_rows_by_key(self.table_name, row_keys, columns=fields)
+        for db_row in db_rows:
+            row_key = self.row_key_of(db_row)
+            row = self.rows.get(row_key)
+            if row is None:
+                continue
+            unloaded = self.rows.unloaded_fields(row_key)
+            for field in fields:
+                if field in unloaded:
+                    row[field] = db_row[field]
+            self.rows.mark_loaded(row_key, fields)
+
+    @staticmethod
+    def _is_equality(value):
+        """
+        Returns True if value in a where_dict tests a column for equality.
+        """
+        if value is None or isinstance(value, (list, tuple, dict)):
+            return False
+        if value in ('NULL', 'NOT NULL'):
+            return False
+        return not str(value).startswith(('%', '>', '<', '!='))
+
+    def lookup(self, column, value):
+        """
+        Returns key of a cached row with value in unique column, found in an
+        in-memory index rather than with a query. Indexes are kept for every
+        UNIQUE column of the table (self.unique_columns) as rows are cached,
+        changed and removed.
+
+        Args:
+            column (str): A unique column, eg. 'doi'.
+            value: Value of column.
+
+        Returns:
+            Row key, or None if no cached row is known to have value or the
+            row has been deleted.
+
+        Raises:
+            ValueError if column isn't a unique column of table.
+        """
+        if column not in self.unique_columns:
+            raise ValueError("%s is not a unique column of table %s" %
+                             (column, self.table_name))
+        if value is None:
+            return None
+        row_key = self.rows.lookup(column, value)
+        if row_key is None or self.row_status.get(row_key) == DBTable.RowStatus.DELETED:
+            return None
+        return row_key
+
+    def cached_row_key(self, where_dict):
+        """
+        Returns key of the cached row matching where_dict, without querying the
+        database, if where_dict selects one row by equality on its primary key
+        or on a unique column (see lookup). Every condition in where_dict is
+        checked against the cached row.
+
+        Returns:
+            Row key, or None if the row has to be fetched from the database.
+        """
+        if not where_dict or not all(map(DBTable._is_equality, where_dict.values())):
+            return None
+        row_key = None
+        if all(column in where_dict for column in self.key_columns):
+            row_key = tuple(where_dict[column] for column in self.key_columns)
+        else:
+            for column in self.unique_columns:
+                if column in where_dict:
+                    row_key = self.lookup(column, where_dict[column])
+                    break
+        if row_key is None or self.row_status.get(row_key) not in (
+                DBTable.RowStatus.SYNCED, DBTable.RowStatus.UNSYNCED):
+            return None
+        row = self.rows.get(row_key)
+        if row is None:
+            return None
+        unloaded = self.rows.unloaded_fields(row_key)
+        for column, value in where_dict.items():
+            if column in unloaded or column not in row or row[column] != value:
+                return None
+        return row_key
+
+    def _cached_duplicate(self, row_dict):
+        """
+        Returns key of a cached row in the database (SYNCED or UNSYNCED) with
+        the same primary key as row_dict, or the same value in a unique column,
+        or None.
+        """
+        in_db = (DBTable.RowStatus.SYNCED, DBTable.RowStatus.UNSYNCED)
+        if all(row_dict.get(column) for column in self.key_columns):
+            row_key = self.row_key_of(row_dict)
+            if row_key in self.rows and self.row_status.get(row_key) in in_db:
+                return row_key
+        for column in self.unique_columns:
+            value = row_dict.get(column)
+            if value:
+                row_key = self.lookup(column, value)
+                if row_key is not None and self.row_status.get(row_key) in in_db:
+                    return row_key
+        return None
 
     def get_row_by_primary_key(self, primary_key):
         """
         Returns a row dictionary where the row's key is created from the primary key.
         Only works for tables with a single-column primary key.
         """
-        key_cols = self.manager.primary_key_list(self.table_name)
-        if len(key_cols) != 1:
+        if len(self.key_columns) != 1:
             raise AttributeError("DBTable.get_row_by_primary_key: can only be "
                                  + "called for a table with a single primary key column.")
-        row_key = self.dict_to_key({key_cols[0]:primary_key})
-        return self.get_row_by_key(row_key)
+        return self.get_row_by_key((primary_key,))
 
-    class Duplicates:
-        """
-        How to handle duplicate entries when inserting rows.
-
-        SKIP: Skip inserting the row, leaving original entry unchanged.
-        INSERT: Insert new value if old value is unset 
-        OVERWRITE: New values overwrite old values but unset fields in new row left unchanged.
-        REPLACE: Old row is dropped and new row inserted in its place.
-        """
-        SKIP = 1
-        INSERT = 2
-        OVERWRITE = 3
-        REPLACE = 4
+    # How to handle duplicate entries when inserting rows. See constants.Duplicates.
+    Duplicates = Duplicates
 
     def insert_row(self, row_dict, duplicates=None):
         """
@@ -258,18 +680,21 @@ class DBTable:
         """
         if duplicates is None:
             duplicates = DBTable.Duplicates.SKIP
+        row_dict = dict(row_dict)
 
-        try:
-            new_pri_key = self.manager.insert_row(self.table_name, row_dict)
-            duplicate_entry = False
-        except MySQLdb.IntegrityError as e:
-            if e.args[0] == 1062: #Duplicate entry
-                duplicate_entry = True
-            else:
-                raise
+        # Rows already cached are found in memory, without a failed INSERT.
+        duplicate_key = self._cached_duplicate(row_dict)
+        duplicate_entry = duplicate_key is not None
+        if not duplicate_entry:
+            try:
+                new_pri_key = self.manager.insert_row(self.table_name, row_dict)
+            except MySQLdb.IntegrityError as e:
+                if e.args[0] == 1062: #Duplicate entry
+                    duplicate_entry = True
+                else:
+                    raise
 
-        if duplicate_entry:
-            duplicate_key = None
+        if duplicate_entry and duplicate_key is None:
             pkey_dict = {}
             unique_dict_list = []
             old_row = {}
@@ -298,7 +723,8 @@ class DBTable:
                     ('Row: %s\n' % str(old_row))
                 )
             duplicate_key = list(old_row.keys())[0]
-                
+
+        if duplicate_entry:
             if duplicates == self.Duplicates.SKIP:
                 return duplicate_key
             elif duplicates == self.Duplicates.REPLACE:
@@ -326,24 +752,20 @@ class DBTable:
             else:
                 raise AttributeError("Parameter 'duplicates' has unknown value.")
         else: #No duplicate entry
-            pkl = self.manager.primary_key_list(self.table_name)
-            if new_pri_key > 0 and len(pkl) == 1:
+            if new_pri_key > 0 and len(self.key_columns) == 1:
                 # Row inserted successfully and primary key returned
-                new_row_key = DBTable.dict_to_key({pkl[0]:new_pri_key})
-                row_dict[pkl[0]] = new_pri_key
+                new_row_key = (new_pri_key,)
+                row_dict[self.key_columns[0]] = new_pri_key
             elif new_pri_key == -1:
                 # Row inserted successfuly, but no AUTO INCREMENT primary key
                 # so primary key must be a subset of row_dict.
-                new_key_dict = {key:row_dict[key]
-                                for key in self.manager.primary_key_list(self.table_name)}
-                new_row_key = DBTable.dict_to_key(new_key_dict)
+                new_row_key = self.row_key_of(row_dict)
             else:
                 raise exceptions.BiblioException(
                     'Primary key is neither AUTO INCREMENT nor subset of row_dict.')
-            self.rows[new_row_key] = {}
-            self.rows[new_row_key] = {field_key:row_dict.get(field_key) 
-                                      for field_key in self.fields}
+            self.rows[new_row_key] = row_dict
             self.row_status[new_row_key] = DBTable.RowStatus.SYNCED
+            self._evict_rows()
             return new_row_key
 
     def insert_many_new_rows(self):
@@ -354,30 +776,50 @@ class DBTable:
         inefficient.
         """
         new_keys = [key for key, value in self.row_status.items()
-                    if value == self.RowStatus.NEW]
-        new_rows = [row for key, row in self.rows.items() if key in new_keys]
+                    if value == self.RowStatus.NEW and key in self.rows]
+        new_rows = [self.rows[key].copy() for key in new_keys]
         updated_rows = self.manager.insert_many_rows(self.table_name, new_rows)
         if updated_rows:
             for key in new_keys:
                 del self.row_status[key]
                 del self.rows[key]
-            pkl = self.manager.primary_key_list(self.table_name)
             for row in updated_rows:
-                key_dict = {}
-                for key in pkl:
-                    key_dict[key] = row[key]
-                key_str = self.dict_to_key(key_dict)
-                self.rows[key_str] = row
-                self.row_status[key_str] = self.RowStatus.SYNCED
+                row_key = self.row_key_of(row)
+                self.rows[row_key] = row
+                self.row_status[row_key] = self.RowStatus.SYNCED
+            self._evict_rows()
             return True
         return False
 
+    def upsert_rows(self, rows, duplicates=None):
+        """
+        Inserts many rows into table with batched statements, handling
+        duplicate entries according to duplicates. Cached copies of affected
+        rows are dropped, so they are refetched on next access.
+
+        Args:
+            rows ([dict]): List of field:value dicts.
+            duplicates (int): A DBTable.Duplicates value. Defaults to SKIP.
+
+        Returns:
+            List of row keys, one for each row in rows.
+        """
+        key_dicts = self.manager.upsert_rows(self.table_name, rows, duplicates)
+        row_keys = []
+        for key_dict in key_dicts:
+            row_key = self.row_key_of(key_dict)
+            if self.row_status.get(row_key) == DBTable.RowStatus.SYNCED:
+                del self.rows[row_key]
+                del self.row_status[row_key]
+            row_keys.append(row_key)
+        return row_keys
+
     def update_row(self, row_key, row_dict):
         """
         Update row with primary key key_dict according to row_dict.
 
         Args:
-            row_key (str or dict): Primary key or key dict of row to update.
+            row_key (tuple, str or dict): Row key or key dict of row to update.
             row_dict: Dict of column:value pairs to update row with.
 
         Returns:
@@ -386,7 +828,7 @@ class DBTable:
         return self.manager.update_rows(
             self.table_name,
             row_dict,
-            DBTable.key_to_dict(row_key))
+            self.key_dict(row_key))
 
     def delete_row(self, row_key):
         """
@@ -394,19 +836,21 @@ class DBTable:
 
         Args:
             table_name (str): Name of the table to delete from.
-            key (str, int or dict): Primary key or key dict of row to delete.
+            key (tuple, str, int or dict): Row key, primary key or key dict of
+                row to delete.
         """
+        row_key = self.make_key(row_key)
         self.row_status[row_key] = self.RowStatus.DELETED
         return self.manager.delete_rows(
             self.table_name,
-            DBTable.key_to_dict(row_key))
+            self.key_dict(row_key))
 
     def delete_rows(self, row_keys):
         """
         Deletes rows from table_name matching where_dict.
         """
         if ((not isinstance(row_keys, list)) or
-                row_keys and not isinstance(row_keys[0], str)):
+                row_keys and not isinstance(row_keys[0], (tuple, str))):
             raise TypeError("row_keys must be list of row keys to delete")
         for row_key in row_keys:
             self.delete_row(row_key)
@@ -425,12 +869,12 @@ class DBTable:
         Adds a new row to self.rows and returns the key for that
         row. Row not added to database until table is synced.
         """
-        row_key = DBTable.NEW_ID_PREFIX + DBTable.KEY_STR_DELIMITER + str(self.next_key)
+        row_key = (DBTable.NEW_ID_PREFIX, self.next_key)
         self.next_key += 1
         if fields_dict is None:
             self.rows[row_key] = {field:None for field in self.fields}
         else:
-            if not isinstance(fields_dict, dict):
+            if not isinstance(fields_dict, Mapping):
                 raise TypeError("fields_dict must by dict of column:value pairs")
             for key in fields_dict.keys():
                 if key not in self.fields:
@@ -445,9 +889,9 @@ class DBTable:
         """
         Adds new rows from list of fields dicts or dict of fields dicts.
         """
-        if not isinstance(rows, dict) and not isinstance(rows, list):
+        if not isinstance(rows, Mapping) and not isinstance(rows, list):
             raise TypeError("rows must be list of fields dicts or dict of fields dicts")
-        if isinstance(rows, dict):
+        if isinstance(rows, Mapping):
             rows = rows.values()
         for row in rows:
             self.create_new_row(row)
@@ -455,43 +899,251 @@ class DBTable:
     def set_field(self, row_key, field_name, field_value):
         """
         Sets the value of a field in a row. If row's status is SYNCED, set
-        status to UNSYNCED.
+        status to UNSYNCED. Changed fields of rows in the database are
+        recorded, so that sync_to_db only writes those fields.
         """
-        row = self.rows.get(row_key)
+        row_key = self.make_key(row_key)
+        row = self.get_row_by_key(row_key, fields=())
         if row is None:
             raise ValueError("row_key %s not found in table %s" %(row_key, self.table_name))
-        self.rows[row_key][field_name] = field_value
-        if self.row_status[row_key] == DBTable.RowStatus.SYNCED:
+        status = self.row_status.get(row_key)
+        if field_name in self.rows.unloaded_fields(row_key):
+            self.rows.mark_loaded(row_key, (field_name,))
+        elif status == DBTable.RowStatus.SYNCED and row[field_name] == field_value:
+            return
+        row[field_name] = field_value
+        if status == DBTable.RowStatus.SYNCED or self.rows.dirty_fields(row_key):
+            self.rows.mark_dirty(row_key, field_name)
+        if status == DBTable.RowStatus.SYNCED:
             self.row_status[row_key] = DBTable.RowStatus.UNSYNCED
 
-    def sync_to_db(self):
+    def set_cached_field(self, row_key, index, field_value):
         """
-        Updates db from self.rows, and sets all row statuses to SYNCED.
+        Sets field number index of cached row row_key as set_field does, but
+        without looking up the row or the field name. Used by the field
+        attributes of DBEntity classes.
 
-        Returns row_key of last new inserted row.
+        Args:
+            row_key (tuple): Row key as returned by make_key.
+            index (int): Position of field in self.fields.
+            field_value: New value.
+
+        Returns:
+            True if the field was set, or False, without setting the field, if
+            the row isn't cached or the field hasn't been loaded.
         """
-        logging.getLogger(__name__).debug('Syncing table %s to db.', self.table_name)
-        new_row_key = None
-        row_keys = list(self.rows.keys())
-        for count, row_key in enumerate(row_keys):
-            row_dict = self.rows[row_key]
-            if self.row_status[row_key] == DBTable.RowStatus.DELETED:
-                break
-            if self.row_status[row_key] == DBTable.RowStatus.NEW:
-                new_row_key = self.insert_row(row_dict)
-                self.row_status[new_row_key] = DBTable.RowStatus.SYNCED
-                del self.rows[row_key]
-            elif self.row_status[row_key] == DBTable.RowStatus.UNSYNCED:
-                if (self.manager.update_rows(self.table_name,
-                                             row_dict,
-                                             DBTable.key_to_dict(row_key))):
-                    self.row_status[row_key] = DBTable.RowStatus.SYNCED
-                else:
-                    raise exceptions.BiblioException('In DBTable.sync_to_db: Row failed to update.')
-            if len(row_keys) >= INFO_THRESHOLD and (count + 1) % REPORT_FREQUENCY == 0:
-                logging.getLogger(__name__).verbose_info(
-                    "Synced %s / %s rows to db.",
-                    count + 1,
-                    len(row_keys)
-                )
-        return new_row_key
+        store = self._row_store
+        try:
+            old_value = store.swap_value(row_key, index, field_value)
+        except KeyError:
+            return False
+        status = store.statuses.get(row_key)
+        if status == DBTable.RowStatus.SYNCED:
+            if old_value != field_value:
+                store.mark_dirty(row_key, store.fields[index])
+                store.set_status(row_key, DBTable.RowStatus.UNSYNCED)
+        elif store.is_dirty(row_key):
+            store.mark_dirty(row_key, store.fields[index])
+        return True
+
+    def dirty_fields(self, row_key):
+        """
+        Returns tuple of fields of row_key changed with set_field since the row
+        was last synced. Empty if no changes have been recorded.
+        """
+        return self.rows.dirty_fields(self.make_key(row_key))
+
+    def sync_to_db(self, chunk_size=None):
+        """
+        Writes pending changes to cached rows to db as one batched unit of work,
+        and sets statuses of written rows to SYNCED.
+
+        NEW rows are inserted with multi-row INSERTs (see DBManager.upsert_rows;
+        rows duplicating an existing row are skipped), UNSYNCED rows are written
+        with UPDATE ... CASE statements and DELETED rows are removed with
+        DELETE ... WHERE key IN (...). Changes are written in chunks of
+        chunk_size new, changed and deleted rows, each in one transaction, and
+        cached rows are only updated once their chunk is committed. If writing
+        a chunk fails, its rows keep their pending changes.
+
+        Args:
+            chunk_size (int): Max rows per statement. Defaults to BULK_CHUNK_SIZE.
+
+        Returns:
+            Dict summarizing affected row keys:
+                'inserted': {key of new row: row key in database}
+                'updated':  [row keys]
+                'deleted':  [row keys]
+        """
+        new_keys = []
+        unsynced_keys = []
+        deleted_keys = []
+        for row_key, status in list(self.row_status.items()):
+            if status == DBTable.RowStatus.DELETED:
+                deleted_keys.append(row_key)
+            elif row_key not in self.rows:
+                continue
+            elif status == DBTable.RowStatus.NEW:
+                new_keys.append(row_key)
+            elif status == DBTable.RowStatus.UNSYNCED:
+                unsynced_keys.append(row_key)
+        change_count = len(new_keys) + len(unsynced_keys) + len(deleted_keys)
+        if change_count >= INFO_THRESHOLD:
+            logging.getLogger(__name__).verbose_info(
+                "Syncing %s new, %s changed and %s deleted rows of table %s to db.",
+                len(new_keys), len(unsynced_keys), len(deleted_keys), self.table_name)
+        else:
+            logging.getLogger(__name__).debug('Syncing table %s to db.', self.table_name)
+
+        if chunk_size is None:
+            chunk_size = BULK_CHUNK_SIZE
+        summary = {'inserted': {}, 'updated': [], 'deleted': []}
+        for start in range(0, max(len(new_keys), len(unsynced_keys), len(deleted_keys)),
+                           chunk_size):
+            new_chunk = new_keys[start:start + chunk_size]
+            unsynced_chunk = unsynced_keys[start:start + chunk_size]
+            deleted_chunk = deleted_keys[start:start + chunk_size]
+            with self.manager.transaction():
+                new_rows = self._write_new_rows(new_chunk, chunk_size)
+                self._write_unsynced_rows(unsynced_chunk, chunk_size)
+                self._write_deleted_rows(deleted_chunk, chunk_size)
+            summary['inserted'].update(self._rekey_new_rows(new_chunk, new_rows))
+            summary['updated'].extend(self._sync_unsynced_rows(unsynced_chunk))
+            summary['deleted'].extend(self._drop_deleted_rows(deleted_chunk))
+        self._evict_rows()
+        return summary
+
+    def _write_new_rows(self, new_keys, chunk_size):
+        """
+        Inserts NEW rows into db, except rows duplicating a cached row in the
+        database (see lookup). The cache isn't changed.
+
+        Returns:
+            List of (new row key, row, unkeyed, key dict) tuples of inserted
+            rows. unkeyed is True for a row without primary or unique key
+            values, and key dict holds key values of the row in the database.
+        """
+        new_keys = [row_key for row_key in new_keys
+                    if self._cached_duplicate(self.rows[row_key]) is None]
+        new_rows = [self.rows[row_key].copy() for row_key in new_keys]
+        key_sets = [self.key_columns] + self.manager.unique_key_list(self.table_name)
+        unkeyed = [
+            not any(all(row.get(column) is not None for column in key_columns)
+                    for key_columns in key_sets)
+            for row in new_rows]
+        key_dicts = self.manager.upsert_rows(
+            self.table_name,
+            new_rows,
+            DBTable.Duplicates.SKIP,
+            chunk_size) if new_rows else []
+        return list(zip(new_keys, new_rows, unkeyed, key_dicts))
+
+    def _rekey_new_rows(self, new_keys, new_rows):
+        """
+        Rekeys NEW rows by their primary keys once written by _write_new_rows.
+
+        A row without primary or unique key values can't have matched an
+        existing row, so it is cached as written. Rows duplicating a cached row
+        in the database are resolved to that row. Other rows are refetched on
+        next access. Entities of new rows are moved to the new row keys.
+
+        Args:
+            new_keys (list): Keys of NEW rows passed to _write_new_rows.
+            new_rows (list): Rows returned by _write_new_rows.
+
+        Returns:
+            Dict of new row key: row key in database.
+        """
+        inserted = {}
+        for old_key in new_keys:
+            duplicate_key = self._cached_duplicate(self.rows[old_key])
+            if duplicate_key is not None:
+                inserted[old_key] = duplicate_key
+        for old_key, row, is_unkeyed, key_dict in new_rows:
+            row_key = self.row_key_of(key_dict)
+            inserted[old_key] = row_key
+            del self.rows[old_key]
+            del self.row_status[old_key]
+            if is_unkeyed and row_key not in self.rows:
+                row.update(key_dict)
+                self.rows[row_key] = row
+                self.row_status[row_key] = DBTable.RowStatus.SYNCED
+        for old_key, row_key in inserted.items():
+            if old_key in self.rows:
+                del self.rows[old_key]
+                del self.row_status[old_key]
+            entity = self.entities.get(old_key)
+            if entity is not None:
+                entity._set_row_key(row_key) #pylint: disable=protected-access
+        return inserted
+
+    def _write_unsynced_rows(self, unsynced_keys, chunk_size):
+        """
+        Writes UNSYNCED rows to db. The cache isn't changed.
+
+        Only dirty fields of rows are written, or all fields that aren't None
+        for rows without recorded changes. Rows changing the same set of fields
+        are written together. Rows whose primary key values have been changed
+        are updated one at a time by their original keys.
+        """
+        update_groups = {}
+        for row_key in unsynced_keys:
+            row = self.rows[row_key]
+            columns = self.rows.dirty_fields(row_key)
+            if not columns:
+                columns = tuple(field for field, value in row.items() if value is not None)
+            if self.row_key_of(row) != row_key:
+                if not self.manager.update_rows(
+                        self.table_name,
+                        {column: row[column] for column in columns},
+                        self.key_dict(row_key)):
+                    raise exceptions.BiblioException(
+                        'In DBTable.sync_to_db: Row failed to update.')
+                continue
+            columns = tuple(column for column in columns if column not in self.key_columns)
+            update_row = dict(zip(self.key_columns, row_key))
+            for column in columns:
+                update_row[column] = row[column]
+            update_groups.setdefault(columns, []).append(update_row)
+        for update_rows in update_groups.values():
+            self.manager.update_many_rows(
+                self.table_name,
+                update_rows,
+                chunk_size,
+                allow_none=True)
+
+    def _sync_unsynced_rows(self, unsynced_keys):
+        """
+        Clears changes of UNSYNCED rows written by _write_unsynced_rows and
+        sets their statuses to SYNCED.
+
+        Returns:
+            List of updated row keys.
+        """
+        for row_key in unsynced_keys:
+            self.rows.clear_dirty(row_key)
+            self.row_status[row_key] = DBTable.RowStatus.SYNCED
+        return unsynced_keys
+
+    def _write_deleted_rows(self, deleted_keys, chunk_size):
+        """
+        Deletes DELETED rows from db. The cache isn't changed.
+        """
+        db_keys = [row_key for row_key in deleted_keys if not DBTable.is_new_key(row_key)]
+        if db_keys:
+            self.manager.delete_many_rows(
+                self.table_name,
+                [self.key_dict(row_key) for row_key in db_keys],
+                chunk_size)
+
+    def _drop_deleted_rows(self, deleted_keys):
+        """
+        Drops DELETED rows deleted by _write_deleted_rows from the cache.
+
+        Returns:
+            List of deleted row keys.
+        """
+        for row_key in deleted_keys:
+            self.rows.pop(row_key, None)
+            del self.row_status[row_key]
+        return [row_key for row_key in deleted_keys if not DBTable.is_new_key(row_key)]
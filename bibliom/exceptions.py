@@ -14,6 +14,11 @@ class UnknownDatabaseError(BiblioException, MySQLdb.OperationalError):
     exist.
     """
 
+class PoolTimeoutError(BiblioException):
+    """
+    Raised when no pooled database connection becomes available in time.
+    """
+
 class FailedDatabaseCreationError(BiblioException):
     """
     Raised when attempt to create new database but failed.
@@ -0,0 +1,54 @@
+"""
+IdAllocator class.
+
+Hands out ids for rows before they are inserted, so that rows in different
+tables can be linked by foreign key without a query per row. Ids are reserved
+from the database in blocks with DBManager.reserve_ids, so several importers,
+in other threads or processes, never receive the same id.
+"""
+import threading
+
+from bibliom.constants import ID_BLOCK_SIZE
+
+class IdAllocator:
+    """
+    Thread-safe source of ids for the auto increment columns of tables.
+
+    Ids are reserved block_size at a time. Ids of a block that aren't handed
+    out are never used, which leaves gaps in the id sequence.
+
+    Example:
+        allocator = IdAllocator(manager)
+        idpaper = allocator.next_id('paper')
+        first_idauthor = allocator.reserve('author', 20)
+    """
+    def __init__(self, manager, block_size=ID_BLOCK_SIZE):
+        if block_size < 1:
+            raise ValueError("block_size must be positive.")
+        self.manager = manager
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_id(self, table_name):
+        """
+        Returns an unused id of table_name.
+        """
+        with self._lock:
+            (next_id, end_id) = self._blocks.get(table_name, (0, 0))
+            if next_id >= end_id:
+                next_id = self.manager.reserve_ids(table_name, self.block_size)
+                end_id = next_id + self.block_size
+            self._blocks[table_name] = (next_id + 1, end_id)
+            return next_id
+
+    def reserve(self, table_name, count):
+        """
+        Returns first id of count consecutive unused ids of table_name.
+        """
+        with self._lock:
+            (next_id, end_id) = self._blocks.get(table_name, (0, 0))
+            if end_id - next_id >= count:
+                self._blocks[table_name] = (next_id + count, end_id)
+                return next_id
+        return self.manager.reserve_ids(table_name, count)
@@ -0,0 +1,193 @@
+"""
+Builds citation-based networks of papers and loads them into network_edges.
+
+Two undirected networks are built from the citation graph. With A the
+adjacency matrix of citations, A[i, j] = 1 if paper i cites paper j:
+
+    Bibliographic coupling, A·Aᵀ: papers are linked with weight equal to the
+    number of references they share.
+    Co-citation, Aᵀ·A: papers are linked with weight equal to the number of
+    papers citing both.
+
+Products are computed with scipy.sparse in blocks of rows, sized so that each
+block holds at most NETWORK_CHUNK_SIZE pair products, so memory is bounded no
+matter how many papers there are. Each pair is output once, with source less
+than target.
+"""
+import os
+import uuid
+import shutil
+import logging
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+from bibliom.citation_graph import CitationGraph
+from bibliom.bulk_loader import BulkLoader
+from bibliom.constants import NETWORK_CHUNK_SIZE, Duplicates
+
+COCITATION = 'cocitation'
+COUPLING = 'coupling'
+
+# Default network labels of measures.
+MEASURES = {
+    COCITATION: 'Co-citation',
+    COUPLING:   'Bibliographic coupling'
+}
+
+# Columns of network_edges written by build_network, in spool file order.
+EDGE_COLUMNS = ['idnetwork_edges', 'network_key', 'source', 'target', 'weight']
+
+# Prefix of the network key that build_network loads edges under until the
+# network is complete.
+BUILD_KEY_PREFIX = '~build-'
+
+def _adjacency_matrix(indptr, indices, ones):
+    """
+    Returns square CSR matrix with the given structure. ones is an array of
+    ones at least as long as indices, shared by the matrices of a graph.
+    """
+    return sparse.csr_matrix(
+        (ones[:len(indices)], indices, indptr),
+        shape=(len(indptr) - 1, len(indptr) - 1))
+
+def _row_blocks(left, right, chunk_size):
+    """
+    Returns list of (start, end) row ranges of left, such that the product of
+    each range of left with right takes at most chunk_size multiplications,
+    except where a single row takes more.
+    """
+    right_degree = np.diff(right.indptr).astype(np.int64)
+    work = np.cumsum(left.dot(right_degree))
+    blocks = []
+    start = 0
+    done = 0
+    while start < len(work):
+        end = int(np.searchsorted(work, done + chunk_size, side='right'))
+        end = max(end, start + 1)
+        blocks.append((start, end))
+        done = work[end - 1]
+        start = end
+    return blocks
+
+def iter_edges(graph, measure, min_weight=1, chunk_size=None):
+    """
+    Computes the co-citation or bibliographic coupling network of graph.
+
+    Args:
+        graph (CitationGraph): Citation graph of papers.
+        measure (str): COCITATION or COUPLING.
+        min_weight (int): Pairs with a lower weight are left out.
+        chunk_size (int): Max pair products computed at a time. Defaults to
+                          NETWORK_CHUNK_SIZE.
+
+    Yields:
+        (sources, targets, weights): Arrays of idpaper, idpaper and weight of
+                                     a chunk of edges.
+    """
+    if measure not in MEASURES:
+        raise ValueError("measure must be one of %s." % (tuple(MEASURES),))
+    if chunk_size is None:
+        chunk_size = NETWORK_CHUNK_SIZE
+    min_weight = max(min_weight, 1)
+    ones = np.ones(graph.num_citations, dtype=np.int32)
+    out_adjacency = _adjacency_matrix(graph.out_indptr, graph.out_indices, ones)
+    in_adjacency = _adjacency_matrix(graph.in_indptr, graph.in_indices, ones)
+    # Coupling is A·Aᵀ, and Aᵀ in CSR form is the reverse adjacency, so both
+    # products are of CSR matrices, without converting either.
+    if measure == COUPLING:
+        (left, right) = (out_adjacency, in_adjacency)
+    else:
+        (left, right) = (in_adjacency, out_adjacency)
+
+    for (start, end) in _row_blocks(left, right, chunk_size):
+        product = (left[start:end] @ right).tocoo()
+        rows = product.row.astype(np.int64) + start
+        keep = (product.col > rows) & (product.data >= min_weight)
+        if not keep.any():
+            continue
+        yield (graph.paper_ids[rows[keep]],
+               graph.paper_ids[product.col[keep]],
+               product.data[keep])
+
+def build_network(manager, network_key, measure, min_weight=1, graph=None, label=None,
+                  description=None, chunk_size=None, spool_dir=None, disable_checks=False):
+    """
+    Computes a co-citation or bibliographic coupling network and loads it into
+    network_edges, replacing any edges already in network network_key.
+
+    Edges are spooled and loaded with LOAD DATA LOCAL INFILE one chunk at a
+    time (see DBManager.load_data_infile), with ids from DBManager.reserve_ids.
+    They are loaded under a temporary network, BUILD_KEY_PREFIX followed by a
+    random suffix, which replaces network network_key in one transaction once
+    every edge is loaded. If the build fails, the temporary network is deleted
+    and network network_key is left as it was.
+
+    Args:
+        manager (DBManager): Manager of database to load network into.
+        network_key (str): Key of network in network table.
+        measure (str): COCITATION or COUPLING.
+        min_weight (int): Pairs with a lower weight are left out.
+        graph (CitationGraph): Citation graph. Defaults to loading the graph
+                               of manager's database.
+        label (str): Label of network. Defaults to name of measure.
+        description (str): Description of network.
+        chunk_size (int): Max pair products computed at a time. Defaults to
+                          NETWORK_CHUNK_SIZE.
+        spool_dir (str): Directory for spool files. Defaults to a temporary
+                         directory.
+        disable_checks (bool): Turn off unique and foreign key checks while
+                               loading.
+
+    Returns:
+        Number of edges loaded.
+    """
+    if measure not in MEASURES:
+        raise ValueError("measure must be one of %s." % (tuple(MEASURES),))
+    if graph is None:
+        graph = CitationGraph.from_db(manager)
+    build_key = BUILD_KEY_PREFIX + uuid.uuid4().hex
+    manager.upsert_rows('network', [{
+        'network_key':  build_key,
+        'label':        label if label is not None else MEASURES[measure],
+        'description':  description,
+        'ref_column':   'idpaper',
+        'directed':     False
+    }], duplicates=Duplicates.OVERWRITE)
+
+    remove_spool_dir = spool_dir is None
+    if spool_dir is None:
+        spool_dir = tempfile.mkdtemp(prefix='bibliom-')
+    spool_path = os.path.join(spool_dir, 'network_edges.tsv')
+    escaped_key = build_key.translate(BulkLoader.ESCAPES)
+    loaded = 0
+    try:
+        for (sources, targets, weights) in iter_edges(graph, measure, min_weight, chunk_size):
+            first_id = manager.reserve_ids('network_edges', len(sources))
+            with open(spool_path, 'w', encoding='utf-8', newline='\n') as spool_file:
+                spool_file.writelines(
+                    '%d\t%s\t%d\t%d\t%d\n' % (edge_id, escaped_key, source, target, weight)
+                    for (edge_id, source, target, weight)
+                    in zip(range(first_id, first_id + len(sources)),
+                           sources.tolist(), targets.tolist(), weights.tolist()))
+            loaded += manager.load_data_infile(
+                'network_edges', spool_path, EDGE_COLUMNS, disable_checks)
+            logging.getLogger(__name__).verbose_info(
+                "Loaded %s edges of network %s.", loaded, network_key)
+        # Edges follow their network's key, and are deleted with it.
+        with manager.transaction():
+            manager.delete_rows('network', {'network_key': network_key})
+            manager.update_rows('network', {'network_key': network_key},
+                                {'network_key': build_key})
+    except Exception:
+        logging.getLogger(__name__).exception(
+            "Failed to build network %s. Existing network was kept.", network_key)
+        manager.delete_rows('network', {'network_key': build_key})
+        raise
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        if remove_spool_dir:
+            shutil.rmtree(spool_dir)
+    return loaded
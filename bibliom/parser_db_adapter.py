@@ -11,12 +11,18 @@ import logging
 import datetime
 
 from bibliom import parsers
+from bibliom import exceptions
 from bibliom.dbtable import DBTable
 from bibliom.dbentity import DBEntity
+from bibliom.bulk_loader import BulkLoader
 from bibliom import publication_objects
+from bibliom.constants import IMPORT_CHUNK_SIZE
 
 REPORT_FREQUENCY = 500
 
+# Tables written by wok_records_to_db_bulk, which must be empty.
+BULK_TABLES = ('journal', 'paper', 'paper_keyword', 'author', 'paper_author', 'citation')
+
 def _parse_wok_date(year_published=None, publication_date=None):
     """
     Parse publication date, which WOK stores in separate fields.
@@ -44,130 +50,362 @@ def _parse_wok_date(year_published=None, publication_date=None):
             pub_date = None
     return pub_date
 
-def _wok_to_db(parser, manager, duplicates=None):
+def _parse_retraction(title):
     """
-    Adds records from Web of Science / Web of Knowledge parser
-    to database.
+    Parse retracted papers from their titles.
+
+    Sample data:
+
+        RETRACTED: Two-dimensional nanosheets associated with one-dimensional single-
+        crystalline nanorods self-assembled into three-dimensional flower-like Mn3O4
+        hierarchical architectures (Retracted article. See vol. 19, pg. 25222, 2017)
+
+        RETRACTED: Electrophysiological Evidence for Failures of Item Individuation in Crowded
+        Visual Displays (Retracted article)
+
+    Retracted articles always have "RETRACTED: " added to beginning of title. If there is
+    a reference to the retraction, it is at the end and the year is always the last field
+    before the closed parentheses.
+
+    Returns:
+        (title, retracted_year, was_retracted) where title has the RETRACTED: prefix and
+        the parenthesized reference removed.
     """
-    logging.getLogger(__name__).info("Importing Web of Knowledge records into database.")
-    paper_table = DBTable.get_table_object('paper', manager)
-    author_table = DBTable.get_table_object('author', manager)
-    journal_table = DBTable.get_table_object('journal', manager)
-    paper_author_table = DBTable.get_table_object('paper_author', manager)
-    keyword_table = DBTable.get_table_object('paper_keyword', manager)
-    new_paper_list = []
-    logging.getLogger(__name__).info("Importing %s records into database.", len(parser.parsed_list))
-    for count, record in enumerate(parser.parsed_list):
-        new_journal = publication_objects.Journal(journal_table)
-        new_journal.title = record.get('Publication Name')
-        new_journal.issn = record.get('ISSN')
-        new_journal.save_to_db(duplicates)
-
-        new_paper = publication_objects.Paper(paper_table)
-        new_paper.doi = record.get('DOI')
-        new_paper.title = record.get('Document Title')
-        new_paper.abstract = record.get('Abstract')
-        new_paper.first_page = record.get('Beginning Page')
-        new_paper.last_page = record.get('Ending Page')
-        new_paper.cited_records = ';'.join(
-            (record.get('Cited References') or []))
-        new_paper.wos_identifier = record.get('Unique Article Identifier')
-        new_paper.total_citations = record.get('Times Cited')
-        new_paper.citation_record = record.get('content')
-        new_paper.publication_date = _parse_wok_date(
+    if title is None:
+        return (None, None, False)
+    retracted_pattern = r'RETRACTED: (.*)\(Retracted article.*?(\d\d\d\d)?\)'
+    m = re.search(retracted_pattern, title, flags=re.IGNORECASE)
+    if m is None:
+        return (title, None, False)
+    return (m.group(1).strip(), m.group(2), True)
+
+def _chunks(records, chunk_size):
+    """
+    Yields successive lists of up to chunk_size records from an iterable.
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _cited_dois(cited_records):
+    """
+    Returns list of DOIs found in a list of cited reference strings.
+    """
+    dois = []
+    for cited_record in cited_records:
+        # For DOI matching, see
+        # https://www.crossref.org/blog/dois-and-matching-regular-expressions/
+        ref_doi_match = re.search(
+            pattern=r'((?:10.\d{4,9}/[-._;()/:A-Z0-9]+)|(?:.1002/[^\s]+))',
+            string=cited_record,
+            flags=re.IGNORECASE)
+        if ref_doi_match is not None:
+            dois.append(ref_doi_match.group(1))
+    return dois
+
+def _journal_key(record):
+    """
+    Returns key identifying the journal of a Web of Science record, or None.
+    """
+    issn = record.get('ISSN')
+    if issn:
+        return ('issn', issn.lower())
+    title = record.get('Publication Name')
+    if title:
+        return ('title', title.lower())
+    return None
+
+def _wok_paper_row(record):
+    """
+    Returns (paper_row, was_retracted) for a Web of Science record. The
+    idjournal of paper_row isn't set.
+    """
+    (title, retracted_year, was_retracted) = _parse_retraction(
+        record.get('Document Title'))
+    paper_row = {
+        'doi':              record.get('DOI'),
+        'title':            title,
+        'abstract':         record.get('Abstract'),
+        'first_page':       record.get('Beginning Page'),
+        'last_page':        record.get('Ending Page'),
+        'cited_records':    ';'.join(record.get('Cited References') or []),
+        'wos_identifier':   record.get('Unique Article Identifier'),
+        'total_citations':  record.get('Times Cited'),
+        'citation_record':  record.get('content'),
+        'retracted_year':   retracted_year,
+        'publication_date': _parse_wok_date(
             record.get('Year Published'),
-            record.get('Publication Date')
-        )
-
-        new_paper.idjournal = new_journal.idjournal
-
-        #
-        # Parse retracted papers from their titles
-        #
-        # Sample data:
-        #
-        #     RETRACTED: Two-dimensional nanosheets associated with one-dimensional single-
-        #     crystalline nanorods self-assembled into three-dimensional flower-like Mn3O4
-        #     hierarchical architectures (Retracted article. See vol. 19, pg. 25222, 2017)
-        #
-        #     RETRACTED: Electrophysiological Evidence for Failures of Item Individuation in Crowded
-        #     Visual Displays (Retracted article)
-        #
-        # Retracted articles always have "RETRACTED: " added to beginning of title. If there is
-        # a reference to the retraction, it is at the end and the year is always the last field
-        # before the closed parentheses.
-        #
-        # We will remove the RETRACTED: prefix and the parenthecized reference at the end. If a year
-        # is recorded, set new_paper.retracted_year to that year. Add "retracted" to keywords.
-        #
-
-        retracted_pattern = r'RETRACTED: (.*)\(Retracted article.*?(\d\d\d\d)?\)'
-        m = re.search(retracted_pattern, new_paper.title, flags=re.IGNORECASE)
-        if m is not None:
-            new_paper.title = m.group(1).strip()
-            if m.group(2) is not None:
-                new_paper.retracted_year = m.group(2)
-            new_paper.was_retracted = True
-
-        new_paper.save_to_db(duplicates)
+            record.get('Publication Date'))
+    }
+    return (paper_row, was_retracted)
 
-        for keyword in (record.get('Keywords') or []):
-            new_keyword = DBEntity(keyword_table)
-            new_keyword.keyword = keyword
-            new_keyword.idpaper = new_paper.idpaper
+def _wok_chunk_to_db(chunk, manager, duplicates, journal_ids, author_ids):
+    """
+    Imports a chunk of Web of Science / Web of Knowledge records with a
+    fixed number of batched statements per table.
 
-        if new_paper.was_retracted:
-            new_keyword = DBEntity(keyword_table)
-            new_keyword.keyword = 'retracted'
-            new_keyword.idpaper = new_paper.idpaper
+    Journals and authors are deduplicated in memory. journal_ids and
+    author_ids map journal and author strings to database ids and are
+    shared between chunks.
 
+    Returns:
+        List of (idpaper, [cited DOI]) for papers of chunk citing DOIs.
+    """
+    # Journals
+    journal_keys = []
+    new_journals = {}
+    for record in chunk:
+        journal_key = _journal_key(record)
+        journal_keys.append(journal_key)
+        if journal_key is not None and journal_key not in journal_ids:
+            new_journals[journal_key] = {
+                'title':    record.get('Publication Name'),
+                'issn':     record.get('ISSN')
+            }
+    if new_journals:
+        key_dicts = manager.upsert_rows('journal', list(new_journals.values()), duplicates)
+        for journal_key, key_dict in zip(new_journals.keys(), key_dicts):
+            journal_ids[journal_key] = key_dict['idjournal']
+
+    # Papers
+    paper_rows = []
+    retracted = []
+    for record, journal_key in zip(chunk, journal_keys):
+        (paper_row, was_retracted) = _wok_paper_row(record)
+        paper_row['idjournal'] = journal_ids.get(journal_key)
+        paper_rows.append(paper_row)
+        retracted.append(was_retracted)
+    paper_ids = [key_dict['idpaper']
+                 for key_dict in manager.upsert_rows('paper', paper_rows, duplicates)]
+
+    # Keywords
+    keyword_rows = []
+    for record, idpaper, was_retracted in zip(chunk, paper_ids, retracted):
+        for keyword in (record.get('Keywords') or []):
+            keyword_rows.append({'keyword': keyword, 'idpaper': idpaper})
+        if was_retracted:
+            keyword_rows.append({'keyword': 'retracted', 'idpaper': idpaper})
+    if keyword_rows:
+        manager.insert_many_rows('paper_keyword', keyword_rows)
+
+    # Authors
+    new_authors = {}
+    for record in chunk:
+        for author_name in (record.get('Authors') or []):
+            if author_name not in author_ids and author_name not in new_authors:
+                new_authors[author_name] = publication_objects.Author.fields_from_string(
+                    author_name)
+    if new_authors:
+        key_dicts = manager.upsert_rows('author', list(new_authors.values()), duplicates)
+        for author_name, key_dict in zip(new_authors.keys(), key_dicts):
+            author_ids[author_name] = key_dict['idauthor']
+    paper_author_rows = {}
+    for record, idpaper in zip(chunk, paper_ids):
         for author_name in (record.get('Authors') or []):
-            new_author = publication_objects.Author.from_string(
-                author_table, author_name)
-            new_author.save_to_db(duplicates)
-            new_paper_author = DBEntity(paper_author_table)
-            new_paper_author.idauthor = new_author.idauthor
-            new_paper_author.idpaper = new_paper.idpaper
-
-        new_paper_list.append(new_paper)
-        if (count + 1) % REPORT_FREQUENCY == 0:
-            logging.getLogger(__name__).verbose_info(
-                "Imported %s / %s records.",
-                count + 1,
-                len(parser.parsed_list))
-
-        parsed_count = count + 1
+            idauthor = author_ids[author_name]
+            paper_author_rows[(idauthor, idpaper)] = {'idauthor': idauthor, 'idpaper': idpaper}
+    if paper_author_rows:
+        manager.upsert_rows('paper_author', list(paper_author_rows.values()))
 
-    logging.getLogger(__name__).info("Imported %s papers.", parsed_count)
-    logging.getLogger(__name__).info("Importing %s keywords.", len(keyword_table.rows))
-    keyword_table.sync_to_db()
-    logging.getLogger(__name__).info("Importing %s paper authors.", len(paper_author_table.rows))
-    paper_author_table.sync_to_db()
-
-    logging.getLogger(__name__).info("Parsing citations.")
-    for count, new_paper in enumerate(new_paper_list):
-        cited_records = new_paper.cited_records.split(';')
-        for record in cited_records:
-            target_paper = publication_objects.Paper(paper_table)
-            # For DOI matching, see
-            # https://www.crossref.org/blog/dois-and-matching-regular-expressions/
-            ref_doi_match = re.search(
-                pattern=r'((?:10.\d{4,9}/[-._;()/:A-Z0-9]+)|(?:.1002/[^\s]+))',
-                string=record,
-                flags=re.IGNORECASE)
-            if ref_doi_match is not None:
-                target_paper.doi = ref_doi_match.group(1)
-                target_paper.save_to_db()
-                new_paper.cite(target_paper)
-        if (count + 1) % REPORT_FREQUENCY == 0:
-            logging.getLogger(__name__).verbose_info(
-                "Parsed citations for %s / %s papers.",
-                count + 1,
-                len(new_paper_list))
-    logging.getLogger(__name__).info(
-        "Importing %s citations into db.",
-        len(DBTable.get_table_object('citation', manager).rows))
-    DBTable.get_table_object('citation', manager).sync_to_db()
+    # Citations are written by _wok_citations_to_db after all chunks.
+    citing = []
+    for record, idpaper in zip(chunk, paper_ids):
+        cited_dois = _cited_dois(record.get('Cited References') or [])
+        if cited_dois:
+            citing.append((idpaper, cited_dois))
+    return citing
+
+def _wok_citations_to_db(citing, manager):
+    """
+    Imports citations of a chunk of papers, adding cited papers that aren't in
+    the database with only their DOI.
+
+    Args:
+        citing [(idpaper, [doi])]: Citing papers and DOIs they cite.
+        manager (DBManager): Manager for the destination database.
+    """
+    target_dois = {}
+    for (idpaper, cited_dois) in citing:
+        for doi in cited_dois:
+            target_dois.setdefault(doi.lower(), doi)
+    if not target_dois:
+        return
+    key_dicts = manager.upsert_rows(
+        'paper',
+        [{'doi': doi} for doi in target_dois.values()])
+    target_ids = {doi_key: key_dict['idpaper']
+                  for doi_key, key_dict in zip(target_dois.keys(), key_dicts)}
+    citation_rows = {}
+    for (idpaper, cited_dois) in citing:
+        for doi in cited_dois:
+            target_id = target_ids[doi.lower()]
+            citation_rows[(idpaper, target_id)] = {
+                'source_id': idpaper,
+                'target_id': target_id
+            }
+    manager.upsert_rows('citation', list(citation_rows.values()))
+
+def wok_records_to_db(records, manager, duplicates=None, chunk_size=None):
+    """
+    Adds Web of Science / Web of Knowledge records to database.
+
+    Records are imported in chunks of chunk_size. For each chunk, journals,
+    papers, keywords, authors and paper authors are each written with batched
+    statements in a single transaction, so the number of statements and
+    commits is proportional to the number of chunks rather than records.
+    Citations, and cited papers not among the records, are written in chunks
+    once all records have been imported.
+
+    Args:
+        records: Iterable of parsed record dicts.
+        manager (DBManager): Manager for the destination database.
+        duplicates (int): A DBTable.Duplicates value. Defaults to SKIP.
+        chunk_size (int): Number of records per chunk.
+
+    Returns:
+        Number of records imported.
+    """
+    if chunk_size is None:
+        chunk_size = IMPORT_CHUNK_SIZE
+    logging.getLogger(__name__).info("Importing Web of Knowledge records into database.")
+    journal_ids = {}
+    author_ids = {}
+    citing = []
+    record_count = 0
+    for chunk in _chunks(records, chunk_size):
+        with manager.transaction():
+            citing.extend(
+                _wok_chunk_to_db(chunk, manager, duplicates, journal_ids, author_ids))
+        record_count += len(chunk)
+        logging.getLogger(__name__).verbose_info("Imported %s records.", record_count)
+    # Cited papers are added only after all records, so that a record isn't
+    # skipped as a duplicate of a paper added earlier with just its DOI.
+    for start in range(0, len(citing), chunk_size):
+        with manager.transaction():
+            _wok_citations_to_db(citing[start:start + chunk_size], manager)
+    logging.getLogger(__name__).info("Imported %s papers.", record_count)
+    return record_count
+
+def wok_records_to_db_bulk(records, manager, disable_checks=False, spool_dir=None):
+    """
+    Bulk loads Web of Science / Web of Knowledge records into empty tables.
+
+    Rows are streamed into one tab-separated spool file per table as records
+    are read, with ids assigned in memory so that foreign keys can be filled
+    in, and each table is then loaded with a single LOAD DATA LOCAL INFILE
+    statement (see bulk_loader.BulkLoader). Journals, authors and papers are
+    deduplicated as in wok_records_to_db; records duplicating the DOI or Web
+    of Science identifier of an earlier record are skipped. Cited papers that
+    aren't among the records are added with only their DOI.
+
+    Because ids are assigned without looking for matching rows in the
+    database, the tables in BULK_TABLES must be empty.
+
+    Args:
+        records: Iterable of parsed record dicts.
+        manager (DBManager): Manager for the destination database.
+        disable_checks (bool): Turn off unique and foreign key checks while
+                               loading.
+        spool_dir (str): Directory for spool files. Defaults to a temporary
+                         directory.
+
+    Returns:
+        Number of records imported.
+    """
+    for table_name in BULK_TABLES:
+        if manager.table_row_count(table_name):
+            raise exceptions.BiblioException(
+                "Bulk loading requires empty tables, but %s has rows." % table_name)
+    logging.getLogger(__name__).info("Bulk loading Web of Knowledge records into database.")
+    journal_ids = {}
+    author_ids = {}
+    paper_ids = {}
+    cited_dois = {}
+    wos_identifiers = set()
+    record_count = 0
+    with BulkLoader(manager, spool_dir, disable_checks) as loader:
+        for record in records:
+            (paper_row, was_retracted) = _wok_paper_row(record)
+            doi_key = paper_row['doi'].lower() if paper_row['doi'] else None
+            wos_identifier = paper_row['wos_identifier']
+            if ((doi_key is not None and doi_key in paper_ids and doi_key not in cited_dois)
+                    or wos_identifier in wos_identifiers):
+                continue
+            if wos_identifier is not None:
+                wos_identifiers.add(wos_identifier)
+            if doi_key is None:
+                idpaper = loader.next_id('paper')
+            elif doi_key in cited_dois:
+                idpaper = paper_ids[doi_key]
+                del cited_dois[doi_key]
+            else:
+                idpaper = paper_ids[doi_key] = loader.next_id('paper')
+
+            journal_key = _journal_key(record)
+            if journal_key is not None and journal_key not in journal_ids:
+                journal_ids[journal_key] = loader.next_id('journal')
+                loader.add_row('journal', {
+                    'idjournal':    journal_ids[journal_key],
+                    'title':        record.get('Publication Name'),
+                    'issn':         record.get('ISSN')
+                })
+            paper_row['idpaper'] = idpaper
+            paper_row['idjournal'] = journal_ids.get(journal_key)
+            loader.add_row('paper', paper_row)
+
+            for keyword in (record.get('Keywords') or []):
+                loader.add_row('paper_keyword', {'keyword': keyword, 'idpaper': idpaper})
+            if was_retracted:
+                loader.add_row('paper_keyword', {'keyword': 'retracted', 'idpaper': idpaper})
+
+            idauthors = set()
+            for author_name in (record.get('Authors') or []):
+                idauthor = author_ids.get(author_name)
+                if idauthor is None:
+                    idauthor = author_ids[author_name] = loader.next_id('author')
+                    author_row = publication_objects.Author.fields_from_string(author_name)
+                    author_row['idauthor'] = idauthor
+                    loader.add_row('author', author_row)
+                if idauthor not in idauthors:
+                    idauthors.add(idauthor)
+                    loader.add_row('paper_author', {'idauthor': idauthor, 'idpaper': idpaper})
+
+            target_ids = set()
+            for doi in _cited_dois(record.get('Cited References') or []):
+                target_key = doi.lower()
+                target_id = paper_ids.get(target_key)
+                if target_id is None:
+                    target_id = paper_ids[target_key] = loader.next_id('paper')
+                    cited_dois[target_key] = doi
+                if target_id not in target_ids:
+                    target_ids.add(target_id)
+                    loader.add_row('citation', {'source_id': idpaper, 'target_id': target_id})
+
+            record_count += 1
+            if record_count % IMPORT_CHUNK_SIZE == 0:
+                logging.getLogger(__name__).verbose_info("Spooled %s records.", record_count)
+
+        for doi_key, doi in cited_dois.items():
+            loader.add_row('paper', {'idpaper': paper_ids[doi_key], 'doi': doi})
+        loader.load()
+    logging.getLogger(__name__).info("Imported %s papers.", record_count)
+    return record_count
+
+def _wok_to_db(parser, manager, duplicates=None, chunk_size=None, records=None):
+    """
+    Adds records from Web of Science / Web of Knowledge parser
+    to database.
+    """
+    if records is None:
+        logging.getLogger(__name__).info(
+            "Importing %s records into database.", len(parser.parsed_list))
+        records = parser.parsed_list
+    return wok_records_to_db(records, manager, duplicates, chunk_size)
 
 def _wch_to_db(parser, manager, duplicates=None, parse_authors=False):
     """
@@ -187,72 +425,96 @@ def _wch_to_db(parser, manager, duplicates=None, parse_authors=False):
         "Importing %s records into database.", 
         len(parser.parsed_list)
     )
-    for count, record in enumerate(parser.parsed_list):
-        new_journal = publication_objects.Journal(journal_table)
-        new_journal.title = record.get('Source Title')
-        new_journal.save_to_db(duplicates)
-
-        new_paper = publication_objects.Paper(paper_table)
-        new_paper.doi = record.get('DOI')
-        new_paper.title = record.get('Title')
-        new_paper.first_page = record.get('Beginning Page')
-        new_paper.last_page = record.get('Ending Page')
-        new_paper.total_citations = record.get('Total Citations')
-        new_paper.publication_date = _parse_wok_date(
-            record.get('Publication Year'),
-            record.get('Publication Date'))
-        new_paper.yearly_citations = record.get('Citation History')
-        new_paper.idjournal = new_journal.idjournal
-
-        # Copy & Paste from _wok_to_db
-        retracted_pattern = r'RETRACTED: (.*)\(Retracted article.*?(\d\d\d\d)?\)'
-        m = re.search(retracted_pattern, new_paper.title, flags=re.IGNORECASE)
-        if m is not None:
-            new_paper.title = m.group(1).strip()
-            if m.group(2) is not None:
-                new_paper.retracted_year = m.group(2)
-            new_paper.was_retracted = True
-        new_paper.save_to_db(duplicates)
-
-        if new_paper.was_retracted:
-            new_keyword = DBEntity(keyword_table)
-            new_keyword.keyword = 'retracted'
-            new_keyword.idpaper = new_paper.idpaper
-
-        if parse_authors and record.get('Authors'):
-            for author_name in record.get('Authors'):
-                new_author = publication_objects.Author.from_string(
-                    author_table, author_name
-                )
-                new_author.save_to_db(duplicates)
-                new_paper_author = DBEntity(paper_author_table)
-                new_paper_author.idauthor = new_author.idauthor
-                new_paper_author.idpaper = new_paper.idpaper
-
-        if count % REPORT_FREQUENCY == 0:
-            logging.getLogger(__name__).verbose_info(
-                "Imported %s / %s records.",
-                count,
-                len(parser.parsed_list))
-
-        parsed_count = count
+    for chunk in _chunks(enumerate(parser.parsed_list), IMPORT_CHUNK_SIZE):
+        with manager.transaction():
+            for count, record in chunk:
+                new_journal = publication_objects.Journal(journal_table)
+                new_journal.title = record.get('Source Title')
+                new_journal.save_to_db(duplicates)
+
+                new_paper = publication_objects.Paper(paper_table)
+                new_paper.doi = record.get('DOI')
+                new_paper.title = record.get('Title')
+                new_paper.first_page = record.get('Beginning Page')
+                new_paper.last_page = record.get('Ending Page')
+                new_paper.total_citations = record.get('Total Citations')
+                new_paper.publication_date = _parse_wok_date(
+                    record.get('Publication Year'),
+                    record.get('Publication Date'))
+                new_paper.yearly_citations = record.get('Citation History')
+                new_paper.idjournal = new_journal.idjournal
+
+                # Copy & Paste from _wok_to_db
+                retracted_pattern = r'RETRACTED: (.*)\(Retracted article.*?(\d\d\d\d)?\)'
+                m = re.search(retracted_pattern, new_paper.title, flags=re.IGNORECASE)
+                if m is not None:
+                    new_paper.title = m.group(1).strip()
+                    if m.group(2) is not None:
+                        new_paper.retracted_year = m.group(2)
+                    new_paper.was_retracted = True
+                new_paper.save_to_db(duplicates)
+
+                if new_paper.was_retracted:
+                    new_keyword = DBEntity(keyword_table)
+                    new_keyword.keyword = 'retracted'
+                    new_keyword.idpaper = new_paper.idpaper
+
+                if parse_authors and record.get('Authors'):
+                    for author_name in record.get('Authors'):
+                        new_author = publication_objects.Author.from_string(
+                            author_table, author_name
+                        )
+                        new_author.save_to_db(duplicates)
+                        new_paper_author = DBEntity(paper_author_table)
+                        new_paper_author.idauthor = new_author.idauthor
+                        new_paper_author.idpaper = new_paper.idpaper
+
+                if count % REPORT_FREQUENCY == 0:
+                    logging.getLogger(__name__).verbose_info(
+                        "Imported %s / %s records.",
+                        count,
+                        len(parser.parsed_list))
+
+                parsed_count = count
 
     logging.getLogger(__name__).info("Imported %s papers.", parsed_count)
     logging.getLogger(__name__).info("Importing %s keywords.", len(keyword_table.rows))
-    keyword_table.sync_to_db()
-    if parse_authors:
+    with manager.transaction():
         keyword_table.sync_to_db()
-        logging.getLogger(__name__).info(
-            "Importing %s paper authors.",
-            len(paper_author_table.rows)
-        )
-        paper_author_table.sync_to_db()
+        if parse_authors:
+            keyword_table.sync_to_db()
+            logging.getLogger(__name__).info(
+                "Importing %s paper authors.",
+                len(paper_author_table.rows)
+            )
+            paper_author_table.sync_to_db()
 
-def parsed_records_to_db(parser, manager, duplicates=None):
+def parsed_records_to_db(parser, manager, duplicates=None, chunk_size=None, records=None,
+                         bulk=False, disable_checks=False):
     """
     Adds records from parser to dbtables in manager.
+
+    Args:
+        parser (Parser): Parser that produced the records.
+        manager (DBManager): Manager for the destination database.
+        duplicates (int): A DBTable.Duplicates value.
+        chunk_size (int): Number of records imported at a time.
+        records: Iterable of record dicts, such as parser.iter_records(), to
+                 import instead of parser.parsed_list. Only supported for
+                 Web of Science records.
+        bulk (bool): Bulk load records into empty tables with LOAD DATA LOCAL
+                     INFILE (see wok_records_to_db_bulk). Only supported for
+                     Web of Science records.
+        disable_checks (bool): Turn off unique and foreign key checks while
+                               bulk loading.
     """
-    if isinstance(parser, parsers.WOKParser):
-        _wok_to_db(parser, manager, duplicates)
+    if bulk:
+        if not isinstance(parser, parsers.WOKParser):
+            raise ValueError("Bulk loading is only supported for Web of Science records.")
+        if records is None:
+            records = parser.parsed_list
+        wok_records_to_db_bulk(records, manager, disable_checks)
+    elif isinstance(parser, parsers.WOKParser):
+        _wok_to_db(parser, manager, duplicates, chunk_size, records)
     elif isinstance(parser, parsers.WCHParser):
         _wch_to_db(parser, manager, duplicates)
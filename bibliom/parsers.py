@@ -5,40 +5,141 @@ objects directly.
 """
 
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import codecs
+import csv
+import io
 import os
 import re
+import numpy
 from chardet.universaldetector import UniversalDetector
 
 from bibliom import exceptions
 
-def detect_encoding(file_path):
+# Number of bytes read from the start of a file to detect its encoding and format.
+SNIFF_SIZE = 100000
+
+# Max number of files whose sniff_file results are cached.
+SNIFF_CACHE_SIZE = 1024
+
+# Cache of sniff_file results, keyed by (path, mtime, size) and then encoding,
+# in the order files were first sniffed.
+_sniff_cache = {}
+
+def _detect_encoding_of_bytes(data, file_path=None):
     """
-    Returns string containing (best guess of) text's encoding.
+    Returns string containing (best guess of) encoding of bytes data.
     """
     CHUNK_SIZE = 400
-    MAX_SIZE = 100000
     CONFIDENCE_THRESHOLD = 0.95
 
     detector = UniversalDetector()
     detector.reset()
-    current_size = 0
-    with open(file_path, 'rb') as f:
-        while True: 
-            line = f.read(CHUNK_SIZE)
-            if not line:
-                break
-            detector.feed(line)
-            if detector.done:
-                break
-            current_size += CHUNK_SIZE
-            if current_size > MAX_SIZE:
-                break
+    for i in range(0, len(data), CHUNK_SIZE):
+        detector.feed(data[i:i + CHUNK_SIZE])
+        if detector.done:
+            break
     detector.close()
     if detector.result['confidence'] >= CONFIDENCE_THRESHOLD:
         return detector.result['encoding']
     else:
         raise exceptions.FileParseError("Cannot decode file %s", file_path)
 
+def detect_encoding(file_path):
+    """
+    Returns string containing (best guess of) text's encoding.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(SNIFF_SIZE)
+    return _detect_encoding_of_bytes(data, file_path)
+
+def sniff_file(file_path, encoding=None):
+    """
+    Reads the first SNIFF_SIZE bytes of a file once to detect its encoding and
+    which parsers can parse it.
+
+    Results are cached by path, modification time and size, so selecting a parser
+    and then parsing a file doesn't read it again. Results are kept for up to
+    SNIFF_CACHE_SIZE files, dropping the files sniffed first.
+
+    Args:
+        file_path (str): Path of file.
+        encoding (str):  Encoding of file, or None to detect it.
+
+    Returns:
+        Dict with 'encoding' of file and 'formats', a dict from each parser's
+        format_arg to whether it can parse the file.
+
+    Raises:
+        FileParseError if encoding is None and can't be detected.
+    """
+    file_stat = os.stat(file_path)
+    file_key = (os.path.abspath(file_path), file_stat.st_mtime, file_stat.st_size)
+    file_sniffs = _sniff_cache.get(file_key)
+    if file_sniffs is None:
+        if len(_sniff_cache) >= SNIFF_CACHE_SIZE:
+            del _sniff_cache[next(iter(_sniff_cache))]
+        file_sniffs = _sniff_cache[file_key] = {}
+    sniff = file_sniffs.get(encoding)
+    if sniff is None:
+        with open(file_path, 'rb') as f:
+            data = f.read(SNIFF_SIZE)
+        complete = len(data) < SNIFF_SIZE
+        try:
+            file_encoding = encoding or _detect_encoding_of_bytes(data, file_path)
+        except exceptions.FileParseError:
+            file_encoding = None
+        text = None
+        if file_encoding is not None:
+            try:
+                text = codecs.getincrementaldecoder(file_encoding)().decode(data, final=complete)
+            except (UnicodeDecodeError, LookupError):
+                pass
+        sniff = {
+            'encoding': file_encoding,
+            'formats':  {
+                parser_class.format_arg(): (
+                    text is not None and parser_class.is_parsable_prefix(text, complete))
+                for parser_class in Parser.parser_classes()
+            }
+        }
+        file_sniffs[encoding] = sniff
+        if file_encoding is not None:
+            # Parsers are given the detected encoding, so reuse this result for it.
+            file_sniffs.setdefault(file_encoding, sniff)
+    if sniff['encoding'] is None:
+        raise exceptions.FileParseError("Cannot decode file %s", file_path)
+    return sniff
+
+def clear_sniff_cache():
+    """
+    Empties the cache of sniff_file results.
+    """
+    _sniff_cache.clear()
+
+def _parse_file(parser_class, encoding, file_path):
+    """
+    Parses a file in a worker process for Parser.parse_files.
+
+    Returns:
+        List of record dicts, or None if file is not parsable.
+    """
+    parser = parser_class(encoding=encoding)
+    try:
+        parser.parse_file(file_path)
+    except exceptions.FileParseError:
+        return None
+    return parser.parsed_list
+
+def _parse_file_range(parser_class, encoding, file_path, start, end):
+    """
+    Parses a byte range of a file in a worker process for WOKParser.parse_file.
+    """
+    parser = parser_class(encoding=encoding)
+    return parser.parse_file_range(file_path, start, end)
+
 class Parser(ABC):
     """
     A parser parses publication items (articles, books, etc.) into dictionaries.
@@ -57,6 +158,7 @@ class Parser(ABC):
         self.content = None
         self.file_path = None
         self.directory_path = None
+        self._next_missing_id = 0
 
     def __getattribute__(self, name):
         if name == 'parsed_list':
@@ -112,9 +214,10 @@ class Parser(ABC):
         """
         Returns a class capable of parsing file, or False if none found.
         """
+        sniff = sniff_file(file_path, encoding)
         for parser_class in Parser.parser_classes():
-            if parser_class.is_parsable_file(file_path):
-                parser = parser_class(id_field, encoding)
+            if sniff['formats'].get(parser_class.format_arg()):
+                parser = parser_class(id_field, sniff['encoding'])
                 parser.file_path = file_path
                 return parser
         return None
@@ -153,6 +256,18 @@ class Parser(ABC):
         """
         Returns true if file is parsable by this class, false otherwise.
         """
+        return sniff_file(file_path, encoding)['formats'].get(cls.format_arg(), False)
+
+    @classmethod
+    def is_parsable_prefix(cls, text, complete=True):
+        """
+        Returns true if a file starting with text is parsable by this class,
+        false otherwise.
+
+        Args:
+            text (str):      Decoded text from the start of a file.
+            complete (bool): True if text is the whole file.
+        """
         # By default this isn't implemented, but descendents aren't *required* to
         # implement it, so just return False by default.
         return False
@@ -183,25 +298,119 @@ class Parser(ABC):
             return None
 
     @abstractmethod
-    def parse_file(self, file_path=None):
+    def parse_file(self, file_path=None, workers=None):
         """
         Parses a text file containing publication items.
         """
         if file_path is not None:
             self.file_path = file_path
 
-    def parse_files(self, file_paths):
+    def _add_record(self, record_dict):
         """
-        Parses a list of files.
+        Adds a parsed record dict to self.parsed_list, or to self.parsed_dict if
+        an ID field is designated.
         """
+        if self.id_field is not None:
+            try:
+                self.parsed_dict[record_dict[self.id_field]] = record_dict
+            except KeyError:
+                self.parsed_dict[self.MISSING_ID_PREFIX + str(self._next_missing_id)] = record_dict
+                self._next_missing_id += 1
+        else:
+            self.parsed_list.append(record_dict)
+
+    def iter_file(self, file_path=None):
+        """
+        Yields record dicts parsed from a file one at a time, without adding
+        them to self.parsed_list.
+
+        Parsers that can't stream a file fall back to parsing the whole file.
+        """
+        if file_path is None:
+            file_path = self.file_path
+        file_parser = type(self)(encoding=self.encoding)
+        file_parser.parse_file(file_path)
+        yield from file_parser.parsed_list
+
+    def iter_records(self, file_paths=None):
+        """
+        Yields record dicts parsed from a list of files one at a time. Files
+        that can't be parsed are skipped, as in parse_files. Records are
+        streamed, so if a file can't be decoded past its start, the records
+        before that point have already been yielded and the rest of the file is
+        skipped.
+
+        Args:
+            file_paths (list): Paths of files to parse. Defaults to self.file_path,
+                               or the files in self.directory_path.
+        """
+        if file_paths is None:
+            if self.file_path is not None:
+                file_paths = [self.file_path]
+            elif self.directory_path is not None:
+                file_paths = Parser.list_files(self.directory_path)
+            else:
+                file_paths = []
         for file_path in file_paths:
             if os.path.isfile(file_path):
                 try:
-                    self.parse_file(file_path)
+                    yield from self.iter_file(file_path)
                 except exceptions.FileParseError:
                     pass
 
-    def parse_directory(self, directory_path=None):
+    @staticmethod
+    def list_files(directory_path, recursive=False):
+        """
+        Returns list of paths of (non-hidden) files in directory_path, and
+        optionally all subdirectories.
+        """
+        if recursive:
+            return [os.path.join(root, name)
+                    for root, _, files in os.walk(directory_path)
+                    for name in files]
+        return [os.path.join(directory_path, name)
+                for name in os.listdir(directory_path)
+                if not name.startswith('.')]
+
+    def parse_files(self, file_paths, workers=None):
+        """
+        Parses a list of files.
+
+        Args:
+            file_paths (list): Paths of files to parse.
+            workers (int):     If greater than 1, files are parsed by this many
+                               processes. Records are added in the same order as
+                               when parsing serially.
+        """
+        if workers is None or workers <= 1:
+            for file_path in file_paths:
+                if os.path.isfile(file_path):
+                    try:
+                        self.parse_file(file_path)
+                    except exceptions.FileParseError:
+                        pass
+            return
+
+        file_paths = [file_path for file_path in file_paths if os.path.isfile(file_path)]
+        if len(file_paths) == 1:
+            try:
+                self.parse_file(file_paths[0], workers=workers)
+            except exceptions.FileParseError:
+                pass
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _parse_file,
+                repeat(type(self)),
+                repeat(self.encoding),
+                file_paths)
+            for record_list in results:
+                if record_list is None:
+                    continue
+                for record_dict in record_list:
+                    self._add_record(record_dict)
+
+    def parse_directory(self, directory_path=None, workers=None):
         """
         Parses all files in a directory.
         """
@@ -214,16 +423,16 @@ class Parser(ABC):
         for file in files:
             if not file.startswith('.'):
                 file_paths.append(self.directory_path + file)
-        self.parse_files(file_paths)
+        self.parse_files(file_paths, workers)
 
-    def parse_directories(self, directories):
+    def parse_directories(self, directories, workers=None):
         """
         Parse all files in a list of directories.
         """
         for directory in directories:
-            self.parse_directory(directory)
+            self.parse_directory(directory, workers)
 
-    def recursive_parse(self, directory_path=None):
+    def recursive_parse(self, directory_path=None, workers=None):
         """
         Parse all files in directory_path, and all subdirectories.
         """
@@ -232,7 +441,7 @@ class Parser(ABC):
         files = [os.path.join(root, name)
                  for root, _, files in os.walk(self.directory_path)
                  for name in files]
-        self.parse_files(files)
+        self.parse_files(files, workers)
 
 class WOKParser(Parser):
     """
@@ -318,11 +527,15 @@ class WOKParser(Parser):
     # _to_semicolon_list_tags - if in list_tags, also save list as
     #                          semicolon-deliniated list with original tag
     # By default, parser treats tags as multiline
-    _list_tags = ['AU', 'AF', 'CA', 'ED', 'CR']
-    _semicolon_list_tags = ['ID', 'RI', 'OI']
-    _multiline_tags = ['TI']
-    _paragraphs_tags = ['AB']
-    _to_semicolon_list_tags = ['CR']
+    _list_tags = frozenset(['AU', 'AF', 'CA', 'ED', 'CR'])
+    _semicolon_list_tags = frozenset(['ID', 'RI', 'OI'])
+    _multiline_tags = frozenset(['TI'])
+    _paragraphs_tags = frozenset(['AB'])
+    _to_semicolon_list_tags = frozenset(['CR'])
+
+    # Matches lines that start a new field: a two character tag followed by whitespace
+    # or the end of the line.
+    _tag_pattern = re.compile(r'[A-Z,0-9][A-Z,0-9](?:\s|$)')
 
     # When parsing file, if file does not start with one of _valid_headers, the file will be skipped
     _valid_headers = ['FN Clarivate Analytics Web of Science']
@@ -334,110 +547,216 @@ class WOKParser(Parser):
         if not content:
             return False
 
-        lines = content.splitlines()
+        self._add_record(self._parse_record(content))
+        return True
 
-        record_dict = {
-            'content'   : content
-        }
+    def _parse_record(self, content):
+        """
+        Parses the text of a single record into a record dict.
 
-        current_key = None
-        current_value = None
-        semicolon_list = []
-        next_missing_id = 0
+        Lines are first split into (tag, line fragments) pairs, then each field's
+        fragments are joined once according to its tag class.
+        """
+        # Class attributes are bound to locals to avoid Parser.__getattribute__.
+        cls = type(self)
+        tag_match = cls._tag_pattern.match
+        field_tags = cls._field_tags
+        list_tags = cls._list_tags
+        semicolon_list_tags = cls._semicolon_list_tags
+        paragraphs_tags = cls._paragraphs_tags
+        to_semicolon_list_tags = cls._to_semicolon_list_tags
+        join_fragments = WOKParser._join_fragments
 
-        for line in lines:
+        fields = []
+        fragments = None
+        for line in content.splitlines():
             if not line:
                 continue
-            if re.match(r'^[A-Z,0-9][A-Z,0-9](?:\s.*$|$)', line):
-                if current_key is not None:
-                    if isinstance(current_value, str):
-                        current_value = current_value.strip()
-                    if current_key in self._semicolon_list_tags:
-                        current_value = current_value.split(';')
-                        current_value = list(map(lambda x: x.strip(), current_value))
-                    try:
-                        record_dict[WOKParser._field_tags[current_key]] = current_value
-                    except KeyError: #field code not in list
-                        record_dict[current_key] = current_value
-                    if semicolon_list:
-                        if record_dict.get(current_key) is not None:
-                            current_key = current_key + '2'
-                        sl_text = ''
-                        for item in semicolon_list:
-                            if sl_text != '':
-                                sl_text += ';'
-                            sl_text += item
-                        record_dict[current_key] = sl_text
-                        semicolon_list = []
-                current_key = line[:2]
-                if current_key in self._list_tags:
-                    current_value = []
-                else: current_value = ''
-                line_text = line[3:]
+            if tag_match(line):
+                fragments = [line[3:].strip()]
+                fields.append((line[:2], fragments))
+            elif fragments is not None:
+                fragments.append(line.strip())
             else:
-                line_text = line
-
-            line_text = line_text.strip()
-
-            if current_key in self._list_tags:
-                current_value.append(line_text)
-                if current_key in self._to_semicolon_list_tags:
-                    semicolon_list.append(line_text)
-            elif current_key in self._paragraphs_tags:
-                if current_value != '':
-                    current_value += '\n'
-                current_value += line_text
+                raise exceptions.ParsingError(
+                    "WOKParser: Expected field tag at start of record, got: %s" % line)
+
+        record_dict = {
+            'content'   : content
+        }
+
+        # A field ends at the next tag, so the last field (ER) is never added.
+        for key, fragments in fields[:-1]:
+            if key in list_tags:
+                value = fragments
+            elif len(fragments) == 1:
+                value = fragments[0]
+            elif key in paragraphs_tags:
+                value = join_fragments('\n', fragments)
             else:
-                if current_value != '':
-                    current_value += ' '
-                current_value += line_text
+                value = join_fragments(' ', fragments)
+            if key in semicolon_list_tags:
+                value = [item.strip() for item in value.split(';')]
+            record_dict[field_tags.get(key, key)] = value
+            if key in to_semicolon_list_tags:
+                if record_dict.get(key) is not None:
+                    key = key + '2'
+                record_dict[key] = ';'.join(fragments)
 
-        if self.id_field is not None:
-            try:
-                self.parsed_dict[record_dict[self.id_field]] = record_dict
-            except KeyError:
-                self.parsed_dict[self.MISSING_ID_PREFIX + str(next_missing_id)] = record_dict
-                next_missing_id += 1
-        else:
-            self.parsed_list.append(record_dict)
+        return record_dict
 
-        return True
+    @staticmethod
+    def _join_fragments(separator, fragments):
+        """
+        Joins line fragments of a field with separator, ignoring leading empty
+        fragments.
+        """
+        if fragments[0]:
+            return separator.join(fragments).strip()
+        for i, fragment in enumerate(fragments):
+            if fragment:
+                return separator.join(fragments[i:]).strip()
+        return ''
 
     @classmethod
-    def is_parsable_file(cls, file_path, encoding=None):
-        if encoding is None:
-            encoding = detect_encoding(file_path)
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-            try:
-                file_text = file_data.decode(encoding)
-            except UnicodeDecodeError:
-                return False
-            for header in cls._valid_headers:
-                if file_text.startswith(header):
-                    return True
+    def is_parsable_prefix(cls, text, complete=True):
+        for header in cls._valid_headers:
+            if text.startswith(header):
+                return True
         return False
 
-    def parse_file(self, file_path=None):
-        Parser.parse_file(self, file_path)
-        file_path = self.file_path
-        if not self.is_parsable_file(file_path):
+    def iter_file(self, file_path=None):
+        """
+        Yields record dicts parsed from a Web of Science file one at a time.
+
+        The file is read line by line and each record is parsed as soon as its
+        ER line is read, so memory use doesn't depend on the size of the file.
+        Only the start of the file is checked before reading, so FileParseError
+        is raised where the file can't be decoded, after the records before it
+        have been yielded.
+        """
+        if file_path is None:
+            file_path = self.file_path
+        if not self.is_parsable_file(file_path, self.encoding):
             raise exceptions.FileParseError(
                 'File %s is not parsable by %s' % (file_path, type(self).__name__))
         if self.encoding is None:
-                self.encoding = detect_encoding(file_path)
+            self.encoding = sniff_file(file_path)['encoding']
+        try:
+            with open(file_path, 'r', encoding=self.encoding) as f:
+                yield from self._records_from_lines(f)
+        except UnicodeDecodeError as e:
+            raise exceptions.FileParseError(
+                'Cannot decode file %s: %s' % (file_path, e)) from e
+
+    def _records_from_lines(self, lines):
+        """
+        Yields record dicts parsed from an iterable of lines, splitting records
+        on ER lines.
+        """
+        record_lines = []
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line.strip() == 'ER':
+                record_lines.append('ER')
+                yield self._parse_record('\n'.join(record_lines))
+                record_lines = []
+            elif record_lines or line.strip():
+                record_lines.append(line)
+        if record_lines and not record_lines[0].startswith('EF'):
+            record_lines.append('ER')
+            yield self._parse_record('\n'.join(record_lines))
+
+    def _file_ranges(self, file_path, count):
+        """
+        Splits a file into up to count byte ranges that each end after an ER
+        line, so that every range contains whole records.
+
+        Returns:
+            List of (start, end) byte offsets, or None if records can't be split
+            on byte boundaries in the file's encoding.
+        """
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        encoder.encode('\n') # Skip any byte order mark.
+        if encoder.encode('ER\n') != b'ER\n':
+            return None
+        file_size = os.path.getsize(file_path)
+        ranges = []
+        start = 0
         with open(file_path, 'rb') as f:
-            file_data = f.read()
-            file_text = file_data.decode(self.encoding)
-            records = re.split(r'\n\s*ER\s*\n', file_text)
+            for i in range(1, count):
+                if start >= file_size:
+                    break
+                f.seek(max(start, file_size * i // count))
+                f.readline() # Skip to start of next full line.
+                while True:
+                    line = f.readline()
+                    if not line or line.strip() == b'ER':
+                        break
+                end = f.tell()
+                ranges.append((start, end))
+                start = end
+        if start < file_size:
+            ranges.append((start, file_size))
+        return ranges
 
-        records = list(map(lambda x: x + '\nER', records))
+    def parse_file_range(self, file_path, start, end):
+        """
+        Parses the records in bytes start to end of a Web of Science file, as
+        returned by _file_ranges.
 
-        for record in records:
-            if record.startswith('EF'):
-                continue
-            self.parse_content_item(record)
+        Returns:
+            List of record dicts.
+        """
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        try:
+            text = data.decode(self.encoding)
+        except UnicodeDecodeError as e:
+            raise exceptions.FileParseError(
+                'Cannot decode file %s: %s' % (file_path, e)) from e
+        return list(self._records_from_lines(io.StringIO(text, newline=None)))
+
+    def parse_file(self, file_path=None, workers=None):
+        """
+        Parses a Web of Science file.
 
+        Args:
+            file_path (str): Path of file.
+            workers (int):   If greater than 1, the file is split into byte
+                             ranges on record boundaries that are parsed by
+                             this many processes.
+        """
+        Parser.parse_file(self, file_path)
+        file_path = self.file_path
+        if workers is None or workers <= 1:
+            # Records are added once the whole file is read, so none are added
+            # from a file that turns out not to be parsable.
+            for record_dict in list(self.iter_file(file_path)):
+                self._add_record(record_dict)
+            return True
+
+        if not self.is_parsable_file(file_path, self.encoding):
+            raise exceptions.FileParseError(
+                'File %s is not parsable by %s' % (file_path, type(self).__name__))
+        if self.encoding is None:
+            self.encoding = sniff_file(file_path)['encoding']
+        ranges = self._file_ranges(file_path, workers)
+        if ranges is None:
+            return self.parse_file(file_path)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _parse_file_range,
+                repeat(type(self)),
+                repeat(self.encoding),
+                repeat(file_path),
+                [start for (start, _) in ranges],
+                [end for (_, end) in ranges])
+            record_lists = list(results)
+        for record_list in record_lists:
+            for record_dict in record_list:
+                self._add_record(record_dict)
         return True
 
 class WCHParser(Parser):
@@ -496,16 +815,17 @@ class WCHParser(Parser):
         Converts a comma-separated string of quoted items into a list, stripping
         the quotes.
         """
-        line += ','
-        quoted_items = re.findall(r'".*?",', line)
-        items = [item.strip('",') for item in quoted_items]
-        return items
+        return next(csv.reader([line]), [])
 
     def _parse_fields_line(self, line):
         """
-        Parses field header line into self.fields list.
+        Parses field header line (string or list of column headers) into self.fields
+        and self.years lists.
         """
-        fields_list = WCHParser._csv_line_to_list(line)
+        if isinstance(line, str):
+            fields_list = WCHParser._csv_line_to_list(line)
+        else:
+            fields_list = line
         for field in fields_list:
             if len(field) == 4 and field.isnumeric():
                 try:
@@ -515,106 +835,199 @@ class WCHParser(Parser):
             else:
                 self.fields.append(field)
 
+    @staticmethod
+    def _body_rows(lines):
+        """
+        Yields CSV rows from an iterable of lines of a citation history file,
+        skipping the header, which is separated from the rows by a blank line.
+        Quoted items may contain commas, escaped quotes and line breaks.
+
+        Web of Science doesn't escape quotes within items, so rows with quotes
+        inside items that don't read back as valid CSV are split on '","'
+        instead.
+        """
+        lines = iter(lines)
+        for line in lines:
+            if not line.rstrip('\r\n'):
+                break
+        row_lines = []
+        def tracked_lines():
+            for line in lines:
+                row_lines.append(line)
+                yield line
+        row_length = None
+        for row in csv.reader(tracked_lines()):
+            raw_row = ''.join(row_lines).strip()
+            del row_lines[:]
+            if not row:
+                continue
+            if row_length is None:
+                row_length = len(row)
+            elif (raw_row.count('"') != 2 * row_length
+                  and raw_row.startswith('"') and raw_row.endswith('"')
+                  and raw_row != ','.join('"%s"' % item.replace('"', '""') for item in row)):
+                split_row = raw_row[1:-1].split('","')
+                if len(split_row) == row_length:
+                    row = split_row
+            yield row
+
     @classmethod
-    def is_parsable_file(cls, file_path, encoding=None):
-        if encoding is None:
-            encoding = detect_encoding(file_path)
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-            try:
-                file_text = file_data.decode(encoding)
-            except UnicodeDecodeError:
+    def is_parsable_prefix(cls, text, complete=True):
+        rows = list(WCHParser._body_rows(io.StringIO(text, newline='')))
+        if not complete:
+            # Last row may be cut off.
+            rows = rows[:-1]
+        item_count = None
+        year_cols = False
+        for row in rows:
+            if item_count is None:
+                item_count = len(row)
+                for item in row:
+                    if item.isnumeric():
+                        if len(item) != 4:
+                            return False
+                        year_cols = True
+                continue
+            elif item_count != len(row):
                 return False
-            lines = file_text.splitlines()
-            in_header = True
-            item_count = None
-            for line in lines:
-                if in_header: # Header separated from content by blank line
-                    if not line:
-                        in_header = False
-                    continue
-                line_items = WCHParser._csv_line_to_list(line)
-                if item_count is None:
-                    item_count = len(line_items)
-                    year_cols = False
-                    for item in line_items:
-                        if item.isnumeric():
-                            if len(item) != 4:
-                                return False
-                            year_cols = True
-                    continue
-                elif item_count != len(line_items):
-                    return False
-        if not year_cols:
-            return False
-        return True
+        return year_cols
 
-    def parse_content_item(self, content=None):
-        Parser.parse_content_item(self, content)
-        content = self.content
+    def _records_from_rows(self, rows):
+        """
+        Converts content rows into record dicts.
 
-        if not content:
-            return False
-        
+        Citation histories of all rows are stored in a single records x years
+        int32 matrix, and each record's 'Citation History' is a CitationHistory
+        view of its row.
+        """
         if not self.fields or not self.years:
             raise exceptions.ParsingError("Column headers must be parsed before content items.")
 
-        record_dict = {}
-        content_list = WCHParser._csv_line_to_list(content)
-        if content_list:
-            record_dict['Citation History'] = {}
-        if len(content_list) != len(self.fields) + len(self.years):
+        fields = self.fields
+        field_count = len(fields)
+        row_length = field_count + len(self.years)
+        record_dicts = []
+        history_cells = []
+        for row in rows:
+            if len(row) != row_length:
+                raise exceptions.ParsingError(
+                    "WCHParser: Length of content line (%s) doesn't match length of fields (%s)." %
+                    (len(row), row_length)
+                )
+            record_dict = {}
+            for field, content_item in zip(fields, row):
+                if field == 'Authors':
+                    content_item = content_item.split(';') or None
+                record_dict[field] = content_item or None
+            record_dicts.append(record_dict)
+            history_cells.append(row[field_count:])
+
+        try:
+            history_matrix = numpy.array(history_cells, dtype=numpy.int32).reshape(
+                len(history_cells), len(self.years))
+        except ValueError as error:
             raise exceptions.ParsingError(
-                "WCHParser: Length of content line (%s) doesn't match length of fields (%s)." %
-                (len(content_list), len(self.fields) + len(self.years))
+                "WCHParser: Expected integer for citation history year: %s" % error
             )
 
-        for i, content_item in enumerate(content_list):
-            if i < len(self.fields):
-                if self.fields[i] == 'Authors':
-                    content_item = content_item.split(';') or None
-                record_dict[self.fields[i]] = content_item or None
-            else:
-                try:
-                    record_dict['Citation History'][self.years[i - len(self.fields)]] = int(content_item)
-                except ValueError:
-                    raise exceptions.ParsingError(
-                        "WCHParser: Expected integer for citation history year, got: %s" % content_item
-                    )
+        years = tuple(self.years)
+        year_index = {year: i for i, year in enumerate(years)}
+        for i, record_dict in enumerate(record_dicts):
+            record_dict['Citation History'] = CitationHistory(
+                years, year_index, history_matrix[i])
+        return record_dicts
 
-        next_missing_id = 0
-        if self.id_field is not None:
-            try:
-                self.parsed_dict[record_dict[self.id_field]] = record_dict
-            except KeyError:
-                self.parsed_dict[self.MISSING_ID_PREFIX + str(next_missing_id)] = record_dict
-                next_missing_id += 1
-        else:
-            self.parsed_list.append(record_dict)
+    def parse_content_item(self, content=None):
+        Parser.parse_content_item(self, content)
+        content = self.content
 
-    def parse_file(self, file_path=None):
-        Parser.parse_file(self, file_path)
-        file_path = self.file_path
-        if not self.is_parsable_file(file_path):
+        if not content:
+            return False
+
+        for row in csv.reader(content.splitlines()):
+            if row:
+                for record_dict in self._records_from_rows([row]):
+                    self._add_record(record_dict)
+
+    def iter_file(self, file_path=None):
+        """
+        Yields record dicts parsed from a citation history file.
+        """
+        if file_path is None:
+            file_path = self.file_path
+        if not self.is_parsable_file(file_path, self.encoding):
             raise exceptions.FileParseError(
                 'File %s is not parsable by %s' % (file_path, type(self).__name__))
         if self.encoding is None:
-                self.encoding = detect_encoding(file_path)
+            self.encoding = sniff_file(file_path)['encoding']
 
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-            file_text = file_data.decode(self.encoding)
-
-        lines = file_text.splitlines()
-        in_header = True
-        for line in lines:
-            if in_header:
-                if not line:
-                    in_header = False
-                continue
-            if not self.fields:
-                self._parse_fields_line(line)
-                continue
-            self.parse_content_item(line)
+        try:
+            with open(file_path, 'r', encoding=self.encoding, newline='') as f:
+                rows = WCHParser._body_rows(f)
+                if not self.fields:
+                    self._parse_fields_line(next(rows, []))
+                record_dicts = self._records_from_rows(rows)
+        except UnicodeDecodeError as e:
+            raise exceptions.FileParseError(
+                'Cannot decode file %s: %s' % (file_path, e)) from e
+        yield from record_dicts
 
+    def parse_file(self, file_path=None, workers=None):
+        Parser.parse_file(self, file_path)
+        for record_dict in self.iter_file(self.file_path):
+            self._add_record(record_dict)
         return True
+
+    def citation_matrix(self, records=None):
+        """
+        Returns citation histories of records as a single matrix.
+
+        Args:
+            records (list): Record dicts. Defaults to self.parsed_list.
+
+        Returns:
+            (years, matrix) where years is a list of years and matrix is a
+            records x years int32 numpy array of citation counts. Years missing
+            from a record's citation history are 0.
+        """
+        if records is None:
+            records = self.parsed_list
+        histories = [record.get('Citation History') for record in records]
+        groups = {}
+        for row, history in enumerate(histories):
+            if history:
+                groups.setdefault(history.years, []).append(row)
+        years = sorted(set(year for group_years in groups for year in group_years))
+        column = {year: i for i, year in enumerate(years)}
+        matrix = numpy.zeros((len(histories), len(years)), dtype=numpy.int32)
+        for group_years, rows in groups.items():
+            columns = [column[year] for year in group_years]
+            matrix[numpy.ix_(rows, columns)] = numpy.stack(
+                [histories[row].counts for row in rows])
+        return (years, matrix)
+
+class CitationHistory(Mapping):
+    """
+    Read-only mapping from year to citation count for a citation history record.
+
+    Counts are a row of a records x years matrix shared by all records parsed
+    from the same file, so parsing many records doesn't create a dict per record.
+    """
+    __slots__ = ('years', 'counts', '_year_index')
+
+    def __init__(self, years, year_index, counts):
+        self.years = years
+        self.counts = counts
+        self._year_index = year_index
+
+    def __getitem__(self, year):
+        return int(self.counts[self._year_index[year]])
+
+    def __iter__(self):
+        return iter(self.years)
+
+    def __len__(self):
+        return len(self.years)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -5,14 +5,91 @@ import re
 
 import logging
 
-from bibliom.dbentity import DBEntity
+from bibliom.dbentity import DBEntity, related
 from bibliom.dbtable import DBTable
+from bibliom.constants import PREFETCH_CHUNK_SIZE
 from bibliom import exceptions
 
+def prefetch_related(entities, *relationships):
+    """
+    Loads relationships for a list of entities with one query per relationship
+    (per PREFETCH_CHUNK_SIZE entities), instead of one or more queries per
+    entity. Loaded values are cached on the entities and returned by the
+    corresponding properties until entity.clear_related() is called.
+
+    Args:
+        entities ([DBEntity]): Entities to load relationships for. Entities may
+                               be of different classes.
+        *relationships (str): Names of relationship properties to load, eg.
+                              'authors', 'journal', 'cited_papers'.
+
+    Returns:
+        entities
+
+    Example:
+        papers = Paper.fetch_papers(manager, idjournal=3)
+        prefetch_related(papers, 'authors', 'cited_papers')
+    """
+    groups = {}
+    for entity in entities:
+        groups.setdefault((type(entity), entity.table), []).append(entity)
+    for (cls, _), group in groups.items():
+        for relationship in relationships:
+            prefetch = getattr(cls, '_prefetch_' + relationship, None)
+            if prefetch is None:
+                raise ValueError(
+                    "%s has no relationship %s" % (cls.__name__, relationship))
+            prefetch(group)
+    return entities
+
+def _unique_ids(entities, field):
+    """
+    Returns list of distinct non-null values of field for entities.
+    """
+    return list({entity.get_field(field) for entity in entities} - {None})
+
+def _fetch_rows_in(table, column, ids):
+    """
+    Returns list of rows of table where column is in ids, fetched in chunks.
+    """
+    rows = []
+    for i in range(0, len(ids), PREFETCH_CHUNK_SIZE):
+        fetched = table.fetch_rows({column: ids[i:i + PREFETCH_CHUNK_SIZE]})
+        if fetched:
+            rows.extend(fetched.values())
+    return rows
+
+def _fetch_entities_in(cls, table, column, ids):
+    """
+    Returns list of entities of cls from table where column is in ids, fetched
+    in chunks.
+    """
+    entities = []
+    for i in range(0, len(ids), PREFETCH_CHUNK_SIZE):
+        fetched = cls.fetch_entities(table, {column: ids[i:i + PREFETCH_CHUNK_SIZE]})
+        if fetched:
+            entities.extend(fetched)
+    return entities
+
+def _fetch_by_id(cls, table_name, manager, ids):
+    """
+    Returns dictionary {id: entity} of entities of cls with primary key in ids.
+    """
+    table = DBTable.get_table_object(table_name, manager)
+    id_field = 'id' + table_name
+    return {entity.get_field(id_field): entity
+            for entity in _fetch_entities_in(cls, table, id_field, ids)}
+
 class Paper(DBEntity):
     """
     A single publication.
     """
+    __slots__ = ('was_retracted',)
+
+    default_table = 'paper'
+
+    deferred_fields = ('abstract', 'content', 'cited_records', 'citation_record')
+
     def __init__(self, table=None, manager=None, row_key=None, fields_dict=None, **kwargs):
         if table is None:
             table = 'paper'
@@ -30,7 +107,7 @@ class Paper(DBEntity):
     def __str__(self):
         return "%s (%s)" % (str(self.title), str(self.doi))
 
-    @property
+    @related
     def authors(self):
         """
         Get list of authors for a paper.
@@ -44,7 +121,7 @@ class Paper(DBEntity):
         authors = Author.fetch_entities(author_table, {'idauthor':author_ids})
         return authors
 
-    @property
+    @related
     def journal(self):
         """
         Get journal containing paper.
@@ -55,7 +132,7 @@ class Paper(DBEntity):
         journal = Journal.fetch(journal_table, {'idjournal': self.idjournal})
         return journal
 
-    @property
+    @related
     def cited_papers(self):
         """
         Returns list of papers cited by this paper.
@@ -68,7 +145,7 @@ class Paper(DBEntity):
                         for c in citations]
         return cited_papers
 
-    @property
+    @related
     def citing_papers(self):
         """
         Returns list of papers citing this paper.
@@ -81,6 +158,63 @@ class Paper(DBEntity):
                          for c in citations]
         return citing_papers
 
+    @classmethod
+    def _prefetch_authors(cls, papers):
+        """
+        Loads authors of papers.
+        """
+        manager = papers[0].table.manager
+        pa_table = DBTable.get_table_object('paper_author', manager)
+        author_ids = {}
+        for pa in _fetch_rows_in(pa_table, 'idpaper', _unique_ids(papers, 'idpaper')):
+            author_ids.setdefault(pa['idpaper'], []).append(pa['idauthor'])
+        authors = _fetch_by_id(
+            Author, 'author', manager, list({a for ids in author_ids.values() for a in ids}))
+        for paper in papers:
+            paper.cache_related('authors', [
+                authors[a] for a in author_ids.get(paper.idpaper, []) if a in authors])
+
+    @classmethod
+    def _prefetch_journal(cls, papers):
+        """
+        Loads journals of papers.
+        """
+        journals = _fetch_by_id(
+            Journal, 'journal', papers[0].table.manager, _unique_ids(papers, 'idjournal'))
+        for paper in papers:
+            paper.cache_related('journal', journals.get(paper.idjournal))
+
+    @classmethod
+    def _prefetch_citations(cls, papers, name, from_field, to_field):
+        """
+        Loads papers linked to papers by citations from from_field to to_field.
+        """
+        manager = papers[0].table.manager
+        citation_table = DBTable.get_table_object('citation', manager)
+        linked_ids = {}
+        for citation in _fetch_rows_in(
+                citation_table, from_field, _unique_ids(papers, 'idpaper')):
+            linked_ids.setdefault(citation[from_field], []).append(citation[to_field])
+        linked = _fetch_by_id(
+            Paper, 'paper', manager, list({p for ids in linked_ids.values() for p in ids}))
+        for paper in papers:
+            paper.cache_related(name, [
+                linked[p] for p in linked_ids.get(paper.idpaper, []) if p in linked])
+
+    @classmethod
+    def _prefetch_cited_papers(cls, papers):
+        """
+        Loads papers cited by papers.
+        """
+        cls._prefetch_citations(papers, 'cited_papers', 'source_id', 'target_id')
+
+    @classmethod
+    def _prefetch_citing_papers(cls, papers):
+        """
+        Loads papers citing papers.
+        """
+        cls._prefetch_citations(papers, 'citing_papers', 'target_id', 'source_id')
+
     @property
     def yearly_citations(self):
         """
@@ -142,6 +276,10 @@ class Author(DBEntity):
     """
     A single Author.
     """
+    __slots__ = ()
+
+    default_table = 'author'
+
     def __init__(self, table=None, manager=None, row_key=None, fields_dict=None, **kwargs):
         if table is None:
             table = 'author'
@@ -157,22 +295,33 @@ class Author(DBEntity):
     def __str__(self):
         return "%s, %s" % (str(self.last_name), str(self.given_names))
 
+    @staticmethod
+    def fields_from_string(author_str):
+        """
+        Returns dict of author fields parsed from a string.
+        """
+        m = re.match(r'(.*), (.*)', author_str)
+        if m is not None:
+            return {
+                'last_name':    m.group(1),
+                'given_names':  m.group(2)
+            }
+        return {
+            'last_name':    author_str,
+            'corporate':    True
+        }
+
     @classmethod
     def from_string(cls, table, author_str):
         """
         Creates an author from a string.
         """
         new_author = cls(table)
-        m = re.match(r'(.*), (.*)', author_str)
-        if m is not None:
-            new_author.last_name = m.group(1)
-            new_author.given_names = m.group(2)
-        else:
-            new_author.last_name = author_str
-            new_author.corporate = True
+        for field, value in cls.fields_from_string(author_str).items():
+            setattr(new_author, field, value)
         return new_author
 
-    @property
+    @related
     def papers(self):
         """
         Get list of papers written by author.
@@ -186,10 +335,30 @@ class Author(DBEntity):
         papers = Paper.fetch_entities(paper_table, {'idpaper':paper_ids})
         return papers
 
+    @classmethod
+    def _prefetch_papers(cls, authors):
+        """
+        Loads papers of authors.
+        """
+        manager = authors[0].table.manager
+        pa_table = DBTable.get_table_object('paper_author', manager)
+        paper_ids = {}
+        for pa in _fetch_rows_in(pa_table, 'idauthor', _unique_ids(authors, 'idauthor')):
+            paper_ids.setdefault(pa['idauthor'], []).append(pa['idpaper'])
+        papers = _fetch_by_id(
+            Paper, 'paper', manager, list({p for ids in paper_ids.values() for p in ids}))
+        for author in authors:
+            author.cache_related('papers', [
+                papers[p] for p in paper_ids.get(author.idauthor, []) if p in papers])
+
 class Journal(DBEntity):
     """
     A single journal.
     """
+    __slots__ = ()
+
+    default_table = 'journal'
+
     def __init__(self, table=None, manager=None, row_key=None, fields_dict=None, **kwargs):
         if table is None:
             table = 'journal'
@@ -205,7 +374,7 @@ class Journal(DBEntity):
     def __str__(self):
         return str(self.title)
 
-    @property
+    @related
     def papers(self):
         """
         Get list of papers contained in journal.
@@ -214,10 +383,27 @@ class Journal(DBEntity):
         papers = Paper.fetch_entities(paper_table, {'idjournal':self.idjournal})
         return papers
 
+    @classmethod
+    def _prefetch_papers(cls, journals):
+        """
+        Loads papers contained in journals.
+        """
+        paper_table = DBTable.get_table_object('paper', journals[0].table.manager)
+        papers = {}
+        for paper in _fetch_entities_in(
+                Paper, paper_table, 'idjournal', _unique_ids(journals, 'idjournal')):
+            papers.setdefault(paper.idjournal, []).append(paper)
+        for journal in journals:
+            journal.cache_related('papers', papers.get(journal.idjournal, []))
+
 class Citation(DBEntity):
     """
     A single citation from source paper to target paper.
     """
+    __slots__ = ()
+
+    default_table = 'citation'
+
     def __init__(self, table=None, manager=None, row_key=None, fields_dict=None, **kwargs):
         if table is None:
             table = 'citation'
@@ -237,7 +423,7 @@ class Citation(DBEntity):
         self.source_id = source_paper.idpaper
         self.target_id = target_paper.idpaper
 
-    @property
+    @related
     def source_paper(self):
         """
         Returns Paper object corresponding to source paper.
@@ -251,8 +437,9 @@ class Citation(DBEntity):
         Sets source_id to id of source Paper.
         """
         self.source_id = source.idpaper
+        self.cache_related('source_paper', source)
 
-    @property
+    @related
     def target_paper(self):
         """
         Returns Paper object corresponding to target paper.
@@ -266,3 +453,24 @@ class Citation(DBEntity):
         Sets target_id to id of target Paper.
         """
         self.target_id = target.idpaper
+        self.cache_related('target_paper', target)
+
+    @classmethod
+    def _prefetch_source_paper(cls, citations):
+        """
+        Loads source papers of citations.
+        """
+        papers = _fetch_by_id(
+            Paper, 'paper', citations[0].table.manager, _unique_ids(citations, 'source_id'))
+        for citation in citations:
+            citation.cache_related('source_paper', papers.get(citation.source_id))
+
+    @classmethod
+    def _prefetch_target_paper(cls, citations):
+        """
+        Loads target papers of citations.
+        """
+        papers = _fetch_by_id(
+            Paper, 'paper', citations[0].table.manager, _unique_ids(citations, 'target_id'))
+        for citation in citations:
+            citation.cache_related('target_paper', papers.get(citation.target_id))
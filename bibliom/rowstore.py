@@ -0,0 +1,648 @@
+"""
+RowStore class.
+
+Compact storage for rows cached by a DBTable. Instead of a dict per row, the
+field names of a table are indexed once and rows are assigned slots. Values are
+stored by column, in one list per field indexed by slot, and a field that is
+None in every row has no list at all. Row statuses are stored in a bytearray.
+Rows are exposed through lightweight RowView mappings, so code that reads and
+writes rows as dicts keeps working. Changed (dirty) fields of a row, and fields
+that haven't been loaded from the database, are tracked as bitmasks over the
+field index. Fields can be indexed, so cached rows can be looked up by value.
+"""
+import sys
+import heapq
+import struct
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+class RowView(MutableMapping):
+    """
+    Mapping view of a single row in a RowStore. Reads and writes go directly to
+    the row stored under the view's row key, and writes to indexed fields update
+    the store's indexes. Reading or writing a view of a row that is no longer
+    cached raises KeyError.
+    """
+    __slots__ = ('_store', '_row_key')
+
+    def __init__(self, store, row_key):
+        self._store = store
+        self._row_key = row_key
+
+    def __getitem__(self, field):
+        return self._store.get_field_value(self._row_key, self._store.field_index[field])
+
+    def __setitem__(self, field, value):
+        try:
+            index = self._store.field_index[field]
+        except KeyError:
+            raise KeyError("%s is not a field of this row." % field)
+        self._store.set_field_value(self._row_key, index, value)
+
+    def __delitem__(self, field):
+        raise TypeError("Fields can't be deleted from a row. Set field to None instead.")
+
+    def __iter__(self):
+        return iter(self._store.field_index)
+
+    def __len__(self):
+        return len(self._store.field_index)
+
+    def __contains__(self, field):
+        return field in self._store.field_index
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, field, default=None):
+        index = self._store.field_index.get(field)
+        if index is None:
+            return default
+        return self._store.get_field_value(self._row_key, index)
+
+    def items(self):
+        return list(zip(self._store.fields, self._store.row_values(self._row_key)))
+
+    def values(self):
+        return self._store.row_values(self._row_key)
+
+    def copy(self):
+        """
+        Returns row as a new dict.
+        """
+        return dict(zip(self._store.fields, self._store.row_values(self._row_key)))
+
+class RowStore(MutableMapping):
+    """
+    Mapping of row_key to row for a table, storing the values of rows by column
+    in the table's field order.
+
+    Row statuses are kept in the same store and exposed through the statuses
+    mapping. As with separate rows and row_status dicts, a row may be cached
+    without a status and a status may be recorded for a row that isn't cached.
+
+    Each cached row records when it was last used. Cached rows with status
+    evictable_status that aren't pinned are kept ordered by last use, so the
+    least recently used of them is found without scanning the rows that can't
+    be evicted. Rows touched while evictable are kept in an ordered dict, and
+    rows that become evictable again, with an older last use, in a heap.
+    """
+    # Status value for rows without a status.
+    NO_STATUS = 255
+    # Size in bytes of a reference to a stored value.
+    VALUE_REF_SIZE = struct.calcsize('P')
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.field_index = {field: i for i, field in enumerate(self.fields)}
+        self._slots = {}
+        self._columns = [None] * len(self.fields)
+        self._status = bytearray()
+        self._free_slots = []
+        self._uncached_status = {}
+        self._sizes = None
+        self.nbytes = 0
+        self._dirty = {}
+        self._unloaded = {}
+        self._indexes = {}
+        self._tick = 0
+        self._ticks = array('Q')
+        self._pins = {}
+        self._evictable = OrderedDict()
+        self._evictable_last = 0
+        self._returned = {}
+        self._returned_heap = []
+        self.evictable_status = None
+        self.statuses = StatusView(self)
+
+    def _row_values(self, row):
+        """
+        Returns list of values of row in field order.
+        """
+        get = row.get
+        return [get(field) for field in self.fields]
+
+    def _slot_values(self, slot):
+        """
+        Returns list of values stored in slot, in field order.
+        """
+        return [None if column is None else column[slot] for column in self._columns]
+
+    def _store_values(self, slot, values):
+        """
+        Stores values, in field order, in slot. The column of a field is
+        created when a value other than None is first stored in it.
+        """
+        columns = self._columns
+        for index, value in enumerate(values):
+            column = columns[index]
+            if column is None:
+                if value is None:
+                    continue
+                column = columns[index] = [None] * len(self._status)
+            column[slot] = value
+
+    @staticmethod
+    def _values_nbytes(values):
+        """
+        Returns approximate size in bytes of a stored row.
+        """
+        return (RowStore.VALUE_REF_SIZE * len(values)
+                + sum(sys.getsizeof(value) for value in values))
+
+    def __getitem__(self, row_key):
+        if row_key not in self._slots:
+            raise KeyError(row_key)
+        return RowView(self, row_key)
+
+    def __setitem__(self, row_key, row):
+        values = self._row_values(row)
+        size = 0 if self._sizes is None else RowStore._values_nbytes(values)
+        slot = self._slots.get(row_key)
+        if slot is not None:
+            if self._indexes:
+                self._unindex_row(row_key, self._slot_values(slot))
+                self._index_row(row_key, values)
+            self._store_values(slot, values)
+            self._dirty.pop(row_key, None)
+            self._unloaded.pop(row_key, None)
+            if self._sizes is not None:
+                self.nbytes += size - self._sizes[slot]
+                self._sizes[slot] = size
+            return
+        status = self._uncached_status.pop(row_key, RowStore.NO_STATUS)
+        self._tick += 1
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._status[slot] = status
+            self._ticks[slot] = self._tick
+            if self._sizes is not None:
+                self._sizes[slot] = size
+        else:
+            slot = len(self._status)
+            for column in self._columns:
+                if column is not None:
+                    column.append(None)
+            self._status.append(status)
+            self._ticks.append(self._tick)
+            if self._sizes is not None:
+                self._sizes.append(size)
+        self._store_values(slot, values)
+        self.nbytes += size
+        self._slots[row_key] = slot
+        if self._indexes:
+            self._index_row(row_key, values)
+        if status == self.evictable_status:
+            self._update_evictable(row_key, status)
+
+    def __delitem__(self, row_key):
+        slot = self._slots.pop(row_key)
+        if self._indexes:
+            self._unindex_row(row_key, self._slot_values(slot))
+        self._remove_evictable(row_key)
+        self._dirty.pop(row_key, None)
+        self._unloaded.pop(row_key, None)
+        if self._status[slot] != RowStore.NO_STATUS:
+            self._uncached_status[row_key] = self._status[slot]
+        for column in self._columns:
+            if column is not None:
+                column[slot] = None
+        self._status[slot] = RowStore.NO_STATUS
+        if self._sizes is not None:
+            self.nbytes -= self._sizes[slot]
+            self._sizes[slot] = 0
+        self._free_slots.append(slot)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, row_key):
+        return row_key in self._slots
+
+    def __repr__(self):
+        return "RowStore(%d rows)" % len(self)
+
+    def get(self, row_key, default=None):
+        if row_key not in self._slots:
+            return default
+        return RowView(self, row_key)
+
+    def clear(self):
+        """
+        Removes all cached rows. Statuses of removed rows are kept, as if rows
+        and statuses were stored separately.
+        """
+        for row_key in list(self._slots):
+            del self[row_key]
+        self._columns = [None] * len(self.fields)
+        self._status = bytearray()
+        self._ticks = array('Q')
+        self._free_slots = []
+        if self._sizes is not None:
+            self._sizes = array('Q')
+        self.nbytes = 0
+        self._dirty = {}
+
+    def row_values(self, row_key):
+        """
+        Returns list of values of cached row row_key, in field order. Raises
+        KeyError if the row isn't cached.
+        """
+        return self._slot_values(self._slots[row_key])
+
+    def get_field_value(self, row_key, index):
+        """
+        Returns value of field number index of cached row row_key. Raises
+        KeyError if the row isn't cached.
+        """
+        slot = self._slots[row_key]
+        column = self._columns[index]
+        return None if column is None else column[slot]
+
+    def set_field_value(self, row_key, index, value):
+        """
+        Sets field number index of cached row row_key to value, updating the
+        index of the field. Raises KeyError if the row isn't cached.
+        """
+        slot = self._slots[row_key]
+        column = self._columns[index]
+        if column is None:
+            if value is None:
+                return
+            column = self._columns[index] = [None] * len(self._status)
+        if self._indexes:
+            self._update_index(row_key, index, column[slot], value)
+        column[slot] = value
+
+    def get_value(self, row_key, index):
+        """
+        Returns value of field number index of cached row row_key. Raises
+        KeyError if the row isn't cached or the field hasn't been loaded.
+        """
+        if self._unloaded.get(row_key, 0) >> index & 1:
+            raise KeyError(row_key)
+        return self.get_field_value(row_key, index)
+
+    def swap_value(self, row_key, index, value):
+        """
+        Sets field number index of cached row row_key to value and returns the
+        old value. Raises KeyError if the row isn't cached or the field hasn't
+        been loaded.
+        """
+        old_value = self.get_value(row_key, index)
+        self.set_field_value(row_key, index, value)
+        return old_value
+
+    def add_index(self, field):
+        """
+        Indexes cached rows by the value of field, for lookup. Rows whose value
+        is None aren't indexed. If several rows have the same value, the row
+        indexed first is found.
+        """
+        index = self.field_index[field]
+        if index in self._indexes:
+            return
+        entries = self._indexes[index] = {}
+        column = self._columns[index]
+        if column is None:
+            return
+        for row_key, slot in self._slots.items():
+            value = column[slot]
+            if value is not None:
+                entries.setdefault(value, row_key)
+
+    def lookup(self, field, value):
+        """
+        Returns key of a cached row whose field has value, or None. Raises
+        KeyError if field isn't indexed.
+        """
+        return self._indexes[self.field_index[field]].get(value)
+
+    def _index_row(self, row_key, values):
+        """
+        Adds row_key, with stored values, to indexes.
+        """
+        for index, entries in self._indexes.items():
+            value = values[index]
+            if value is not None:
+                entries.setdefault(value, row_key)
+
+    def _unindex_row(self, row_key, values):
+        """
+        Removes row_key, with stored values, from indexes.
+        """
+        for index, entries in self._indexes.items():
+            value = values[index]
+            if value is not None and entries.get(value) == row_key:
+                del entries[value]
+
+    def _update_index(self, row_key, index, old_value, value):
+        """
+        Updates index of field number index of row_key for value about to
+        replace old_value.
+        """
+        entries = self._indexes.get(index)
+        if entries is None:
+            return
+        if old_value is not None and entries.get(old_value) == row_key:
+            del entries[old_value]
+        if value is not None:
+            entries.setdefault(value, row_key)
+
+    def is_dirty(self, row_key):
+        """
+        Returns True if changes to row_key have been recorded with mark_dirty.
+        """
+        return row_key in self._dirty
+
+    def mark_dirty(self, row_key, field):
+        """
+        Records that field of cached row row_key has been changed.
+        """
+        if row_key not in self._slots:
+            raise KeyError(row_key)
+        self._dirty[row_key] = self._dirty.get(row_key, 0) | (1 << self.field_index[field])
+
+    def dirty_fields(self, row_key):
+        """
+        Returns tuple of changed fields of row_key, in field order.
+        """
+        mask = self._dirty.get(row_key, 0)
+        if not mask:
+            return ()
+        return tuple(field for index, field in enumerate(self.fields) if mask >> index & 1)
+
+    def clear_dirty(self, row_key, fields=None):
+        """
+        Forgets changed fields (default all fields) of row_key.
+        """
+        if fields is None:
+            self._dirty.pop(row_key, None)
+            return
+        mask = self._dirty.get(row_key, 0) & ~self._field_mask(fields)
+        if mask:
+            self._dirty[row_key] = mask
+        else:
+            self._dirty.pop(row_key, None)
+
+    def _field_mask(self, fields):
+        """
+        Returns bitmask of fields.
+        """
+        mask = 0
+        for field in fields:
+            mask |= 1 << self.field_index[field]
+        return mask
+
+    def mark_unloaded(self, row_key, fields):
+        """
+        Records that fields of cached row row_key haven't been loaded. Their
+        values are None until they are loaded.
+        """
+        if row_key not in self._slots:
+            raise KeyError(row_key)
+        mask = self._unloaded.get(row_key, 0) | self._field_mask(fields)
+        if mask:
+            self._unloaded[row_key] = mask
+
+    def mark_loaded(self, row_key, fields=None):
+        """
+        Records that fields (default all fields) of row_key have been loaded.
+        """
+        if fields is None:
+            self._unloaded.pop(row_key, None)
+            return
+        mask = self._unloaded.get(row_key, 0) & ~self._field_mask(fields)
+        if mask:
+            self._unloaded[row_key] = mask
+        else:
+            self._unloaded.pop(row_key, None)
+
+    def unloaded_fields(self, row_key):
+        """
+        Returns tuple of fields of row_key that haven't been loaded, in field
+        order.
+        """
+        mask = self._unloaded.get(row_key, 0)
+        if not mask:
+            return ()
+        return tuple(field for index, field in enumerate(self.fields) if mask >> index & 1)
+
+    def touch(self, row_key):
+        """
+        Marks row_key as most recently used. Iteration is in order from least
+        to most recently used.
+        """
+        slot = self._slots.pop(row_key)
+        self._slots[row_key] = slot
+        self._tick += 1
+        self._ticks[slot] = self._tick
+        if row_key in self._evictable:
+            self._evictable.move_to_end(row_key)
+        elif row_key in self._returned:
+            del self._returned[row_key]
+        else:
+            return
+        self._evictable[row_key] = self._tick
+        self._evictable_last = self._tick
+
+    def _update_evictable(self, row_key, status):
+        """
+        Adds cached row row_key to the evictable rows if status is
+        evictable_status and it isn't pinned, or removes it otherwise.
+        """
+        if status != self.evictable_status or row_key in self._pins:
+            self._remove_evictable(row_key)
+        elif row_key not in self._evictable and row_key not in self._returned:
+            tick = self._ticks[self._slots[row_key]]
+            if tick > self._evictable_last:
+                self._evictable[row_key] = tick
+                self._evictable_last = tick
+            else:
+                self._returned[row_key] = tick
+                heapq.heappush(self._returned_heap, (tick, row_key))
+
+    def _remove_evictable(self, row_key):
+        """
+        Removes row_key from the evictable rows, if it's there.
+        """
+        if self._evictable.pop(row_key, None) is None:
+            self._returned.pop(row_key, None)
+            # Heap entries of removed rows are skipped when found, and
+            # dropped all at once if they get to outnumber the others.
+            if len(self._returned_heap) > 2 * len(self._returned) + 64:
+                self._returned_heap = [(tick, key) for key, tick in self._returned.items()]
+                heapq.heapify(self._returned_heap)
+
+    def _clear_evictable(self):
+        """
+        Removes all rows from the evictable rows.
+        """
+        self._evictable.clear()
+        self._returned.clear()
+        self._returned_heap = []
+
+    def least_recent_evictable(self):
+        """
+        Returns key of the least recently used unpinned cached row with status
+        evictable_status, or None if there isn't one.
+        """
+        heap = self._returned_heap
+        while heap and self._returned.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        if self._evictable:
+            row_key = next(iter(self._evictable))
+            if not heap or self._evictable[row_key] < heap[0][0]:
+                return row_key
+        return heap[0][1] if heap else None
+
+    def pin(self, row_key):
+        """
+        Counts a pin on row_key, which keeps it from being evictable until
+        it is unpinned.
+        """
+        self._pins[row_key] = self._pins.get(row_key, 0) + 1
+        self._remove_evictable(row_key)
+
+    def unpin(self, row_key):
+        """
+        Releases a pin on row_key set with pin.
+
+        Returns:
+            True if row_key is no longer pinned.
+        """
+        count = self._pins.get(row_key, 0)
+        if count > 1:
+            self._pins[row_key] = count - 1
+            return False
+        self._pins.pop(row_key, None)
+        slot = self._slots.get(row_key)
+        if slot is not None:
+            self._update_evictable(row_key, self._status[slot])
+        return True
+
+    def pinned_keys(self):
+        """
+        Returns keys of pinned rows, which needn't be cached.
+        """
+        return self._pins.keys()
+
+    def track_nbytes(self, enabled=True):
+        """
+        Starts or stops keeping nbytes, a running total of the approximate size
+        of stored rows in bytes. Sizes are measured when rows are stored.
+        """
+        if not enabled:
+            self._sizes = None
+            self.nbytes = 0
+            return
+        if self._sizes is not None:
+            return
+        self._sizes = array('Q', [0]) * len(self._status)
+        self.nbytes = 0
+        for slot in self._slots.values():
+            size = RowStore._values_nbytes(self._slot_values(slot))
+            self._sizes[slot] = size
+            self.nbytes += size
+
+    def row_nbytes(self, row_key):
+        """
+        Returns approximate size in bytes of row_key, or 0 if sizes aren't tracked.
+        """
+        if self._sizes is None:
+            return 0
+        return self._sizes[self._slots[row_key]]
+
+    def get_status(self, row_key):
+        """
+        Returns status of row_key. Raises KeyError if row_key has no status.
+        """
+        slot = self._slots.get(row_key)
+        if slot is None:
+            return self._uncached_status[row_key]
+        status = self._status[slot]
+        if status == RowStore.NO_STATUS:
+            raise KeyError(row_key)
+        return status
+
+    def set_status(self, row_key, status):
+        """
+        Sets status of row_key, whether or not the row is cached.
+        """
+        slot = self._slots.get(row_key)
+        if slot is None:
+            self._uncached_status[row_key] = status
+        else:
+            self._status[slot] = status
+            self._update_evictable(row_key, status)
+
+    def delete_status(self, row_key):
+        """
+        Removes status of row_key. Raises KeyError if row_key has no status.
+        """
+        slot = self._slots.get(row_key)
+        if slot is None:
+            del self._uncached_status[row_key]
+        elif self._status[slot] == RowStore.NO_STATUS:
+            raise KeyError(row_key)
+        else:
+            self._status[slot] = RowStore.NO_STATUS
+            self._remove_evictable(row_key)
+
+    def status_keys(self):
+        """
+        Returns list of row keys that have a status.
+        """
+        status = self._status
+        return ([row_key for row_key, slot in self._slots.items()
+                 if status[slot] != RowStore.NO_STATUS]
+                + list(self._uncached_status))
+
+    def clear_statuses(self):
+        """
+        Removes all statuses.
+        """
+        for slot in self._slots.values():
+            self._status[slot] = RowStore.NO_STATUS
+        self._uncached_status.clear()
+        self._clear_evictable()
+
+class StatusView(MutableMapping):
+    """
+    Mapping of row_key to DBTable.RowStatus for rows in a RowStore.
+    """
+    __slots__ = ('_store',)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, row_key):
+        return self._store.get_status(row_key)
+
+    def __setitem__(self, row_key, status):
+        self._store.set_status(row_key, status)
+
+    def __delitem__(self, row_key):
+        self._store.delete_status(row_key)
+
+    def __iter__(self):
+        return iter(self._store.status_keys())
+
+    def __len__(self):
+        return len(self._store.status_keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, row_key, default=None):
+        try:
+            return self._store.get_status(row_key)
+        except KeyError:
+            return default
+
+    def clear(self):
+        self._store.clear_statuses()
@@ -7,7 +7,7 @@ default).
 
 usage: biblio_import.py [-h] [-d DATABASE] [-u USER] [-p PASSWORD] [-r] [-c]
                         [-o | -s | -m] [-v VERBOSE | -q QUIET] [-f {WOK}]
-                        [-g CONFIG] [-l [LOG]]
+                        [-b] [--disable-checks] [-g CONFIG] [-l [LOG]]
                         file|directory
 
 Script for importing bibliographic records into an SQL database.
@@ -31,6 +31,10 @@ optional arguments:
   -q, --quiet           Output no progress information to console.
   -f {WOK}, --format {WOK}
                         Import records matching format (see below).
+  -b, --bulk            Bulk load records into an empty database (Web of
+                        Science records only).
+  --disable-checks      Disable unique and foreign key checks while bulk
+                        loading.
   -g CONFIG, --config CONFIG
                         Use configuration file.
                         Log to file
@@ -122,6 +126,14 @@ def parse_args():
         "-f", "--format",
         help="Import records matching format (see below).",
         choices=available_formats)
+    parser.add_argument(
+        "-b", "--bulk",
+        help="Bulk load records into an empty database (Web of Science records only).",
+        action="store_true")
+    parser.add_argument(
+        "--disable-checks",
+        help="Disable unique and foreign key checks while bulk loading.",
+        action="store_true")
     parser.add_argument(
         "-g", "--config",
         help="Use configuration file.")
@@ -207,7 +219,8 @@ def main():
             raise SystemExit
 
     try:
-        manager = dbmanager.DBManager(options['database'], options['user'], options['password'])
+        manager = dbmanager.DBManager(options['database'], options['user'], options['password'],
+                                      host=options.get('host'), port=options.get('port'))
         must_create_database = False
     except exceptions.UnknownDatabaseError:
         manager = None
@@ -221,7 +234,9 @@ def main():
             manager = dbmanager.DBManager(
                 name=None,
                 user=options['user'],
-                password=options['password']
+                password=options['password'],
+                host=options.get('host'),
+                port=options.get('port')
             )
             manager.create_database(options['database'])
         else:
@@ -233,6 +248,27 @@ def main():
 
     the_parser = get_parser(options)
 
+    if options['bulk'] and not isinstance(the_parser, parsers.WOKParser):
+        print("Bulk loading is only supported for Web of Science records.")
+        raise SystemExit
+
+    if isinstance(the_parser, parsers.WOKParser):
+        # Web of Science records are streamed into the database as they are parsed.
+        if os.path.isfile(options['target']):
+            file_paths = [options['target']]
+        elif os.path.isdir(options['target']):
+            file_paths = parsers.Parser.list_files(options['target'], options['recursive'])
+        else:
+            raise SystemExit
+        logging.getLogger(__name__).info('Parsing and importing records.')
+        parser_db_adapter.parsed_records_to_db(
+            the_parser,
+            manager,
+            records=the_parser.iter_records(file_paths),
+            bulk=options['bulk'],
+            disable_checks=options['disable_checks'])
+        return
+
     logging.getLogger(__name__).info('Parsing records.')
 
     if os.path.isfile(options['target']):
@@ -0,0 +1,110 @@
+"""
+Unit tests for citation_graph.py
+"""
+
+# pylint: disable=unused-variable, missing-docstring, no-member, len-as-condition
+
+import logging
+
+import numpy as np
+import pytest
+
+from bibliom.citation_graph import CitationGraph, PaperIndex
+from bibliom.publication_objects import Paper
+
+class TestCitationGraph:
+    """
+    Tests for CitationGraph class.
+    """
+    # 10 cites 20 and 30, 20 cites 30, 30 cites 40, 50 cites 10. 60 is isolated.
+    SOURCES = [10, 10, 20, 30, 50]
+    TARGETS = [20, 30, 30, 40, 10]
+    PAPERS = [10, 20, 30, 40, 50, 60]
+
+    def test_from_edges(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_from_edges')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS, paper_ids=self.PAPERS)
+        assert len(graph) == 6
+        assert graph.num_citations == 5
+        assert graph.out_indices.dtype == np.int32
+        assert graph.in_indices.dtype == np.int32
+        assert graph.index_of(30) == 2
+        assert graph.index_of([60, 10]).tolist() == [5, 0]
+        assert graph.ids_of([1, 3]).tolist() == [20, 40]
+        with pytest.raises(KeyError):
+            graph.index_of(15)
+
+        graph = CitationGraph.from_edges(self.SOURCES + [10, 70], self.TARGETS + [70, 20])
+        assert len(graph) == 6
+        assert graph.num_citations == 7
+        assert graph.cited(10).tolist() == [20, 30, 70]
+
+        graph = CitationGraph.from_edges(self.SOURCES + [10], self.TARGETS + [70],
+                                         paper_ids=self.PAPERS)
+        assert graph.num_citations == 5
+        with pytest.raises(ValueError):
+            CitationGraph.from_edges([1, 2], [3])
+
+        graph = CitationGraph.from_edges([], [])
+        assert len(graph) == 0
+        assert graph.num_citations == 0
+        assert len(graph.in_degree()) == 0
+
+    def test_paper_index(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_paper_index')
+        dense = PaperIndex(np.array([3, 4, 6, 7], dtype=np.int64))
+        assert dense.table is not None
+        sparse = PaperIndex(np.array([3, 400, 60000, 7000000], dtype=np.int64))
+        assert sparse.table is None
+        for index in (dense, sparse):
+            (positions, found) = index.find(
+                np.array([index.paper_ids[2], 5, index.paper_ids[0], -1, 10 ** 9]))
+            assert found.tolist() == [True, False, True, False, False]
+            assert positions[found].tolist() == [2, 0]
+
+    def test_degree(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_degree')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS, paper_ids=self.PAPERS)
+        assert graph.out_degree().tolist() == [2, 1, 1, 0, 1, 0]
+        assert graph.in_degree().tolist() == [1, 1, 2, 1, 0, 0]
+        assert graph.out_degree(10) == 2
+        assert graph.in_degree([30, 60]).tolist() == [2, 0]
+
+    def test_neighbors(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_neighbors')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS, paper_ids=self.PAPERS)
+        assert graph.cited(10).tolist() == [20, 30]
+        assert graph.citing(30).tolist() == [10, 20]
+        assert graph.cited(60).tolist() == []
+        assert graph.cited([10, 20]).tolist() == [20, 30]
+        assert graph.neighbors(10, 'both').tolist() == [20, 30, 50]
+        with pytest.raises(ValueError):
+            graph.neighbors(10, 'sideways')
+
+    def test_expand(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_expand')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS, paper_ids=self.PAPERS)
+        assert graph.expand(50, hops=0).tolist() == [50]
+        assert graph.expand(50).tolist() == [10, 50]
+        assert graph.expand(50, hops=2).tolist() == [10, 20, 30, 50]
+        assert graph.expand(50, hops=10).tolist() == [10, 20, 30, 40, 50]
+        assert graph.expand([40], hops=2, direction='in').tolist() == [10, 20, 30, 40]
+        assert graph.expand(20, hops=1, direction='both').tolist() == [10, 20, 30]
+        assert graph.expand(60, hops=3, direction='both').tolist() == [60]
+        with pytest.raises(ValueError):
+            graph.expand(50, hops=-1)
+
+    @pytest.mark.usefixtures('class_manager')
+    def test_from_db(self, import_small_database):
+        logging.getLogger('bibliom.pytest').debug('-->TestCitationGraph.test_from_db')
+        graph = CitationGraph.from_db(self.manager, batch_size=100)
+        assert len(graph) == self.manager.table_row_count('paper')
+        assert graph.num_citations == self.manager.table_row_count('citation')
+        assert graph.in_degree().sum() == graph.num_citations
+
+        paper = Paper.fetch(where_dict={'doi': '10.1089/ars.2017.7361'})
+        assert graph.out_degree(paper.idpaper) == 177
+        assert sorted(graph.cited(paper.idpaper).tolist()) == sorted(
+            cited.idpaper for cited in paper.cited_papers)
+        paper = Paper.fetch(where_dict={'doi': '10.1016/j.ijhydene.2016.06.178'})
+        assert len(graph.citing(paper.idpaper)) == 5
@@ -0,0 +1,67 @@
+"""
+Unit tests for connection_pool.py
+"""
+
+# pylint: disable=unused-variable, missing-docstring, no-member, protected-access
+
+import logging
+import threading
+
+import pytest
+import MySQLdb
+
+from bibliom.connection_pool import ConnectionPool
+from bibliom import exceptions
+
+@pytest.mark.usefixtures('class_manager')
+class TestConnectionPool():
+    """
+    Tests for ConnectionPool class.
+    """
+    def test_acquire_release(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestConnectionPool.test_acquire_release')
+        with pytest.raises(ValueError):
+            ConnectionPool(self.manager._new_connection, min_size=3, max_size=2)
+        pool = ConnectionPool(
+            self.manager._new_connection, min_size=1, max_size=2, timeout=0.1)
+        assert len(pool) == 1
+        assert pool.idle == 1
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first is not second
+        assert len(pool) == 2
+        with pytest.raises(exceptions.PoolTimeoutError):
+            pool.acquire()
+        assert pool.acquire(block=False) is None
+        pool.release(second)
+        assert pool.acquire() is second
+
+        pool.release(first)
+        first.close()
+        third = pool.acquire()
+        assert third is not first
+        assert pool.stats['discarded'] == 1
+        cursor = third.cursor()
+        cursor.execute("SELECT 1")
+        assert cursor.fetchone() == (1,)
+
+        pool.release(third)
+        releaser = threading.Timer(0.05, pool.release, (second,))
+        releaser.start()
+        pool.close(timeout=5)
+        releaser.join()
+        assert len(pool) == 0
+        with pytest.raises(exceptions.BiblioException):
+            pool.acquire()
+
+    def test_close_checked_out(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestConnectionPool.test_close_checked_out')
+        pool = ConnectionPool(self.manager._new_connection, min_size=0, max_size=2)
+        connection = pool.acquire()
+        pool.close(timeout=0)
+        assert len(pool) == 0
+        with pytest.raises(MySQLdb.Error):
+            connection.cursor().execute("SELECT 1")
+        pool.release(connection)
+        assert len(pool) == 0
+        assert pool.stats['discarded'] == 0
@@ -9,7 +9,7 @@ import logging
 import pytest
 
 from bibliom.dbtable import DBTable
-from bibliom.dbentity import DBEntity
+from bibliom.dbentity import DBEntity, FieldDescriptor
 from bibliom import exceptions
 
 @pytest.mark.usefixtures('class_manager')
@@ -51,6 +51,26 @@ class TestDBEntity():
         assert entity7.title == 'Another Paper'
         assert entity7.table == paper_table
 
+    def test_pin_row(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_pin_row')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        entity = DBEntity(paper_table, title='A Paper')
+        assert paper_table.cache_stats['pinned'] == 1
+        old_row_key = entity.row_key
+        entity.save_to_db()
+        assert entity.row_key != old_row_key
+        assert paper_table.cache_stats['pinned'] == 1
+        paper_table.set_cache_limits(max_rows=0)
+        try:
+            row_key = entity.row_key
+            assert row_key in paper_table.rows
+            del entity
+            assert row_key not in paper_table.rows
+            assert paper_table.cache_stats['pinned'] == 0
+        finally:
+            paper_table.set_cache_limits()
+
     def test_repr(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_repr')
         self.manager.reset_database()
@@ -142,6 +162,15 @@ class TestDBEntity():
 
         assert DBEntity.fetch_entities(author_table, []) is None
 
+        class DeferredAuthor(DBEntity):
+            deferred_fields = ('given_names',)
+        author_table.rows = {}
+        author_table.row_status = {}
+        entities = DeferredAuthor.fetch_entities(author_table, {'given_names': ['1', '2']})
+        assert author_table.rows[entities[0].row_key]['given_names'] is None
+        assert author_table.rows[entities[1].row_key]['given_names'] is None
+        assert {entities[0].given_names, entities[1].given_names} == {'1', '2'}
+
     def test_fetch_entity(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_fetch_entity')
         self.manager.reset_database()
@@ -272,7 +301,7 @@ class TestDBEntity():
         paper_table.rows = {}
         new_entity = DBEntity.fetch(paper_table, {'title': 'A Paper'})
         assert new_entity.url == "http://mikethicke.com"
-        assert new_entity.row_key == 'idpaper' + DBTable.KEY_STR_DELIMITER + '1'
+        assert new_entity.row_key == (1,)
 
     def test_eq(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_eq')
@@ -303,3 +332,53 @@ class TestDBEntity():
         entity.protect_fields = False
         entity.title = 'Another Paper'
         assert entity.title == 'Another Paper'
+
+    def test_entity_class(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_entity_class')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        entity = DBEntity(paper_table, title='A Paper')
+        entity_class = type(entity)
+        assert entity_class is DBEntity.entity_class(paper_table)
+        assert entity_class.__bases__ == (DBEntity,)
+        assert isinstance(entity_class.__dict__['title'], FieldDescriptor)
+        assert type(DBEntity(paper_table)) is entity_class
+        with pytest.raises(AttributeError):
+            entity.not_a_field = 1
+
+        paper_table.rows[entity.row_key]['title'] = 'Changed'
+        assert entity.title == 'Changed'
+        entity.title = 'A Paper'
+        assert paper_table.rows[entity.row_key]['title'] == 'A Paper'
+
+        entity.save_to_db()
+        paper_table.rows = {}
+        paper_table.row_status = {}
+        entity.title = 'A Paper'
+        assert paper_table.row_status[entity.row_key] == DBTable.RowStatus.SYNCED
+        entity.title = 'Another Paper'
+        assert paper_table.row_status[entity.row_key] == DBTable.RowStatus.UNSYNCED
+        assert paper_table.dirty_fields(entity.row_key) == ('title',)
+
+    def test_identity_map(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBEntity.test_identity_map')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        entity = DBEntity(paper_table, title='A Paper', doi='10.1000/identity')
+        assert paper_table.entities[entity.row_key] is entity
+        entity.save_to_db()
+        assert paper_table.entities[entity.row_key] is entity
+        assert paper_table.cached_row_key({'idpaper': entity.idpaper}) == entity.row_key
+        assert DBEntity.fetch(paper_table, idpaper=entity.idpaper) is entity
+        assert DBEntity.fetch_entities(paper_table, idpaper=[entity.idpaper])[0] is entity
+        assert DBEntity.entity_from_row(paper_table, entity.row_key) is entity
+
+        assert paper_table.cached_row_key({'doi': '10.1000/identity'}) == entity.row_key
+        assert DBEntity.fetch(paper_table, doi='10.1000/identity') is entity
+        assert paper_table.cached_row_key({'doi': '10.1000/identity', 'title': 'B'}) is None
+        entity.doi = '10.1000/changed'
+        assert paper_table.cached_row_key({'doi': '10.1000/identity'}) is None
+
+        row_key = entity.row_key
+        del entity
+        assert row_key not in paper_table.entities
@@ -5,11 +5,13 @@ Unit tests for dbmanager.py
 # pylint: disable=unused-variable, missing-docstring, no-member, len-as-condition
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import MySQLdb
 import pytest
 
 from bibliom.dbmanager import DBManager
+from bibliom.dbtable import DBTable
 from bibliom import exceptions
 
 DB_NAME = 'test_db'
@@ -161,6 +163,36 @@ class TestDBManager():
             list
         )
 
+    def test_load_schema(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_load_schema')
+        self.manager.reset_database()
+        assert self.manager.schema is None
+        self.manager.table_structure('paper')
+        assert isinstance(self.manager.schema, dict)
+        query_count = self.manager.stats['metadata_queries']
+        for table_name in self.manager.list_tables():
+            self.manager.table_structure(table_name)
+            self.manager.primary_key_list(table_name)
+            self.manager.table_fields(table_name)
+            self.manager.foreign_key_list(table_name)
+        assert self.manager.stats['metadata_queries'] == query_count
+
+        assert self.manager.primary_key_list('citation') == ['source_id', 'target_id']
+        assert ['doi'] in self.manager.unique_key_list('paper')
+        assert ['wos_identifier'] in self.manager.unique_key_list('paper')
+        assert (['measure', 'classification'] in
+                self.manager.unique_key_list('modularity_class'))
+        assert self.manager.auto_increment_column('paper') == 'idpaper'
+        assert self.manager.auto_increment_column('citation') is None
+        assert {
+            'column_name': 'idjournal',
+            'referenced_table_name': 'journal',
+            'referenced_column_name': 'idjournal'
+        } in self.manager.foreign_key_list('paper')
+
+        self.manager.reset_database()
+        assert self.manager.schema is None
+
     def test_table_fields(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_table_fields')
         table_name = self.manager.list_tables()[0]
@@ -271,6 +303,33 @@ class TestDBManager():
             bad_row.append(rows)
             self.manager.insert_many_rows(table_name, bad_row)
 
+    def test_upsert_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_upsert_rows')
+        self.manager.reset_database()
+        table_name = 'journal'
+        rows = [
+            {'title': 'Journal %d' % i, 'issn': '0000-%04d' % i}
+            for i in range(0, 100)
+        ]
+        rows.append({'title': 'Journal Without ISSN'})
+        key_dicts = self.manager.upsert_rows(table_name, rows, chunk_size=30)
+        assert len(key_dicts) == 101
+        assert len({key_dict['idjournal'] for key_dict in key_dicts}) == 101
+
+        rows = [
+            {'title': 'New Journal %d' % i, 'issn': '0000-%04d' % i}
+            for i in range(50, 150)
+        ]
+        new_key_dicts = self.manager.upsert_rows(
+            table_name, rows, DBTable.Duplicates.OVERWRITE)
+        assert new_key_dicts[:50] == key_dicts[50:100]
+        assert len(self.manager.fetch_rows(table_name)) == 151
+        row = self.manager.fetch_row(table_name, {'issn': '0000-0060'})
+        assert row['title'] == 'New Journal 60'
+
+        with pytest.raises(TypeError):
+            self.manager.upsert_rows(table_name, ['Journal'])
+
     def test_update_rows(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_update_rows')
         table_name = 'author'
@@ -289,6 +348,31 @@ class TestDBManager():
         assert len(fetched_rows) == 100
         assert fetched_rows[0]['given_names'] == 'Mike'
 
+    def test_update_many_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_update_many_rows')
+        self.manager.reset_database()
+        table_name = 'author'
+        rows = [{'last_name': 'Numberer', 'given_names': str(i+1)} for i in range(0, 100)]
+        rows = self.manager.insert_many_rows(table_name, rows)
+        updated_rows = [
+            {'idauthor': row['idauthor'], 'given_names': 'Updated %d' % i, 'last_name': None}
+            for i, row in enumerate(rows[:60])
+        ]
+        changed = self.manager.update_many_rows(table_name, updated_rows, chunk_size=25)
+        assert changed == 60
+        fetched_rows = self.manager.fetch_rows(table_name, {'given_names': 'Updated 59'})
+        assert len(fetched_rows) == 1
+        assert fetched_rows[0]['last_name'] == 'Numberer'
+        assert fetched_rows[0]['idauthor'] == rows[59]['idauthor']
+        self.manager.update_many_rows(
+            table_name,
+            [{'idauthor': rows[0]['idauthor'], 'given_names': None}],
+            allow_none=True)
+        assert self.manager.fetch_row(
+            table_name, {'idauthor': rows[0]['idauthor']})['given_names'] is None
+        with pytest.raises(TypeError):
+            self.manager.update_many_rows(table_name, ['Updated'])
+
     def test_fetch_row(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_fetch_row')
 
@@ -352,9 +436,38 @@ class TestDBManager():
         assert rows2 == rows
         for row in rows:
             assert isinstance(row, dict)
+        rows3 = self.manager.fetch_rows(
+            table_name, given_names='%Mich%', columns=['idauthor', 'orcid'])
+        assert [set(row.keys()) for row in rows3] == [{'idauthor', 'orcid'}] * 2
+        key_rows = self.manager.fetch_rows_by_key(
+            table_name, [(row['idauthor'],) for row in rows3], columns=['last_name'], chunk_size=1)
+        assert sorted(row['last_name'] for row in key_rows) == ['Thicke', 'Thïcké']
+        assert set(key_rows[0].keys()) == {'idauthor', 'last_name'}
         with pytest.raises(MySQLdb.OperationalError): #should this raise a ValueError instead?
             rows = self.manager.fetch_rows(table_name, {'llast_name': 'Thicke'})
 
+    def test_iter_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_iter_rows')
+        self.manager.reset_database()
+        self.manager.insert_many_rows('author', [
+            {'last_name': 'Author', 'given_names': str(i)} for i in range(25)])
+        rows = list(self.manager.iter_rows('author', batch_size=10))
+        assert len(rows) == 25
+        assert isinstance(rows[0], dict)
+        batches = list(self.manager.iter_rows(
+            'author', {'last_name': 'Author'}, columns=['idauthor'], batch_size=10, batches=True))
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert set(batches[0][0].keys()) == {'idauthor'}
+
+        # Other queries can run while streaming, and stopping early releases
+        # the streaming connection.
+        in_use = len(self.manager.pool) - self.manager.pool.idle
+        for row in self.manager.iter_rows('author', batch_size=5):
+            self.manager.update_rows('author', {'given_names': 'Changed'}, {'idauthor': row['idauthor']})
+            break
+        assert self.manager.fetch_row('author', {'given_names': 'Changed'}) is not None
+        assert len(self.manager.pool) - self.manager.pool.idle == in_use
+
     def test_delete_rows(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_delete_rows')
         self.manager.reset_database()
@@ -377,6 +490,20 @@ class TestDBManager():
             where_dict={'last_name': 'Numberer'})
         assert not success
 
+    def test_delete_many_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_delete_many_rows')
+        self.manager.reset_database()
+        self.manager.insert_many_rows('paper', [{'title': 'Paper %d' % i} for i in range(3)])
+        idpapers = [row['idpaper'] for row in self.manager.fetch_rows('paper')]
+        rows = [{'source_id': idpapers[0], 'target_id': idpapers[1]},
+                {'source_id': idpapers[0], 'target_id': idpapers[2]},
+                {'source_id': idpapers[1], 'target_id': idpapers[2]}]
+        self.manager.insert_many_rows('citation', rows)
+        deleted = self.manager.delete_many_rows('citation', rows[:2], chunk_size=1)
+        assert deleted == 2
+        fetched_rows = self.manager.fetch_rows('citation', {'source_id': 'IS NOT NULL'})
+        assert fetched_rows == [rows[2]]
+
     def test_import_dict(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_import_dict')
         self.manager.reset_database()
@@ -410,6 +537,52 @@ class TestDBManager():
         authors = self.manager.fetch_rows('author')
         assert len(authors) == 0
 
+    def test_transaction(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_transaction')
+        self.manager.reset_database()
+        commits = self.manager.stats['commits']
+        with self.manager.transaction():
+            assert self.manager.in_transaction
+            self.manager.insert_row('author', {'last_name': 'Thicke'})
+            self.manager.insert_many_rows('author', [
+                {'last_name': 'Author%s' % i} for i in range(10)])
+            with pytest.raises(ValueError):
+                with self.manager.transaction():
+                    self.manager.delete_rows('author', {'last_name': 'Thicke'})
+                    assert not self.manager.fetch_rows('author', {'last_name': 'Thicke'})
+                    raise ValueError
+            assert len(self.manager.fetch_rows('author', {'last_name': 'Thicke'})) == 1
+        assert not self.manager.in_transaction
+        assert self.manager.stats['commits'] == commits + 1
+        assert len(self.manager.fetch_rows('author')) == 11
+
+        with pytest.raises(KeyError):
+            with self.manager.transaction():
+                self.manager.update_rows('author', {'given_names': 'Mike'}, {'last_name': 'Thicke'})
+                raise KeyError
+        assert self.manager.fetch_row('author', {'last_name': 'Thicke'})['given_names'] is None
+
+    def test_threads(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_threads')
+        self.manager.reset_database()
+        main_connection = self.manager.db
+
+        def insert_and_fetch(i):
+            connection = self.manager.db
+            self.manager.insert_many_rows('author', [
+                {'last_name': 'Thread%s' % i, 'given_names': str(j)} for j in range(10)])
+            rows = self.manager.fetch_rows('author', {'last_name': 'Thread%s' % i})
+            self.manager.release_connection()
+            return connection, len(rows)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(insert_and_fetch, range(8)))
+        assert [count for _, count in results] == [10] * 8
+        assert main_connection not in [connection for connection, _ in results]
+        assert len(self.manager.pool) <= self.manager.pool_max_size
+        assert self.manager.db is main_connection
+        assert len(self.manager.fetch_rows('author')) == 80
+
     def test_get_default_manager(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBManager.test_get_default_manager')
         self.manager.reset_database()
@@ -91,6 +91,32 @@ class TestDBTable:
             key_str = 'pkey1.1'
             key_dict = DBTable.key_to_dict(key_str)
 
+    def test_make_key(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_make_key')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        assert paper_table.key_columns == ('idpaper',)
+        assert paper_table.make_key((1,)) == (1,)
+        assert paper_table.make_key({'idpaper': 1}) == (1,)
+        assert paper_table.make_key('idpaper%%1') == (1,)
+        assert paper_table.make_key(1) == (1,)
+        assert paper_table.key_dict('idpaper%%1') == {'idpaper': 1}
+        assert paper_table.row_key_of({'idpaper': 1, 'title': 'A Paper'}) == (1,)
+        new_key = paper_table.create_new_row()
+        assert DBTable.is_new_key(new_key)
+        assert paper_table.make_key(DBTable.dict_to_key({DBTable.NEW_ID_PREFIX: new_key[1]})) == new_key
+        assert not DBTable.is_new_key((1,))
+        with pytest.raises(ValueError):
+            paper_table.make_key('idpaper1')
+        with pytest.raises(ValueError):
+            paper_table.make_key({'title': 'A Paper'})
+
+        citation_table = DBTable.get_table_object('citation', self.manager)
+        assert citation_table.make_key('target_id%%source_id%%2%%1') == (1, 2)
+        assert citation_table.key_dict((1, 2)) == {'source_id': 1, 'target_id': 2}
+        with pytest.raises(TypeError):
+            citation_table.make_key(1)
+
     def test_table_structure(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_table_structure')
         table = DBTable.get_table_object( 'paper', self.manager)
@@ -213,6 +239,68 @@ class TestDBTable:
         citation_table.insert_row(citation_rows[4])     # duplicate citation (should have
                                                         # no effect)
 
+    def test_upsert_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_upsert_rows')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        row_keys = paper_table.upsert_rows([
+            {
+                'title':    'A Paper',
+                'url':      "http://mikethicke.com",
+                'idpaper':  1
+            },
+            {
+                'title':    'Another Paper',
+                'doi':      '10.1038/nature16193'
+            },
+            {
+                'title':    'A Paper Without Keys'
+            }
+        ])
+        assert len(row_keys) == 3
+        assert row_keys[0] == (1,)
+        assert paper_table.get_row_by_key(row_keys[1])['doi'] == '10.1038/nature16193'
+        assert paper_table.get_row_by_key(row_keys[2])['title'] == 'A Paper Without Keys'
+
+        duplicate_rows = [
+            {
+                'title':    'A Duplicate Paper',
+                'abstract': "A duplicate paper's abstract",
+                'idpaper':  1
+            },
+            {
+                'title':    'Another Duplicate Paper',
+                'doi':      '10.1038/NATURE16193'
+            }
+        ]
+        new_keys = paper_table.upsert_rows(duplicate_rows, paper_table.Duplicates.SKIP)
+        assert new_keys == row_keys[:2]
+        assert paper_table.get_row_by_key(row_keys[0])['title'] == 'A Paper'
+        assert paper_table.get_row_by_key(row_keys[1])['title'] == 'Another Paper'
+
+        paper_table.upsert_rows(duplicate_rows, paper_table.Duplicates.INSERT)
+        row = paper_table.get_row_by_key(row_keys[0])
+        assert row['title'] == 'A Paper'
+        assert row['abstract'] == "A duplicate paper's abstract"
+
+        paper_table.upsert_rows(duplicate_rows, paper_table.Duplicates.OVERWRITE)
+        row = paper_table.get_row_by_key(row_keys[0])
+        assert row['title'] == 'A Duplicate Paper'
+        assert row['url'] == "http://mikethicke.com"
+
+        paper_table.upsert_rows(duplicate_rows, paper_table.Duplicates.REPLACE)
+        row = paper_table.get_row_by_key(row_keys[0])
+        assert row['title'] == 'A Duplicate Paper'
+        assert row['url'] is None
+
+        citation_table = DBTable.get_table_object('citation', self.manager)
+        citation_keys = citation_table.upsert_rows([
+            {'source_id': 1, 'target_id': 2},
+            {'source_id': 1, 'target_id': 2}
+        ])
+        assert citation_keys[0] == citation_keys[1]
+        assert len(citation_table.fetch_rows({'source_id': 1})) == 1
+
     def test_create_new_row(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_create_new_row')
         self.manager.reset_database()
@@ -277,7 +365,7 @@ class TestDBTable:
         )
         row = author_table.get_row_by_key(row_key)
         assert row['given_names'] == 'Num'
-        del author_table.rows[row_key]
+        del author_table.rows[author_table.make_key(row_key)]
         row = author_table.get_row_by_key(row_key)
         assert row['given_names'] == 'Num'
         row_key = (
@@ -308,6 +396,48 @@ class TestDBTable:
         row = author_table.get_row_by_primary_key(2)
         assert row is None
 
+    def test_row_cache(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_row_cache')
+        self.manager.reset_database()
+        author_table = DBTable.get_table_object('author', self.manager)
+        for i in range(1, 6):
+            author_table.insert_row({
+                'last_name':    'Cached',
+                'given_names':  'Author %d' % i,
+                'idauthor':      i
+            })
+        author_table.rows = {}
+        author_table.row_status = {}
+        author_table.reset_cache_stats()
+        try:
+            author_table.set_cache_limits(max_rows=3)
+            row_keys = [(i,) for i in range(1, 6)]
+            for row_key in row_keys[:3]:
+                author_table.get_row_by_key(row_key)
+            author_table.get_row_by_key(row_keys[0])
+            author_table.pin_row(row_keys[1])
+            new_key = author_table.create_new_row({'last_name': 'New'})
+            author_table.get_row_by_key(row_keys[3])
+            assert len(author_table.rows) == 3
+            assert set(author_table.rows.keys()) == {row_keys[1], row_keys[3], new_key}
+            stats = author_table.cache_stats
+            assert stats['hits'] == 1
+            assert stats['misses'] == 4
+            assert stats['evictions'] == 2
+            assert stats['pinned'] == 1
+
+            author_table.unpin_row(row_keys[1])
+            author_table.get_row_by_key(row_keys[4])
+            assert row_keys[1] not in author_table.rows
+            assert new_key in author_table.rows
+
+            author_table.set_cache_limits(max_bytes=0)
+            assert list(author_table.rows.keys()) == [new_key]
+            with pytest.raises(ValueError):
+                author_table.set_cache_limits(max_rows=-1)
+        finally:
+            author_table.set_cache_limits()
+
     def test_delete_rows(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_delete_rows')
         self.manager.reset_database()
@@ -404,10 +534,12 @@ class TestDBTable:
                 'last_name':    'Numberer',
                 'given_names':  str(i+1)
             })
-        author_table.sync_to_db()
+        summary = author_table.sync_to_db(chunk_size=30)
+        assert len(summary['inserted']) == 100
+        assert len(author_table.rows) == 100
         for row_key in author_table.rows.keys():
             assert author_table.row_status[row_key] == author_table.RowStatus.SYNCED
-            assert row_key.startswith('idauthor')
+            assert not DBTable.is_new_key(row_key)
 
         for row_key in author_table.rows.keys():
             author_table.set_field(
@@ -417,10 +549,161 @@ class TestDBTable:
             )
         for row_key in author_table.rows.keys():
             assert author_table.row_status[row_key] == author_table.RowStatus.UNSYNCED
-        author_table.sync_to_db()
+        row_keys = list(author_table.rows.keys())
+        author_table.row_status[row_keys[0]] = author_table.RowStatus.DELETED
+        summary = author_table.sync_to_db()
+        assert summary['updated'] == row_keys[1:]
+        assert summary['deleted'] == row_keys[:1]
+        assert row_keys[0] not in author_table.rows
         for row_key, row_value in author_table.rows.items():
             assert author_table.row_status[row_key] == author_table.RowStatus.SYNCED
             assert row_value['last_name'] == 'Newname'
+        assert len(author_table.fetch_rows({'last_name': 'Newname'})) == 99
+
+    def test_lookup(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_lookup')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        assert 'doi' in paper_table.unique_columns
+        row_key = paper_table.insert_row({'title': 'A Paper', 'doi': '10.1000/lookup'})
+        assert paper_table.lookup('doi', '10.1000/lookup') == row_key
+        assert paper_table.lookup('doi', '10.1000/missing') is None
+        with pytest.raises(ValueError):
+            paper_table.lookup('title', 'A Paper')
+
+        assert paper_table.insert_row({'title': 'Duplicate', 'doi': '10.1000/lookup'}) == row_key
+        new_key = paper_table.create_new_row({'title': 'Duplicate', 'doi': '10.1000/lookup'})
+        summary = paper_table.sync_to_db()
+        assert summary['inserted'] == {new_key: row_key}
+        assert new_key not in paper_table.rows
+        assert paper_table.get_row_by_key(row_key)['title'] == 'A Paper'
+
+        paper_table.set_field(row_key, 'doi', '10.1000/changed')
+        assert paper_table.lookup('doi', '10.1000/lookup') is None
+        assert paper_table.lookup('doi', '10.1000/changed') == row_key
+        paper_table.delete_row(row_key)
+        assert paper_table.lookup('doi', '10.1000/changed') is None
+
+    def test_dirty_fields(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_dirty_fields')
+        self.manager.reset_database()
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        row_key = paper_table.insert_row({
+            'title':    'A Paper',
+            'content':  'Full record text',
+            'idpaper':  1
+        })
+        paper_table.set_field(row_key, 'title', 'A Paper')
+        assert paper_table.row_status[row_key] == paper_table.RowStatus.SYNCED
+        assert paper_table.dirty_fields(row_key) == ()
+        paper_table.set_field(row_key, 'abstract', 'An abstract')
+        paper_table.set_field(row_key, 'content', None)
+        assert set(paper_table.dirty_fields(row_key)) == {'abstract', 'content'}
+
+        self.manager.update_rows('paper', {'title': 'Changed Elsewhere'}, {'idpaper': 1})
+        summary = paper_table.sync_to_db()
+        assert summary['updated'] == [row_key]
+        assert paper_table.dirty_fields(row_key) == ()
+        row = self.manager.fetch_row('paper', {'idpaper': 1})
+        assert row['title'] == 'Changed Elsewhere'
+        assert row['abstract'] == 'An abstract'
+        assert row['content'] is None
+
+    def test_deferred_fields(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_deferred_fields')
+        self.manager.reset_database()
+        self.manager.insert_many_rows('paper', [
+            {'title': 'Paper %d' % i, 'content': 'Content %d' % i} for i in range(1, 4)])
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        rows = paper_table.fetch_rows({'title': 'Paper%'}, columns=['title'])
+        assert len(rows) == 3
+        row_keys = sorted(rows.keys())
+        assert set(rows[row_keys[0]].keys()) == {'idpaper', 'title'}
+        assert paper_table.rows[row_keys[0]]['content'] is None
+
+        # Deferred fields of pinned rows are loaded in the same query.
+        paper_table.pin_row(row_keys[1])
+        assert paper_table.get_field(row_keys[0], 'content') == 'Content 1'
+        assert paper_table.rows[row_keys[1]]['content'] == 'Content 2'
+        assert paper_table.rows[row_keys[2]]['content'] is None
+        paper_table.unpin_row(row_keys[1])
+
+        paper_table.set_field(row_keys[2], 'content', 'Changed')
+        paper_table.load_fields(row_keys)
+        assert paper_table.rows[row_keys[2]]['content'] == 'Changed'
+        assert paper_table.rows.unloaded_fields(row_keys[2]) == ()
+        assert paper_table.get_row_by_key(row_keys[2])['title'] == 'Paper 3'
+
+    def test_fetch_keeps_changes(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_fetch_keeps_changes')
+        self.manager.reset_database()
+        self.manager.insert_row('paper', {'idpaper': 1, 'title': 'A Paper', 'doi': '10.1000/1'})
+        paper_table = DBTable.get_table_object('paper', self.manager)
+        row_key = paper_table.row_key_of({'idpaper': 1})
+        paper_table.fetch_rows({'idpaper': 1})
+        paper_table.set_field(row_key, 'title', 'Changed')
+        self.manager.update_rows('paper', {'doi': '10.1000/changed'}, {'idpaper': 1})
+
+        rows = paper_table.fetch_rows({'idpaper': 1}, columns=['doi'])
+        assert rows[row_key]['doi'] == '10.1000/changed'
+        assert paper_table.rows[row_key]['title'] == 'Changed'
+        assert paper_table.dirty_fields(row_key) == ('title',)
+        assert paper_table.row_status[row_key] == paper_table.RowStatus.UNSYNCED
+        paper_table.fetch_rows({'idpaper': 1})
+        assert paper_table.rows[row_key]['title'] == 'Changed'
+        assert paper_table.row_status[row_key] == paper_table.RowStatus.UNSYNCED
+
+        paper_table.sync_to_db()
+        row = self.manager.fetch_row('paper', {'idpaper': 1})
+        assert row['title'] == 'Changed'
+        assert row['doi'] == '10.1000/changed'
+
+    def test_iter_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_iter_rows')
+        self.manager.reset_database()
+        self.manager.insert_many_rows(
+            'paper', [{'idpaper': i, 'title': 'Paper %d' % i} for i in range(1, 11)])
+        self.manager.insert_many_rows(
+            'citation',
+            [{'source_id': source, 'target_id': target}
+             for source in range(1, 11) for target in range(1, source)])
+        citation_table = DBTable('citation', self.manager)
+        citation_count = self.manager.table_row_count('citation')
+        row_keys = set()
+        for row_key, row in citation_table.iter_rows(batch_size=10):
+            assert row_key == (row['source_id'], row['target_id'])
+            row_keys.add(row_key)
+        assert len(row_keys) == citation_count
+        assert len(citation_table.rows) == 0
+
+        rows = list(citation_table.iter_rows({'source_id': 5}, cache=True))
+        assert len(rows) == 4
+        assert len(citation_table.rows) == len(rows)
+        assert citation_table.row_status[rows[0][0]] == DBTable.RowStatus.SYNCED
+
+    def test_sync_to_db_rollback(self, monkeypatch):
+        logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_sync_to_db_rollback')
+        self.manager.reset_database()
+        self.manager.insert_row('author', {'idauthor': 1, 'last_name': 'Old'})
+        author_table = DBTable('author', self.manager)
+        author_table.fetch_rows({'idauthor': 1})
+        author_table.set_field((1,), 'last_name', 'Changed')
+        new_key = author_table.create_new_row({'last_name': 'New'})
+        def fail(*args, **kwargs):
+            raise MySQLdb.OperationalError('Update failed.')
+        monkeypatch.setattr(self.manager, 'update_many_rows', fail)
+        with pytest.raises(MySQLdb.OperationalError):
+            author_table.sync_to_db()
+        assert self.manager.table_row_count('author') == 1
+        assert author_table.row_status[new_key] == author_table.RowStatus.NEW
+        assert author_table.row_status[(1,)] == author_table.RowStatus.UNSYNCED
+        assert author_table.dirty_fields((1,)) == ('last_name',)
+
+        monkeypatch.undo()
+        summary = author_table.sync_to_db()
+        assert new_key in summary['inserted']
+        assert summary['updated'] == [(1,)]
+        assert self.manager.fetch_row('author', {'idauthor': 1})['last_name'] == 'Changed'
 
     def test_sync_tables_to_db(self):
         logging.getLogger('bibliom.pytest').debug('-->TestDBTable.test_sync_tables_to_db')
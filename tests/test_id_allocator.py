@@ -0,0 +1,77 @@
+"""
+Unit tests for id_allocator.py
+"""
+
+# pylint: disable=unused-variable, missing-docstring, no-member
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bibliom.id_allocator import IdAllocator
+from bibliom import exceptions
+
+@pytest.mark.usefixtures('class_manager')
+class TestIdAllocator():
+    """
+    Tests for IdAllocator class and DBManager.reserve_ids.
+    """
+    def test_reserve_ids(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestIdAllocator.test_reserve_ids')
+        self.manager.reset_database()
+        self.manager.insert_row('author', {'last_name': 'Thicke'})
+        max_id = self.manager.fetch_row('author', {'last_name': 'Thicke'})['idauthor']
+        first_id = self.manager.reserve_ids('author', 10)
+        assert first_id > max_id
+        assert self.manager.reserve_ids('author', 1) == first_id + 10
+        with pytest.raises(exceptions.BiblioException):
+            self.manager.reserve_ids('citation', 1)
+
+        rows = [{'last_name': 'Author%s' % i} for i in range(5)]
+        self.manager.insert_many_rows('author', rows)
+        ids = [row['idauthor'] for row in rows]
+        assert ids == list(range(first_id + 11, first_id + 16))
+        fetched = self.manager.fetch_rows('author', {'last_name': 'Author%'})
+        assert sorted(row['idauthor'] for row in fetched) == ids
+
+    def test_reserve_ids_connection(self):
+        logging.getLogger('bibliom.pytest').debug(
+            '-->TestIdAllocator.test_reserve_ids_connection')
+        self.manager.reset_database()
+        self.manager._run_sql(['DROP TABLE id_sequence'])
+        self.manager.invalidate_schema()
+        with self.manager.transaction():
+            first_id = self.manager.reserve_ids('paper', 3)
+        assert 'id_sequence' in self.manager.list_tables()
+
+        # Ids are reserved on the thread's own connection, with its transaction.
+        checkouts = self.manager.pool.stats['checkouts']
+        with self.manager.transaction():
+            assert self.manager.reserve_ids('paper', 2) == first_id + 3
+            self.manager.insert_many_rows(
+                'paper', [{'idpaper': row_id, 'title': 'Reserved'}
+                          for row_id in range(first_id, first_id + 5)])
+        assert self.manager.pool.stats['checkouts'] == checkouts
+
+        # Single rows are inserted by AUTO_INCREMENT, after the loaded ids.
+        idpaper = self.manager.insert_row('paper', {'title': 'Inserted'})
+        assert idpaper >= first_id + 5
+        assert self.manager.reserve_ids('paper', 1) > idpaper
+
+    def test_next_id(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestIdAllocator.test_next_id')
+        self.manager.reset_database()
+        allocators = [IdAllocator(self.manager, block_size=7) for _ in range(4)]
+
+        def allocate(allocator):
+            return [allocator.next_id('paper') for _ in range(50)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            id_lists = list(executor.map(allocate, allocators))
+        ids = [row_id for id_list in id_lists for row_id in id_list]
+        assert len(set(ids)) == 200
+
+        first_id = allocators[0].reserve('paper', 3)
+        assert first_id not in ids
+        assert first_id + 2 not in ids
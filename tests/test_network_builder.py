@@ -0,0 +1,76 @@
+"""
+Unit tests for network_builder.py
+"""
+
+# pylint: disable=unused-variable, missing-docstring, no-member, len-as-condition
+
+import logging
+
+import pytest
+import MySQLdb
+
+from bibliom.citation_graph import CitationGraph
+from bibliom import network_builder
+
+def edge_set(graph, measure, min_weight=1, chunk_size=None):
+    return {edge
+            for (sources, targets, weights)
+            in network_builder.iter_edges(graph, measure, min_weight, chunk_size)
+            for edge in zip(sources.tolist(), targets.tolist(), weights.tolist())}
+
+class TestNetworkBuilder:
+    """
+    Tests for network_builder module.
+    """
+    # 1, 2 and 3 cite 5. 1 and 3 cite 6. 4 cites 1.
+    SOURCES = [1, 2, 3, 1, 3, 4]
+    TARGETS = [5, 5, 5, 6, 6, 1]
+
+    def test_coupling(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestNetworkBuilder.test_coupling')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS)
+        expected = {(1, 2, 1), (1, 3, 2), (2, 3, 1)}
+        assert edge_set(graph, network_builder.COUPLING) == expected
+        assert edge_set(graph, network_builder.COUPLING, chunk_size=1) == expected
+        assert edge_set(graph, network_builder.COUPLING, min_weight=2) == {(1, 3, 2)}
+        assert edge_set(graph, network_builder.COUPLING, min_weight=3) == set()
+
+    def test_cocitation(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestNetworkBuilder.test_cocitation')
+        graph = CitationGraph.from_edges(self.SOURCES, self.TARGETS)
+        expected = {(5, 6, 2)}
+        assert edge_set(graph, network_builder.COCITATION) == expected
+        assert edge_set(graph, network_builder.COCITATION, chunk_size=1) == expected
+        with pytest.raises(ValueError):
+            edge_set(graph, 'citation')
+
+    @pytest.mark.usefixtures('class_manager')
+    def test_build_network(self, import_small_database, monkeypatch):
+        logging.getLogger('bibliom.pytest').debug('-->TestNetworkBuilder.test_build_network')
+        graph = CitationGraph.from_db(self.manager)
+        expected = edge_set(graph, network_builder.COCITATION, min_weight=2)
+        loaded = network_builder.build_network(
+            self.manager, 'cocitation-2', network_builder.COCITATION,
+            min_weight=2, graph=graph, chunk_size=1000)
+        assert loaded == len(expected)
+        network = self.manager.fetch_row('network', {'network_key': 'cocitation-2'})
+        assert network['label'] == 'Co-citation'
+        assert not network['directed']
+        rows = self.manager.fetch_rows('network_edges', {'network_key': 'cocitation-2'})
+        assert {(row['source'], row['target'], row['weight']) for row in rows} == expected
+
+        loaded = network_builder.build_network(
+            self.manager, 'cocitation-2', network_builder.COCITATION, min_weight=3)
+        assert self.manager.table_row_count('network_edges') == loaded
+        assert [row['network_key'] for row in self.manager.fetch_rows('network')] == [
+            'cocitation-2']
+
+        def fail(*args, **kwargs):
+            raise MySQLdb.OperationalError('Load failed.')
+        monkeypatch.setattr(self.manager, 'load_data_infile', fail)
+        with pytest.raises(MySQLdb.OperationalError):
+            network_builder.build_network(
+                self.manager, 'cocitation-2', network_builder.COCITATION)
+        assert self.manager.table_row_count('network_edges') == loaded
+        assert [row['network_key'] for row in self.manager.fetch_rows('network')] == [
+            'cocitation-2']
@@ -11,6 +11,7 @@ from bibliom import parser_db_adapter
 from bibliom.parsers import Parser, WOKParser, WCHParser
 from bibliom.dbtable import DBTable
 from bibliom import publication_objects
+from bibliom import exceptions
 
 @pytest.mark.usefixtures('file_paths')
 @pytest.mark.usefixtures('class_manager')
@@ -35,6 +36,89 @@ class TestParserDBAdapter():
         )
         assert len(papers) == 500
 
+    def test_wok_records_to_db(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestParserDBAdapter.test_wok_records_to_db')
+        self.manager.reset_database()
+        parser = Parser.get_parser_for_file(self.file_paths['WOK']['file'])
+        parser.parse_file()
+        record_count = parser_db_adapter.wok_records_to_db(
+            iter(parser.parsed_list),
+            self.manager,
+            duplicates=DBTable.Duplicates.INSERT,
+            chunk_size=128
+        )
+        assert record_count == 500
+        papers = publication_objects.Paper.fetch_entities(
+            table=DBTable.get_table_object('paper', self.manager),
+            where_dict={'title': 'NOT NULL'}
+        )
+        assert len(papers) == 500
+        journal_rows = self.manager.fetch_rows('journal', issn='IS NOT NULL')
+        issns = [row['issn'] for row in journal_rows]
+        assert len(issns) == len(set(issns))
+        paper = publication_objects.Paper.fetch(
+            where_dict={'doi': '10.1089/ars.2017.7361'}
+        )
+        assert len(paper.authors) == 2
+        assert len(paper.cited_papers) == 177
+
+        # Importing the same records again doesn't create duplicate papers
+        parser_db_adapter.wok_records_to_db(parser.parsed_list, self.manager, chunk_size=128)
+        papers = publication_objects.Paper.fetch_entities(
+            table=DBTable.get_table_object('paper', self.manager),
+            where_dict={'title': 'NOT NULL'}
+        )
+        assert len(papers) == 500
+
+    def test_wok_records_to_db_cited_later(self):
+        logging.getLogger('bibliom.pytest').debug(
+            '-->TestParserDBAdapter.test_wok_records_to_db_cited_later')
+        self.manager.reset_database()
+        records = [
+            {
+                'DOI':                  '10.1000/citing',
+                'Document Title':       'Citing Paper',
+                'Cited References':     ['Doe J, 2001, J TEST, DOI 10.1000/cited']
+            },
+            {
+                'DOI':                  '10.1000/cited',
+                'Document Title':       'Cited Paper',
+                'Abstract':             'An abstract.'
+            }
+        ]
+        parser_db_adapter.wok_records_to_db(records, self.manager, chunk_size=1)
+        cited = self.manager.fetch_row('paper', {'doi': '10.1000/cited'})
+        assert cited['title'] == 'Cited Paper'
+        assert cited['abstract'] == 'An abstract.'
+        citing = self.manager.fetch_row('paper', {'doi': '10.1000/citing'})
+        citations = self.manager.fetch_rows('citation', {'source_id': citing['idpaper']})
+        assert [row['target_id'] for row in citations] == [cited['idpaper']]
+
+    def test_wok_records_to_db_bulk(self):
+        logging.getLogger('bibliom.pytest').debug(
+            '-->TestParserDBAdapter.test_wok_records_to_db_bulk')
+        self.manager.reset_database()
+        parser = Parser.get_parser_for_file(self.file_paths['WOK']['file'])
+        parser.parse_file()
+        parser_db_adapter.parsed_records_to_db(parser, self.manager, bulk=True)
+        papers = publication_objects.Paper.fetch_entities(
+            table=DBTable.get_table_object('paper', self.manager),
+            where_dict={'title': 'NOT NULL'}
+        )
+        assert len(papers) == 500
+        paper = publication_objects.Paper.fetch(
+            where_dict={'doi': '10.1089/ars.2017.7361'}
+        )
+        assert len(paper.authors) == 2
+        assert len(paper.cited_papers) == 177
+
+        # Bulk loading requires empty tables.
+        with pytest.raises(exceptions.BiblioException):
+            parser_db_adapter.parsed_records_to_db(parser, self.manager, bulk=True)
+        wch_parser = Parser.get_parser_for_file(self.file_paths['WCH']['file'])
+        with pytest.raises(ValueError):
+            parser_db_adapter.parsed_records_to_db(wch_parser, self.manager, bulk=True)
+
     def test_wch_to_db(self):
         logging.getLogger('bibliom.pytest').debug('-->TestParserDBAdapter.test_wch_to_db')
         self.manager.reset_database()
@@ -6,8 +6,10 @@ Unit tests for parsers.py
 
 import logging
 
+import numpy
 import pytest
 
+from bibliom import parsers
 from bibliom.parsers import Parser, WOKParser, WCHParser
 from bibliom import exceptions
 
@@ -71,6 +73,41 @@ class TestParser():
         with pytest.raises(FileNotFoundError):
             parser = Parser.get_parser_for_file('not-a-file-path')
 
+    def test_sniff_file(self, tmpdir):
+        logging.getLogger('bibliom.pytest').debug('-->TestParser.test_sniff_file')
+        parsers.clear_sniff_cache()
+        sniff = parsers.sniff_file(self.file_paths['WOK']['file'])
+        assert sniff['encoding']
+        assert sniff['formats']['WOK']
+        assert not sniff['formats']['WCH']
+        assert parsers.sniff_file(self.file_paths['WOK']['file']) is sniff
+        assert parsers.sniff_file(self.file_paths['WOK']['file'], sniff['encoding']) is sniff
+
+        parser = Parser.get_parser_for_file(self.file_paths['WOK']['file'])
+        assert parser.encoding == sniff['encoding']
+
+        sniff = parsers.sniff_file(self.file_paths['junk']['file'])
+        assert not any(sniff['formats'].values())
+
+        # Cached result is not used after file changes
+        file_path = str(tmpdir.join('records.txt'))
+        with open(file_path, 'w') as f:
+            f.write(self.test_data['junk'])
+        assert not parsers.sniff_file(file_path)['formats']['WOK']
+        with open(file_path, 'w') as f:
+            f.write(self.test_data['WOK'].strip())
+        assert parsers.sniff_file(file_path)['formats']['WOK']
+
+        # Cache is bounded
+        parsers.clear_sniff_cache()
+        for i in range(parsers.SNIFF_CACHE_SIZE + 1):
+            file_path = str(tmpdir.join('records-%d.txt' % i))
+            with open(file_path, 'w') as f:
+                f.write(self.test_data['WOK'].strip())
+            parsers.sniff_file(file_path)
+        assert len(parsers._sniff_cache) == parsers.SNIFF_CACHE_SIZE
+        parsers.clear_sniff_cache()
+
     def test_get_parser_for_directory(self):
         logging.getLogger('bibliom.pytest').debug('-->TestParser.test_get_parser_for_directory')
 
@@ -113,6 +150,29 @@ class TestWOKParser():
         parser.parse_content_item(self.test_data['WOK'])
         assert parser.parsed_dict['id-0']['DOI'] == '10.1021/ja402927u'
 
+        parser = WOKParser()
+        parser.parse_content_item(
+            'PT J\n'
+            'TI A Title\n'
+            '   Continued\n'
+            'AB First paragraph.\n'
+            '   \n'
+            '   Second paragraph.\n'
+            'ID Alpha; Beta ;Gamma\n'
+            'CR Ref One\n'
+            '   Ref Two\n'
+            'ZZ\n'
+            'ER'
+        )
+        record_dict = parser.parsed_list[0]
+        assert record_dict['Document Title'] == 'A Title Continued'
+        assert record_dict['Abstract'] == 'First paragraph.\n\nSecond paragraph.'
+        assert record_dict['Keywords'] == ['Alpha', 'Beta', 'Gamma']
+        assert record_dict['Cited References'] == ['Ref One', 'Ref Two']
+        assert record_dict['CR'] == 'Ref One;Ref Two'
+        assert record_dict['ZZ'] == ''
+        assert 'End of Record' not in record_dict
+
     def test_is_parsable_file(self):
         logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_is_parsable_file')
         parser = WOKParser()
@@ -129,6 +189,55 @@ class TestWOKParser():
         with pytest.raises(exceptions.FileParseError):
             parser.parse_file(self.file_paths['junk']['file'])
 
+    def test_iter_file(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_iter_file')
+        parser = WOKParser()
+        records = parser.iter_file(self.file_paths['WOK']['file'])
+        record_dict = next(records)
+        assert record_dict['Unique Article Identifier']
+        assert record_dict['content'].endswith('\nER')
+        assert len(list(records)) == 499
+        assert not parser.parsed_list
+
+        parser.parse_file(self.file_paths['WOK']['file'])
+        assert list(parser.iter_file(self.file_paths['WOK']['file'])) == parser.parsed_list
+
+        with pytest.raises(exceptions.FileParseError):
+            list(parser.iter_file(self.file_paths['junk']['file']))
+
+    def test_iter_records(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_iter_records')
+        parser = WOKParser()
+        records = list(parser.iter_records([
+            self.file_paths['WOK']['file'],
+            self.file_paths['junk']['file']
+        ]))
+        assert len(records) == 500
+        assert not parser.parsed_list
+
+        parser = Parser.get_parser_for_directory(self.file_paths['WOK']['dir'])
+        assert len(list(parser.iter_records())) == 500
+
+    def test_undecodable_file(self, tmpdir):
+        logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_undecodable_file')
+        with open(self.file_paths['WOK']['file'], 'rb') as f:
+            data = f.read()
+        bad_offset = parsers.SNIFF_SIZE + 50000
+        file_path = str(tmpdir.join('records.txt'))
+        with open(file_path, 'wb') as f:
+            f.write(data[:bad_offset] + b'\xff\xfe' + data[bad_offset:])
+
+        parser = WOKParser()
+        parser.parse_files([file_path, self.file_paths['WOK']['file']])
+        assert len(parser.parsed_list) == 500
+        parser = WOKParser()
+        parser.parse_files([file_path, self.file_paths['WOK']['file']], workers=2)
+        assert len(parser.parsed_list) == 500
+        with pytest.raises(exceptions.FileParseError):
+            WOKParser().parse_file(file_path)
+        records = list(WOKParser().iter_records([file_path, self.file_paths['WOK']['file']]))
+        assert 500 < len(records) < 1000
+
     def test_parse_directory(self):
         """
         Also tests base Parser class & Parser.parse_files.
@@ -143,6 +252,30 @@ class TestWOKParser():
         parser2.parse_directory(self.file_paths['junk']['dir'])
         assert not parser2.parsed_list
 
+    def test_parse_file_workers(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_parse_file_workers')
+        parser = WOKParser()
+        parser.parse_file(self.file_paths['WOK']['file'])
+        parallel_parser = WOKParser()
+        parallel_parser.parse_file(self.file_paths['WOK']['file'], workers=3)
+        assert parallel_parser.parsed_list == parser.parsed_list
+
+        with pytest.raises(exceptions.FileParseError):
+            parallel_parser.parse_file(self.file_paths['junk']['file'], workers=3)
+
+    def test_parse_directory_workers(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_parse_directory_workers')
+        parser = WOKParser("DOI")
+        parser.recursive_parse(self.file_paths['WOK']['dir'])
+        parallel_parser = WOKParser("DOI")
+        parallel_parser.recursive_parse(self.file_paths['WOK']['dir'], workers=2)
+        assert list(parallel_parser.parsed_dict) == list(parser.parsed_dict)
+        assert parallel_parser.parsed_dict == parser.parsed_dict
+
+        parser2 = WOKParser()
+        parser2.parse_directory(self.file_paths['junk']['dir'], workers=2)
+        assert not parser2.parsed_list
+
     def test_parse_directories(self):
         logging.getLogger('bibliom.pytest').debug('-->TestWOKParser.test_parse_directories')
         parser = WOKParser("Unique Article Identifier")
@@ -204,15 +337,40 @@ class TestWCHParser():
         parser2 = WCHParser()
         parser2.parse_directory(self.file_paths['junk']['dir'])
         assert not parser2.parsed_list
- 
-
-
-
-
-
-
-
-
-
-
 
+    def test_parse_quoted_items(self, tmpdir):
+        logging.getLogger('bibliom.pytest').debug('-->TestWCHParser.test_parse_quoted_items')
+        file_path = str(tmpdir.join('savedrecs.txt'))
+        with open(file_path, 'w') as f:
+            f.write(
+                'TOPIC: (test)\n'
+                'Timespan=1980-2018.\n'
+                '\n'
+                '"Title","Authors","DOI","2016","2017","2018"\n'
+                '"A ""Quoted"" Title","Thicke, M","10.1/a","1","2","3"\n'
+                '"A Title\nOver Two Lines","Thicke, M","10.1/b","4","5","6"\n'
+                '"An ("unescaped") Title","Thicke, M","10.1/c","7","8","9"\n'
+            )
+        parser = WCHParser('DOI')
+        parser.parse_file(file_path)
+        assert parser.parsed_dict['10.1/a']['Title'] == 'A "Quoted" Title'
+        assert parser.parsed_dict['10.1/b']['Title'] == 'A Title\nOver Two Lines'
+        assert parser.parsed_dict['10.1/c']['Title'] == 'An ("unescaped") Title'
+        assert dict(parser.parsed_dict['10.1/c']['Citation History']) == {
+            2016: 7, 2017: 8, 2018: 9}
+
+    def test_citation_matrix(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestWCHParser.test_citation_matrix')
+        parser = WCHParser()
+        parser.parse_file(self.file_paths['WCH']['file'])
+        years, matrix = parser.citation_matrix()
+        assert len(years) == 39
+        assert years[-1] == 2018
+        assert matrix.shape == (500, 39)
+        assert matrix.dtype == numpy.int32
+        for i, record_dict in enumerate(parser.parsed_list):
+            assert dict(zip(years, matrix[i].tolist())) == dict(record_dict['Citation History'])
+
+        years, matrix = parser.citation_matrix([{'Title': 'No history'}])
+        assert years == []
+        assert matrix.shape == (1, 0)
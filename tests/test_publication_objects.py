@@ -7,7 +7,7 @@ import logging
 
 import pytest
 
-from bibliom.publication_objects import Paper, Author, Journal, Citation
+from bibliom.publication_objects import Paper, Author, Journal, Citation, prefetch_related
 from bibliom.dbtable import DBTable
 from bibliom import exceptions
 
@@ -129,6 +129,37 @@ class TestPaper():
         )
         assert len(new_paper.citing_papers) == 0
 
+    def test_prefetch_related(self, import_small_database):
+        logging.getLogger('bibliom.pytest').debug('-->TestPaper.test_prefetch_related')
+        papers = Paper.fetch_papers(
+            doi=['10.1089/ars.2017.7361', '10.1016/j.ijhydene.2016.06.178'])
+        papers.sort(key=lambda p: p.doi)
+        new_paper = Paper(fields_dict={'title': "A New Paper"})
+        result = prefetch_related(
+            papers + [new_paper],
+            'authors', 'journal', 'cited_papers', 'citing_papers')
+        assert len(result) == 3
+        assert len(papers[1].authors) == 2
+        assert papers[1].journal.title == 'ANTIOXIDANTS & REDOX SIGNALING'
+        assert len(papers[1].cited_papers) == 177
+        assert len(papers[0].citing_papers) == 5
+        assert new_paper.authors == []
+        assert new_paper.journal is None
+
+        authors = papers[1].authors
+        prefetch_related(authors, 'papers')
+        assert papers[1] in authors[0].papers
+        citation_table = DBTable.get_table_object('citation', self.manager)
+        citations = Citation.fetch_entities(citation_table, {'source_id': papers[1].idpaper})
+        prefetch_related(citations, 'source_paper', 'target_paper')
+        assert citations[0].source_paper == papers[1]
+        assert citations[0].target_paper in papers[1].cited_papers
+
+        with pytest.raises(ValueError):
+            prefetch_related(papers, 'not_a_relationship')
+        papers[1].clear_related()
+        assert len(papers[1].authors) == 2
+
     def test_cite(self, import_small_database):
         logging.getLogger('bibliom.pytest').debug('-->TestPaper.test_cite')
         source_paper = Paper.fetch(
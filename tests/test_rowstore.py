@@ -0,0 +1,169 @@
+"""
+Unit tests for rowstore.py
+"""
+
+# pylint: disable=unused-variable, missing-docstring, no-member, len-as-condition
+
+import logging
+
+import pytest
+
+from bibliom.rowstore import RowStore
+
+class TestRowStore:
+    """
+    Tests for RowStore class.
+    """
+    def test_rows(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestRowStore.test_rows')
+        store = RowStore(['id', 'title', 'doi'])
+        store['id%%1'] = {'id': 1, 'title': 'A Paper'}
+        store['id%%2'] = {'id': 2, 'title': 'Another Paper', 'doi': '10.1/2'}
+        assert len(store) == 2
+        assert list(store.keys()) == ['id%%1', 'id%%2']
+        assert store['id%%1'] == {'id': 1, 'title': 'A Paper', 'doi': None}
+        assert store.get('id%%3') is None
+        assert 'id%%2' in store
+
+        row = store['id%%1']
+        row['doi'] = '10.1/1'
+        assert store['id%%1']['doi'] == '10.1/1'
+        copy = row.copy()
+        assert isinstance(copy, dict)
+        copy['doi'] = None
+        assert store['id%%1']['doi'] == '10.1/1'
+        with pytest.raises(KeyError):
+            row['not_a_field'] = 1
+        with pytest.raises(TypeError):
+            del row['doi']
+
+        store.mark_dirty('id%%1', 'doi')
+        store.mark_dirty('id%%1', 'id')
+        assert store.dirty_fields('id%%1') == ('id', 'doi')
+        store.clear_dirty('id%%1', ['doi'])
+        assert store.dirty_fields('id%%1') == ('id',)
+        store.clear_dirty('id%%1')
+        assert store.dirty_fields('id%%1') == ()
+        store.mark_dirty('id%%1', 'title')
+
+        del store['id%%1']
+        assert 'id%%1' not in store
+        assert store.dirty_fields('id%%1') == ()
+        with pytest.raises(KeyError):
+            store.mark_dirty('id%%1', 'title')
+        with pytest.raises(KeyError):
+            store['id%%1']
+        with pytest.raises(KeyError):
+            row['title']
+        store['id%%1'] = {'id': 1, 'title': 'Cached Again'}
+        assert row['title'] == 'Cached Again'
+        del store['id%%1']
+        store['id%%3'] = {'id': 3}
+        assert store['id%%3']['title'] is None
+        assert store['id%%2']['title'] == 'Another Paper'
+
+    def test_statuses(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestRowStore.test_statuses')
+        store = RowStore(['id', 'title'])
+        statuses = store.statuses
+        store['id%%1'] = {'id': 1}
+        assert statuses.get('id%%1') is None
+        with pytest.raises(KeyError):
+            statuses['id%%1']
+        statuses['id%%1'] = 1
+        statuses['id%%2'] = 3
+        assert dict(statuses) == {'id%%1': 1, 'id%%2': 3}
+        store['id%%2'] = {'id': 2}
+        assert statuses['id%%2'] == 3
+
+        del store['id%%1']
+        assert statuses['id%%1'] == 1
+        del statuses['id%%1']
+        assert 'id%%1' not in statuses
+        assert len(statuses) == 1
+
+        store.clear()
+        assert len(store) == 0
+        assert statuses['id%%2'] == 3
+        statuses.clear()
+        assert len(statuses) == 0
+
+    def test_values(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestRowStore.test_values')
+        store = RowStore(['id', 'title', 'abstract'])
+        store[(1,)] = {'id': 1, 'title': 'A Paper'}
+        assert store.get_value((1,), 1) == 'A Paper'
+        assert store.swap_value((1,), 1, 'New Title') == 'A Paper'
+        assert store[(1,)]['title'] == 'New Title'
+        assert not store.is_dirty((1,))
+        store.mark_dirty((1,), 'title')
+        assert store.is_dirty((1,))
+
+        store.mark_unloaded((1,), ['abstract'])
+        with pytest.raises(KeyError):
+            store.get_value((1,), 2)
+        with pytest.raises(KeyError):
+            store.swap_value((1,), 2, 'An abstract')
+        assert store.get_value((1,), 0) == 1
+        with pytest.raises(KeyError):
+            store.get_value((2,), 0)
+
+    def test_indexes(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestRowStore.test_indexes')
+        store = RowStore(['id', 'doi'])
+        store[(1,)] = {'id': 1, 'doi': '10.1/1'}
+        store.add_index('doi')
+        store[(2,)] = {'id': 2, 'doi': '10.1/2'}
+        store[(3,)] = {'id': 3}
+        assert store.lookup('doi', '10.1/1') == (1,)
+        assert store.lookup('doi', '10.1/2') == (2,)
+        assert store.lookup('doi', None) is None
+        with pytest.raises(KeyError):
+            store.lookup('id', 1)
+
+        store[(1,)]['doi'] = '10.1/changed'
+        assert store.lookup('doi', '10.1/1') is None
+        assert store.lookup('doi', '10.1/changed') == (1,)
+        store.swap_value((3,), 1, '10.1/3')
+        assert store.lookup('doi', '10.1/3') == (3,)
+        store[(2,)] = {'id': 2, 'doi': '10.1/two'}
+        assert store.lookup('doi', '10.1/2') is None
+        assert store.lookup('doi', '10.1/two') == (2,)
+
+        store[(4,)] = {'id': 4, 'doi': '10.1/two'}
+        del store[(4,)]
+        assert store.lookup('doi', '10.1/two') == (2,)
+        del store[(2,)]
+        assert store.lookup('doi', '10.1/two') is None
+        store.clear()
+        assert store.lookup('doi', '10.1/3') is None
+
+    def test_evictable(self):
+        logging.getLogger('bibliom.pytest').debug('-->TestRowStore.test_evictable')
+        store = RowStore(['id'])
+        store.evictable_status = 0
+        assert store.least_recent_evictable() is None
+        for i in range(1, 5):
+            store[(i,)] = {'id': i}
+            store.statuses[(i,)] = 0
+        store.statuses[(4,)] = 1
+        store.pin((1,))
+        store.pin((1,))
+        assert store.least_recent_evictable() == (2,)
+        store.touch((2,))
+        assert store.least_recent_evictable() == (3,)
+        del store[(3,)]
+        assert store.least_recent_evictable() == (2,)
+
+        # Rows that become evictable again keep their place by last use.
+        assert not store.unpin((1,))
+        assert store.unpin((1,))
+        assert list(store.pinned_keys()) == []
+        assert store.least_recent_evictable() == (1,)
+        store.touch((1,))
+        store.statuses[(4,)] = 0
+        assert store.least_recent_evictable() == (4,)
+        del store.statuses[(4,)]
+        assert store.least_recent_evictable() == (2,)
+        store.clear_statuses()
+        assert store.least_recent_evictable() is None